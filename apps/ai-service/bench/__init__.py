@@ -0,0 +1,11 @@
+"""
+Reproducible performance benchmarks for the AI service.
+
+    python -m bench run --out logs/bench/current.json
+    python -m bench compare bench/baseline.json logs/bench/current.json
+    python -m bench load --concurrency 1,2,4,8,16 --step-seconds 20
+
+With AI_SERVICE_FAKE_ENGINES=1 the load harness exercises scheduling and
+backpressure against the cost-modelled fakes in core/fakes.py instead of
+real models.
+"""
@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+from . import load, report
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+
+def _run(args) -> int:
+    results = report.Results()
+    sections = set(args.only.split(",")) if args.only else None
+
+    def wanted(section: str) -> bool:
+        return sections is None or section in sections
+
+    # Engines are built directly (no app, no HTTP) to isolate model speed.
+    if wanted("whisper"):
+        # pylint: disable-next=import-outside-toplevel
+        from core.transcriber import WhisperTranscriber
+
+        from .engines import whisper_real_time_factor  # pylint: disable=C0415
+
+        whisper_real_time_factor(
+            WhisperTranscriber(model_size=args.whisper_model), results, args.repeats
+        )
+    if wanted("spacy"):
+        from core.filter import SpacyFilter  # pylint: disable=C0415
+
+        from .engines import spacy_docs_per_second  # pylint: disable=C0415
+
+        spacy_docs_per_second(SpacyFilter(), results, repeats=args.repeats)
+    if wanted("marian"):
+        from core.translator import OpusTranslator  # pylint: disable=C0415
+
+        from .engines import marian_tokens_per_second  # pylint: disable=C0415
+
+        marian_tokens_per_second(
+            OpusTranslator(), results, args.pairs.split(","), repeats=args.repeats
+        )
+    if wanted("endpoints"):
+        from .endpoints import endpoint_latency  # pylint: disable=C0415
+
+        endpoint_latency(results, requests=args.requests)
+
+    results.write(args.out, whisper_model=args.whisper_model)
+    print(f"wrote {len(results.metrics)} metrics to {args.out}")
+    return 0
+
+
+def _compare(args) -> int:
+    if not args.baseline.exists():
+        print(
+            f"no baseline at {args.baseline}; record a baseline first with "
+            f"`python -m bench run --out {args.baseline}`",
+            file=sys.stderr,
+        )
+        return 2
+    if not args.current.exists():
+        print(
+            f"no results at {args.current}; run `python -m bench run` first",
+            file=sys.stderr,
+        )
+        return 2
+    baseline = json.loads(args.baseline.read_text())
+    current = json.loads(args.current.read_text())
+    rows = report.compare(baseline, current, args.tolerance)
+    print(report.format_comparison(rows))
+    regressions = [row["metric"] for row in rows if row["regression"]]
+    missing = [row["metric"] for row in rows if row["missing"]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+    if missing:
+        print(f"\n{len(missing)} metric(s) missing from the current run")
+    return 1 if regressions or missing else 0
+
+
+def _load(args) -> int:
+    mix = load.parse_mix(args.mix)
+    if args.url:
+        api_key = os.environ.get("AI_SERVICE_API_KEY", "")
+        client = load.remote_client(args.url, api_key, args.video)
+    else:
+        client = load.in_process_client(args.video)
+
+    def progress(step):
+        print(
+            f"concurrency {step['concurrency']:>3}: {step['throughput_rps']:.2f} rps, "
+            f"p99 {step['p99_ms']:.0f} ms, 429 {step['rejected_rate']:.1%}",
+            file=sys.stderr,
+        )
+
+    curve = asyncio.run(
+        load.saturation_curve(
+            client,
+            mix,
+            [int(level) for level in args.concurrency.split(",")],
+            step_s=args.step_seconds,
+            batch=args.batch,
+            progress=progress,
+        )
+    )
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(curve, indent=2) + "\n")
+    print(load.format_curve(curve["steps"]))
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmarks, write JSON")
+    run.add_argument("--out", type=Path, default=Path("logs/bench/current.json"))
+    run.add_argument(
+        "--only", help="comma-separated: whisper,spacy,marian,endpoints (default all)"
+    )
+    run.add_argument("--repeats", type=int, default=3)
+    run.add_argument("--requests", type=int, default=50, help="per endpoint")
+    run.add_argument("--pairs", default="es-en,en-es")
+    run.add_argument("--whisper-model", default="tiny")
+    run.set_defaults(handler=_run)
+
+    compare = commands.add_parser(
+        "compare",
+        help="compare a run with a baseline; exit 1 on regressions or missing metrics",
+    )
+    compare.add_argument("baseline", type=Path, nargs="?", default=DEFAULT_BASELINE)
+    compare.add_argument(
+        "current", type=Path, nargs="?", default=Path("logs/bench/current.json")
+    )
+    compare.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="allowed change in the bad direction, as a fraction (default 0.1)",
+    )
+    compare.set_defaults(handler=_compare)
+
+    load_test = commands.add_parser(
+        "load", help="step up concurrency and report the saturation curve"
+    )
+    load_test.add_argument(
+        "--url", help="target a running service; default runs the app in-process"
+    )
+    load_test.add_argument(
+        "--mix",
+        default=load.DEFAULT_MIX,
+        help="relative weights of stream, filter, translate and thumbnail",
+    )
+    load_test.add_argument("--concurrency", default="1,2,4,8,16,32")
+    load_test.add_argument("--step-seconds", type=float, default=10.0)
+    load_test.add_argument("--batch", type=int, default=20, help="texts per request")
+    load_test.add_argument(
+        "--video",
+        help="thumbnail source under the media root; in-process runs make one",
+    )
+    load_test.add_argument("--out", type=Path, default=Path("logs/bench/load.json"))
+    load_test.set_defaults(handler=_load)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
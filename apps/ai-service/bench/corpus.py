@@ -0,0 +1,90 @@
+import random
+from pathlib import Path
+from typing import Dict, List
+
+MEDIA_DIR = Path(__file__).resolve().parent.parent / "media"
+# Bundled 7 s speech clip.
+AUDIO_FIXTURE = MEDIA_DIR / "test_audio.mp3"
+
+# Small per-language vocabularies; sentences are drawn from them with a fixed
+# seed so every run analyses and translates exactly the same text.
+_VOCABULARY: Dict[str, Dict[str, List[str]]] = {
+    "es": {
+        "subjects": ["yo", "ella", "mi hermano", "nadie", "el capitán", "los niños"],
+        "verbs": ["quiere", "encontró", "no sabe", "busca", "prometió", "vio"],
+        "objects": [
+            "la llave del coche",
+            "un camino más corto",
+            "lo que pasó anoche",
+            "a su padre",
+            "la verdad",
+            "el último tren",
+        ],
+        "tails": ["antes de que amanezca", "otra vez", "en la ciudad", "", ""],
+    },
+    "en": {
+        "subjects": ["I", "she", "my brother", "nobody", "the captain", "the kids"],
+        "verbs": ["wants", "found", "doesn't know", "is looking for", "saw"],
+        "objects": [
+            "the car keys",
+            "a shorter way",
+            "what happened last night",
+            "their father",
+            "the truth",
+            "the last train",
+        ],
+        "tails": ["before dawn", "again", "in the city", "", ""],
+    },
+    "de": {
+        "subjects": ["ich", "sie", "mein Bruder", "niemand", "der Kapitän"],
+        "verbs": ["sucht", "fand", "kennt", "versprach", "sah"],
+        "objects": [
+            "den Autoschlüssel",
+            "einen kürzeren Weg",
+            "die Wahrheit",
+            "den letzten Zug",
+        ],
+        "tails": ["vor der Dämmerung", "schon wieder", "in der Stadt", "", ""],
+    },
+    "fr": {
+        "subjects": ["je", "elle", "mon frère", "personne", "le capitaine"],
+        "verbs": ["cherche", "a trouvé", "ne connaît pas", "a promis", "a vu"],
+        "objects": [
+            "les clés de la voiture",
+            "un chemin plus court",
+            "la vérité",
+            "le dernier train",
+        ],
+        "tails": ["avant l'aube", "encore une fois", "en ville", "", ""],
+    },
+}
+
+LANGUAGES = tuple(_VOCABULARY)
+
+
+def subtitle_lines(language: str, count: int, seed: int = 7) -> List[str]:
+    """
+    `count` subtitle-like lines in `language`: one or two short clauses,
+    occasionally a question, as in real dialogue.
+    """
+    words = _VOCABULARY[language]
+    rng = random.Random(f"{language}:{seed}")  # noqa: S311  # nosec B311
+    lines = []
+    for _ in range(count):
+        clauses = []
+        for _ in range(rng.choice((1, 1, 2))):
+            clause = " ".join(
+                part
+                for part in (
+                    rng.choice(words["subjects"]),
+                    rng.choice(words["verbs"]),
+                    rng.choice(words["objects"]),
+                    rng.choice(words["tails"]),
+                )
+                if part
+            )
+            clauses.append(clause)
+        line = ", ".join(clauses)
+        line = line[0].upper() + line[1:]
+        lines.append(line + rng.choice((".", ".", "?", "!")))
+    return lines
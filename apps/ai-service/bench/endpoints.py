@@ -0,0 +1,110 @@
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+
+from .corpus import AUDIO_FIXTURE, MEDIA_DIR, subtitle_lines
+from .report import Results, percentile
+
+_API_KEY = "bench"
+
+
+def _cases(batch: int) -> Dict[str, Tuple[str, Dict]]:
+    return {
+        "/transcribe": (
+            "/transcribe",
+            {"file_path": AUDIO_FIXTURE.name, "language": "en"},
+        ),
+        "/filter": (
+            "/filter",
+            {"texts": subtitle_lines("es", batch), "language": "es"},
+        ),
+        "/translate": (
+            "/translate",
+            {
+                "texts": subtitle_lines("es", batch),
+                "source_lang": "es",
+                "target_lang": "en",
+            },
+        ),
+    }
+
+
+def _wait_ready(client, timeout_s: float):
+    give_up = time.monotonic() + timeout_s
+    while client.get("/ready").status_code != 200:
+        if time.monotonic() > give_up:
+            raise TimeoutError(f"engines not ready after {timeout_s:.0f}s")
+        time.sleep(0.5)
+
+
+def _timed(call: Callable[[], None], count: int) -> List[float]:
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _record(results: Results, name: str, samples: List[float]):
+    results.add(f"endpoint.{name}.p50_ms", percentile(samples, 50), "ms", False)
+    results.add(f"endpoint.{name}.p99_ms", percentile(samples, 99), "ms", False)
+
+
+def endpoint_latency(
+    results: Results,
+    requests: int = 50,
+    batch: int = 20,
+    ready_timeout_s: float = 600,
+):
+    """
+    p50/p99 latency per endpoint through the ASGI app in-process: real
+    middleware, serialization and engines, no network. Requests are
+    sequential, so the figures are free of queueing effects.
+    """
+    os.environ.setdefault("AI_SERVICE_API_KEY", _API_KEY)
+    os.environ["AUDIO_BASE_DIR"] = str(MEDIA_DIR)
+    # pylint: disable-next=import-outside-toplevel
+    from fastapi.testclient import TestClient
+
+    import main  # pylint: disable=import-outside-toplevel
+
+    headers = {"X-API-Key": os.environ["AI_SERVICE_API_KEY"]}
+    with TestClient(main.app) as client:
+        _wait_ready(client, ready_timeout_s)
+        for name, (path, body) in _cases(batch).items():
+            # Transcription is far slower; fewer samples keep runs short.
+            count = max(3, requests // 10) if "transcribe" in name else requests
+
+            def call(path=path, body=body):
+                response = client.post(path, json=body, headers=headers)
+                response.raise_for_status()
+
+            call()  # warm-up
+            _record(results, name, _timed(call, count))
+
+        _stream_latency(client, headers, max(3, requests // 10), results)
+
+
+def _stream_latency(client, headers: Dict, count: int, results: Results):
+    body = {"file_path": AUDIO_FIXTURE.name, "language": "en"}
+    first_event, total = [], []
+    for _ in range(count):
+        started = time.perf_counter()
+        with client.stream(
+            "POST", "/transcribe/stream", json=body, headers=headers
+        ) as response:
+            response.raise_for_status()
+            first = None
+            for line in response.iter_lines():
+                if first is None and line.startswith("event:"):
+                    first = time.perf_counter() - started
+        first_event.append((first or 0.0) * 1000)
+        total.append((time.perf_counter() - started) * 1000)
+    _record(results, "/transcribe/stream", total)
+    results.add(
+        "endpoint./transcribe/stream.first_event_p50_ms",
+        percentile(first_event, 50),
+        "ms",
+        False,
+    )
@@ -0,0 +1,294 @@
+import asyncio
+import os
+import random
+import shutil
+import subprocess  # nosec B404
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from .corpus import AUDIO_FIXTURE, MEDIA_DIR, subtitle_lines
+from .report import percentile
+
+ENDPOINTS = ("stream", "filter", "translate", "thumbnail")
+DEFAULT_MIX = "stream=1,filter=4,translate=4,thumbnail=1"
+_API_KEY = "bench"
+# Subtitle lines per language that request batches are cut from.
+_CORPUS_LINES = 200
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """
+    "filter=3,translate=1" -> relative weights. Unknown names are an error
+    so a typo cannot silently drop an endpoint from the run.
+    """
+    mix = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint {name!r}; choose from {ENDPOINTS}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("the mix needs at least one positive weight")
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    status: int  # 0 when the request failed without a response
+    latency_s: float
+
+
+@dataclass
+class Step:
+    concurrency: int
+    # Replaced by the measured length once the step has run: requests still
+    # in flight when its time is up are waited for and counted.
+    duration_s: float
+    samples: List[Sample] = field(default_factory=list)
+
+    def summary(self, samples: Optional[List[Sample]] = None) -> Dict:
+        samples = self.samples if samples is None else samples
+        latencies = [s.latency_s * 1000 for s in samples if 200 <= s.status < 300]
+        total = len(samples) or 1
+        return {
+            "requests": len(samples),
+            "throughput_rps": round(len(latencies) / self.duration_s, 3),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p90_ms": round(percentile(latencies, 90), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "rejected_rate": round(sum(s.status == 429 for s in samples) / total, 4),
+            "error_rate": round(
+                sum(s.status != 429 and not 200 <= s.status < 300 for s in samples)
+                / total,
+                4,
+            ),
+        }
+
+    def to_dict(self) -> Dict:
+        by_endpoint: Dict[str, List[Sample]] = {}
+        for sample in self.samples:
+            by_endpoint.setdefault(sample.endpoint, []).append(sample)
+        return {
+            "concurrency": self.concurrency,
+            "elapsed_s": round(self.duration_s, 3),
+            **self.summary(),
+            "endpoints": {
+                name: self.summary(samples)
+                for name, samples in sorted(by_endpoint.items())
+            },
+        }
+
+
+class _Requests:
+    """Builds one request body per endpoint, from the shared bench corpus."""
+
+    def __init__(self, video: Optional[str], batch: int):
+        if not 1 <= batch <= _CORPUS_LINES:
+            raise ValueError(f"batch must be between 1 and {_CORPUS_LINES} texts")
+        self.video = video
+        self.lines = {
+            "es": subtitle_lines("es", _CORPUS_LINES),
+            "en": subtitle_lines("en", _CORPUS_LINES),
+        }
+        self.batch = batch
+
+    def build(self, endpoint: str, rng: random.Random):
+        if endpoint == "stream":
+            return "/transcribe/stream", {"file_path": AUDIO_FIXTURE.name}
+        if endpoint == "thumbnail":
+            return "/generate_thumbnail", {"file_path": self.video}
+        start = rng.randrange(len(self.lines["es"]) - self.batch + 1)
+        if endpoint == "filter":
+            language = rng.choice(("es", "en"))
+            texts = self.lines[language][start : start + self.batch]
+            return "/filter", {"texts": texts, "language": language}
+        texts = self.lines["es"][start : start + self.batch]
+        return "/translate", {
+            "texts": texts,
+            "source_lang": "es",
+            "target_lang": "en",
+        }
+
+
+async def _send(client: httpx.AsyncClient, path: str, body: Dict) -> int:
+    if path == "/transcribe/stream":
+        # Drain the whole event stream: the client is busy until it ends.
+        async with client.stream("POST", path, json=body) as response:
+            async for _ in response.aiter_bytes():
+                pass
+            return response.status_code
+    response = await client.post(path, json=body)
+    return response.status_code
+
+
+async def _run_step(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    client: httpx.AsyncClient,
+    requests: _Requests,
+    mix: Dict[str, float],
+    concurrency: int,
+    duration_s: float,
+    seed: int,
+) -> Step:
+    step = Step(concurrency, duration_s)
+    started_at = time.monotonic()
+    stop_at = started_at + duration_s
+    names, weights = list(mix), list(mix.values())
+
+    async def user(index: int):
+        # Closed loop: each simulated client waits for its response before
+        # sending the next request, so concurrency is the offered load.
+        rng = random.Random(f"{seed}:{concurrency}:{index}")  # noqa: S311  # nosec B311
+        while time.monotonic() < stop_at:
+            endpoint = rng.choices(names, weights)[0]
+            path, body = requests.build(endpoint, rng)
+            started = time.perf_counter()
+            try:
+                status = await _send(client, path, body)
+            except httpx.HTTPError:
+                status = 0
+            step.samples.append(Sample(endpoint, status, time.perf_counter() - started))
+
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    # Throughput is over the time it took to drain every request, so long
+    # streams finishing after stop_at do not inflate it.
+    step.duration_s = time.monotonic() - started_at
+    return step
+
+
+def saturation_point(steps: Sequence[Dict], gain: float = 0.1) -> Optional[int]:
+    """
+    The first concurrency that no longer pays: throughput grew by less than
+    `gain` over the previous step, or requests started being shed or failing.
+    """
+    for previous, current in zip(steps, steps[1:], strict=False):
+        if current["rejected_rate"] > 0.01 or current["error_rate"] > 0.01:
+            return current["concurrency"]
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 + gain):
+            return current["concurrency"]
+    return None
+
+
+def format_curve(steps: Sequence[Dict]) -> str:
+    lines = [
+        f"{'conc':>5} {'req':>6} {'rps':>8} {'p50 ms':>9} {'p90 ms':>9} "
+        f"{'p99 ms':>9} {'429':>7} {'err':>7}"
+    ]
+    for step in steps:
+        lines.append(
+            f"{step['concurrency']:>5} {step['requests']:>6} "
+            f"{step['throughput_rps']:>8.2f} {step['p50_ms']:>9.1f} "
+            f"{step['p90_ms']:>9.1f} {step['p99_ms']:>9.1f} "
+            f"{step['rejected_rate']:>7.1%} {step['error_rate']:>7.1%}"
+        )
+    knee = saturation_point(steps)
+    lines.append(
+        f"\nsaturates at concurrency {knee}"
+        if knee
+        else "\nno saturation within the tested range"
+    )
+    return "\n".join(lines)
+
+
+def _make_video(directory: Path) -> str:
+    # A short synthetic clip so thumbnails work without a media fixture.
+    target = directory / "load_test.mp4"
+    subprocess.run(  # noqa: S603
+        [
+            shutil.which("ffmpeg") or "ffmpeg",
+            "-v",
+            "error",
+            "-y",
+            "-f",
+            "lavfi",
+            "-i",
+            "testsrc=duration=10:size=640x360:rate=25",
+            "-pix_fmt",
+            "yuv420p",
+            str(target),
+        ],
+        check=True,
+        timeout=60,
+    )
+    return target.name
+
+
+@asynccontextmanager
+async def in_process_client(video: Optional[str]):
+    """
+    An httpx client wired straight into the ASGI app, with its lifespan
+    running, so the whole stack is exercised without a socket.
+    """
+    os.environ.setdefault("AI_SERVICE_API_KEY", _API_KEY)
+    os.environ["AUDIO_BASE_DIR"] = str(MEDIA_DIR)
+    with tempfile.TemporaryDirectory(prefix="load-media-") as media:
+        if video is None:
+            os.environ["MEDIA_ROOT"] = media
+            video = _make_video(Path(media))
+        import main  # pylint: disable=import-outside-toplevel
+
+        async with main.app.router.lifespan_context(main.app):
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=main.app),
+                base_url="http://load",
+                headers={"X-API-Key": os.environ["AI_SERVICE_API_KEY"]},
+                timeout=600,
+            ) as client:
+                yield client, video
+
+
+@asynccontextmanager
+async def remote_client(url: str, api_key: str, video: Optional[str]):
+    async with httpx.AsyncClient(
+        base_url=url, headers={"X-API-Key": api_key}, timeout=300
+    ) as client:
+        yield client, video
+
+
+async def _wait_ready(client: httpx.AsyncClient, timeout_s: float):
+    give_up = time.monotonic() + timeout_s
+    while (await client.get("/ready")).status_code != 200:
+        if time.monotonic() > give_up:
+            raise TimeoutError(f"service not ready after {timeout_s:.0f}s")
+        await asyncio.sleep(0.5)
+
+
+async def saturation_curve(  # pylint: disable=too-many-arguments
+    client_factory,
+    mix: Dict[str, float],
+    concurrency: Sequence[int] = (1, 2, 4, 8, 16, 32),
+    *,
+    step_s: float = 10.0,
+    batch: int = 20,
+    seed: int = 7,
+    progress=None,
+) -> Dict:
+    """
+    Step through `concurrency` levels, holding each for `step_s` seconds,
+    and return the per-step summaries plus the detected saturation point.
+    """
+    # Checked before the service is started.
+    requests = _Requests(None, batch)
+    async with client_factory as (client, video):
+        if "thumbnail" in mix and not video:
+            raise ValueError("thumbnail traffic needs a video (--video)")
+        await _wait_ready(client, 600)
+        requests.video = video
+        steps = []
+        for level in concurrency:
+            step = await _run_step(client, requests, mix, level, step_s, seed)
+            steps.append(step.to_dict())
+            if progress:
+                progress(steps[-1])
+    return {
+        "mix": mix,
+        "step_seconds": step_s,
+        "steps": steps,
+        "saturation_concurrency": saturation_point(steps),
+    }
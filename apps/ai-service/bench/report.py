@@ -0,0 +1,124 @@
+import json
+import math
+import platform
+import subprocess  # nosec B404
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """
+    Nearest-rank percentile; stable for the small sample counts used here.
+    """
+    if not samples:
+        return math.nan
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Results:
+    """
+    Named measurements, each with a unit and a direction, so a comparison
+    knows whether a change is a regression.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Dict] = {}
+
+    def add(self, name: str, value: float, unit: str, higher_is_better: bool):
+        self.metrics[name] = {
+            "value": round(value, 4),
+            "unit": unit,
+            "higher_is_better": higher_is_better,
+        }
+
+    def to_dict(self, **meta) -> Dict:
+        return {"meta": {**_environment(), **meta}, "metrics": self.metrics}
+
+    def write(self, path: Path, **meta):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(**meta), indent=2) + "\n")
+
+
+def _environment() -> Dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or None,
+        "commit": _git_commit(),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(  # noqa: S603
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float) -> List[Dict]:
+    """
+    One row per baseline metric. A row is a regression when the metric moved
+    in its bad direction by more than `tolerance` (a fraction). A metric the
+    current run lacks (a section that crashed or was skipped) gets a
+    `missing` row instead, which fails the comparison too.
+    """
+    rows = []
+    for name, base in sorted(baseline["metrics"].items()):
+        now = current["metrics"].get(name)
+        if now is None:
+            rows.append(
+                {
+                    "metric": name,
+                    "baseline": base["value"],
+                    "current": None,
+                    "unit": base["unit"],
+                    "change": None,
+                    "regression": False,
+                    "missing": True,
+                }
+            )
+            continue
+        if not base["value"]:
+            continue
+        change = (now["value"] - base["value"]) / abs(base["value"])
+        worse = -change if base["higher_is_better"] else change
+        rows.append(
+            {
+                "metric": name,
+                "baseline": base["value"],
+                "current": now["value"],
+                "unit": base["unit"],
+                "change": change,
+                "regression": worse > tolerance,
+                "missing": False,
+            }
+        )
+    return rows
+
+
+def format_comparison(rows: List[Dict]) -> str:
+    width = max((len(row["metric"]) for row in rows), default=10)
+    lines = [f"{'metric':<{width}}  {'baseline':>12}  {'current':>12}  change"]
+    for row in rows:
+        if row["missing"]:
+            lines.append(
+                f"{row['metric']:<{width}}  {row['baseline']:>12.4g}  "
+                f"{'-':>12}     n/a {row['unit']}  MISSING"
+            )
+            continue
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['metric']:<{width}}  {row['baseline']:>12.4g}  "
+            f"{row['current']:>12.4g}  {row['change']:+7.1%} {row['unit']}{flag}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+from typing import Iterable
+
+import structlog
+from starlette.responses import JSONResponse
+
+logger = structlog.get_logger()
+
+# Cells in the shared counter; pre-forked workers count in the cell of their
+# index (modulo, so a larger pool shares cells and can only under-count).
+_CELLS = 64
+
+
+class AdmissionCounter:
+    """
+    In-flight request counts in shared memory, one cell per worker.
+
+    Created before workers are forked, so the limit applies to the whole node
+    rather than per process. Each worker counts in its own cell so the
+    supervisor can return the slots of a worker that died mid-request.
+    A limit of 0 disables admission control.
+    """
+
+    def __init__(self, limit: int, cells: int = _CELLS):
+        self.limit = limit
+        self._cells = multiprocessing.Array("i", cells)
+        self._cell = 0
+
+    def bind(self, worker: int):
+        """
+        Counts this process's requests in the cell of worker `worker`.
+        """
+        self._cell = worker % len(self._cells)
+
+    def reset(self, worker: int):
+        """
+        Returns every slot held by worker `worker`, which is gone.
+        """
+        with self._cells.get_lock():
+            self._cells[worker % len(self._cells)] = 0
+
+    def try_acquire(self) -> bool:
+        with self._cells.get_lock():
+            if self.limit and sum(self._cells[:]) >= self.limit:
+                return False
+            self._cells[self._cell] += 1
+            return True
+
+    def release(self):
+        with self._cells.get_lock():
+            self._cells[self._cell] = max(0, self._cells[self._cell] - 1)
+
+    @property
+    def in_flight(self) -> int:
+        return sum(self._cells[:])
+
+
+class AdmissionMiddleware:
+    """
+    Sheds load with a 429 once the node is at capacity. The slot is held
+    until the app has sent (or failed to send) the whole response, and is
+    released however the request ends.
+    """
+
+    def __init__(self, app, counter: AdmissionCounter, exempt: Iterable[str] = ()):
+        self.app = app
+        self.counter = counter
+        self.exempt = frozenset(exempt)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        if not self.counter.try_acquire():
+            logger.warning("request_rejected_overloaded", path=scope["path"])
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "AI service is at capacity"},
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.counter.release()
+
+
+ADMISSION = AdmissionCounter(int(os.getenv("MAX_INFLIGHT_REQUESTS", "0")))
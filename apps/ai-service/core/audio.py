@@ -0,0 +1,249 @@
+import os
+import queue
+import signal
+import subprocess
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+SAMPLE_RATE = 16000
+_BYTES_PER_SAMPLE = 4  # float32
+# Decoded audio buffered ahead of the consumer, in blocks of _BLOCK_S.
+_BLOCK_S = 5
+PCM_READ_AHEAD_S = int(os.getenv("PCM_READ_AHEAD_S", "600"))
+
+
+class AudioDecodeError(RuntimeError):
+    pass
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """
+    Container duration from the header, without decoding. None if unknown.
+    """
+    import av  # pylint: disable=import-outside-toplevel
+
+    try:
+        with av.open(path) as container:
+            if container.duration:
+                return container.duration / 1_000_000
+            stream = container.streams.audio[0]
+            if stream.duration and stream.time_base:
+                return float(stream.duration * stream.time_base)
+    except (av.FFmpegError, IndexError, OSError) as e:  # pylint: disable=no-member
+        logger.warning("audio_probe_failed", path=path, error=str(e))
+    return None
+
+
+def spread_windows(
+    duration: Optional[float], count: int, window_s: float
+) -> List[float]:
+    """
+    Start offsets of up to `count` windows of `window_s` spread evenly over
+    a source of `duration` seconds, each centred in its share of the
+    source. A single window at 0 when the source is short or its length
+    unknown.
+    """
+    if not duration or count <= 1 or duration <= window_s:
+        return [0.0]
+    count = min(count, int(duration // window_s))
+    share = duration / count
+    return [round(index * share + (share - window_s) / 2, 3) for index in range(count)]
+
+
+def ffmpeg_pcm_command(
+    path: str, start: float = 0.0, duration: Optional[float] = None
+) -> List[str]:
+    cmd = ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error"]
+    if start > 0:
+        # Input seeking: jumps via the container index instead of decoding.
+        cmd += ["-ss", f"{start:.3f}"]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += [
+        "-i",
+        path,
+        "-vn",
+        "-sn",
+        "-dn",
+        "-ac",
+        "1",
+        "-ar",
+        str(SAMPLE_RATE),
+        "-f",
+        "f32le",
+        "pipe:1",
+    ]
+    return cmd
+
+
+class PcmStream:
+    """
+    Decodes any container ffmpeg understands (video included) to 16 kHz mono
+    float32 and hands it out while decoding is still in progress.
+
+    A reader thread drains ffmpeg's stdout into a bounded queue so decoding
+    keeps running while the consumer is busy in Whisper, instead of stalling
+    on a full 64 KiB pipe.
+    """
+
+    def __init__(self, path: str, start: float = 0.0, duration: Optional[float] = None):
+        self.path = path
+        self.samples_read = 0
+        self._process = subprocess.Popen(  # noqa: S603  # pylint: disable=consider-using-with
+            ffmpeg_pcm_command(path, start, duration),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        self._blocks: queue.Queue = queue.Queue(max(1, PCM_READ_AHEAD_S // _BLOCK_S))
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._eof = False
+        self._reader = threading.Thread(
+            target=self._read, name="pcm-reader", daemon=True
+        )
+        self._reader.start()
+
+    def _read(self):
+        block_bytes = _BLOCK_S * SAMPLE_RATE * _BYTES_PER_SAMPLE
+        stdout = self._process.stdout
+        try:
+            while True:
+                data = stdout.read(block_bytes)
+                if not data:
+                    break
+                # A float32 sample can straddle two reads only at EOF.
+                usable = len(data) - len(data) % _BYTES_PER_SAMPLE
+                self._blocks.put(np.frombuffer(data[:usable], dtype=np.float32))
+        except (OSError, ValueError):
+            pass  # closed by close()
+        finally:
+            self._blocks.put(None)
+
+    def read(self, seconds: float) -> np.ndarray:
+        """
+        Returns the next `seconds` of audio; shorter at the end of the
+        stream and empty once it is exhausted.
+        """
+        wanted = int(seconds * SAMPLE_RATE)
+        parts = [self._pending]
+        have = len(self._pending)
+        while have < wanted and not self._eof:
+            block = self._blocks.get()
+            if block is None:
+                self._eof = True
+                self._check_exit()
+                break
+            parts.append(block)
+            have += len(block)
+        samples = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        self._pending = samples[wanted:]
+        out = samples[:wanted]
+        self.samples_read += len(out)
+        return out
+
+    @property
+    def exhausted(self) -> bool:
+        return self._eof and self._pending.size == 0
+
+    def _check_exit(self):
+        returncode = self._process.wait()
+        if returncode != 0:
+            stderr = self._process.stderr.read().decode(errors="replace").strip()
+            raise AudioDecodeError(f"ffmpeg failed ({returncode}): {stderr}")
+
+    def close(self):
+        if self._process.poll() is None:
+            try:
+                os.killpg(self._process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self._process.wait()
+        # Unblock a reader waiting on a full queue so it can see EOF.
+        while self._reader.is_alive():
+            try:
+                self._blocks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for pipe in (self._process.stdout, self._process.stderr):
+            pipe.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PcmArray:
+    """
+    Same interface as PcmStream over audio that is already decoded (e.g. a
+    memory-mapped cache entry). Reads are slices, not copies.
+    """
+
+    def __init__(self, samples: np.ndarray):
+        self.samples = samples
+        self.samples_read = 0
+
+    def read(self, seconds: float) -> np.ndarray:
+        end = self.samples_read + int(seconds * SAMPLE_RATE)
+        out = self.samples[self.samples_read : end]
+        self.samples_read += len(out)
+        return out
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def quietest_cut(samples: np.ndarray, lo: int, hi: int, frame_s: float = 0.02) -> int:
+    """
+    Index of the quietest frame in samples[lo:hi], so windows are split in
+    a pause rather than mid-word.
+    """
+    frame = max(1, int(frame_s * SAMPLE_RATE))
+    region = samples[lo:hi]
+    if len(region) < frame * 2:
+        return hi
+    frames = region[: len(region) - len(region) % frame].reshape(-1, frame)
+    energy = np.square(frames).mean(axis=1)
+    return lo + int(np.argmin(energy)) * frame + frame // 2
+
+
+def stream_windows(
+    stream, first_s: float, window_s: float, search_s: float = 5.0
+) -> Iterator[Tuple[float, np.ndarray]]:
+    """
+    Yields (offset seconds, samples) windows of roughly `window_s`, each cut
+    at the quietest point within `search_s` of its nominal end. The first
+    window is `first_s` long so the first segments come back quickly; the
+    last one absorbs the remainder instead of leaving a sliver.
+    """
+    carry = np.zeros(0, dtype=np.float32)
+    offset = 0
+    size_s = first_s
+    while True:
+        search = int(min(search_s, size_s / 2) * SAMPLE_RATE)
+        target = int(size_s * SAMPLE_RATE)
+        wanted = target + search
+        fresh = stream.read(max(0, wanted - len(carry)) / SAMPLE_RATE)
+        samples = np.concatenate([carry, fresh]) if len(carry) else fresh
+        if samples.size == 0:
+            return
+        if len(samples) < wanted:
+            yield offset / SAMPLE_RATE, samples
+            return
+        cut = quietest_cut(samples, target - search, wanted)
+        yield offset / SAMPLE_RATE, samples[:cut]
+        offset += cut
+        carry = samples[cut:]
+        size_s = window_s
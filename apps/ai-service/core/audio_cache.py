@@ -0,0 +1,203 @@
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import structlog
+
+from . import audio, metrics
+
+logger = structlog.get_logger()
+
+AUDIO_CACHE_DIR = os.getenv(
+    "AUDIO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "notflix-audio-cache")
+)
+# 16 kHz float32 is ~230 MB per hour of audio. 0 disables the cache.
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(4 * 1024**3)))
+_SUFFIX = ".f32"
+# Partial entries left behind by a killed worker.
+_STALE_TMP_S = 24 * 3600
+
+AUDIO_CACHE_LOOKUPS = metrics.REGISTRY.counter(
+    "ai_audio_cache_lookups_total", "Decoded-audio cache lookups.", ("result",)
+)
+AUDIO_CACHE_BYTES = metrics.REGISTRY.gauge(
+    "ai_audio_cache_bytes", "Size of the decoded-audio cache directory."
+)
+
+
+class _CachingPcmStream(audio.PcmStream):
+    """
+    PcmStream that tees what it hands out into a cache entry. The entry is
+    published only if the whole source was read; otherwise it is discarded.
+    """
+
+    def __init__(self, cache: "AudioCache", key: str, path: str):
+        self._cache = cache
+        self._key = key
+        self._tmp = cache.directory / f".{key}.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+        self._file = open(self._tmp, "wb")  # pylint: disable=consider-using-with
+        try:
+            super().__init__(path)
+        except BaseException:
+            self._discard()
+            raise
+
+    def read(self, seconds: float) -> np.ndarray:
+        try:
+            out = super().read(seconds)
+        except audio.AudioDecodeError:
+            self._discard()
+            raise
+        if self._file is not None:
+            self._file.write(out.tobytes())
+            if self.exhausted:
+                self._file.close()
+                self._file = None
+                self._cache.publish(self._tmp, self._key)
+        return out
+
+    def _discard(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._tmp.unlink(missing_ok=True)
+
+    def close(self):
+        super().close()
+        self._discard()
+
+
+class AudioCache:
+    """
+    Decoded 16 kHz mono float32 audio, one raw file per source keyed by the
+    source's path, inode, size and modification time. Sources are whole
+    videos, so hashing their content would delay the first segment by a
+    full read of the file.
+
+    Entries are memory-mapped read-only, so later passes (and other worker
+    processes, through the page cache) slice them without decoding or
+    copying. The directory is kept under `max_bytes`, evicting the least
+    recently used entries.
+    """
+
+    def __init__(
+        self, directory: str = AUDIO_CACHE_DIR, max_bytes: int = AUDIO_CACHE_MAX_BYTES
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(path: str) -> str:
+        stat = os.stat(path)
+        signature = (os.path.abspath(path), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        return hashlib.blake2b(repr(signature).encode()).hexdigest()[:32]
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        entry = self.directory / f"{key}{_SUFFIX}"
+        try:
+            samples = np.memmap(entry, dtype=np.float32, mode="r")
+        except (FileNotFoundError, ValueError):
+            # ValueError: a zero-length file cannot be mapped.
+            return None
+        os.utime(entry)  # recency for LRU eviction
+        return samples
+
+    def open(self, path: str, start: float = 0.0, duration: Optional[float] = None):
+        """
+        A PCM source for `path`: the cached samples when present, otherwise
+        a decoding stream that fills the cache as it is read.
+
+        A time range (`start`, `duration` seconds) is sliced from the cached
+        samples or decoded on its own with input seeking, so the skipped
+        audio is never decoded. Partial decodes are not cached.
+        """
+        if start > 0 or duration is not None:
+            return self._open_range(path, start, duration)
+        if not self.enabled:
+            return audio.PcmStream(path)
+        key = self.key(path)
+        samples = self.load(key)
+        if samples is not None:
+            AUDIO_CACHE_LOOKUPS.inc(result="hit")
+            return audio.PcmArray(samples)
+        AUDIO_CACHE_LOOKUPS.inc(result="miss")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return _CachingPcmStream(self, key, path)
+
+    def _open_range(self, path: str, start: float, duration: Optional[float]):
+        samples = self.load(self.key(path)) if self.enabled else None
+        if samples is None:
+            return audio.PcmStream(path, start, duration)
+        AUDIO_CACHE_LOOKUPS.inc(result="hit")
+        first = int(start * audio.SAMPLE_RATE)
+        last = None if duration is None else first + int(duration * audio.SAMPLE_RATE)
+        return audio.PcmArray(samples[first:last])
+
+    def decode(
+        self, path: str, start: float = 0.0, duration: Optional[float] = None
+    ) -> np.ndarray:
+        """
+        The decoded source (or the given range of it), from the cache if
+        possible.
+        """
+        with self.open(path, start, duration) as source:
+            if isinstance(source, audio.PcmArray):
+                return source.samples
+            parts = []
+            while True:
+                block = source.read(60.0)
+                if block.size == 0:
+                    break
+                parts.append(block)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    def publish(self, tmp: Path, key: str):
+        os.replace(tmp, self.directory / f"{key}{_SUFFIX}")
+        self.evict()
+
+    def evict(self):
+        now = time.time()
+        for tmp in self.directory.glob(".*"):
+            try:
+                if now - tmp.stat().st_mtime > _STALE_TMP_S:
+                    tmp.unlink()
+            except FileNotFoundError:
+                pass
+        entries = []
+        for entry in self.directory.glob(f"*{_SUFFIX}"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # Mappings held by readers stay valid after the unlink.
+            entry.unlink(missing_ok=True)
+            total -= size
+            logger.info("audio_cache_evicted", entry=entry.name, size=size)
+        AUDIO_CACHE_BYTES.set(total)
+
+    def stats(self) -> dict:
+        entries = (
+            list(self.directory.glob(f"*{_SUFFIX}")) if self.directory.exists() else []
+        )
+        return {
+            "entries": len(entries),
+            "bytes": sum(entry.stat().st_size for entry in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+AUDIO_CACHE = AudioCache()
@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import structlog
+
+from . import deadlines, metrics
+
+logger = structlog.get_logger()
+
+MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "0") == "1"
+# Longest a batch leader waits for company when the engine is idle.
+MICRO_BATCH_MAX_WINDOW_MS = float(os.getenv("MICRO_BATCH_MAX_WINDOW_MS", "10"))
+# Texts per merged call: starts at the initial size and adapts within bounds
+# so a merged call stays near the latency target.
+MICRO_BATCH_MAX_ITEMS = int(os.getenv("MICRO_BATCH_MAX_ITEMS", "64"))
+MICRO_BATCH_MIN_ITEMS = int(os.getenv("MICRO_BATCH_MIN_ITEMS", "8"))
+MICRO_BATCH_ITEMS_CAP = int(os.getenv("MICRO_BATCH_ITEMS_CAP", "256"))
+MICRO_BATCH_TARGET_MS = float(os.getenv("MICRO_BATCH_TARGET_MS", "250"))
+
+_EWMA_ALPHA = 0.2
+
+BATCH_REQUESTS = metrics.REGISTRY.histogram(
+    "ai_micro_batch_requests",
+    "Requests merged into one engine call.",
+    ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+BATCH_ITEMS = metrics.REGISTRY.histogram(
+    "ai_micro_batch_items",
+    "Texts per merged engine call.",
+    ("batcher",),
+    buckets=(1, 4, 8, 16, 32, 64, 128, 256),
+)
+
+
+class _Batch:
+    def __init__(self):
+        self.texts: List[str] = []
+        self.callers = 0
+        self.deadlines: List[Optional[float]] = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results: Optional[List[Any]] = None
+        self.error: Optional[Exception] = None
+
+
+class _KeyState:
+    def __init__(self, max_items: int):
+        self.open: Optional[_Batch] = None
+        self.runner = threading.Lock()
+        self.max_items = max_items
+        self.interarrival_s: Optional[float] = None
+        self.last_arrival: Optional[float] = None
+
+    def observe_arrival(self, now: float):
+        if self.last_arrival is not None:
+            gap = now - self.last_arrival
+            self.interarrival_s = (
+                gap
+                if self.interarrival_s is None
+                else _EWMA_ALPHA * gap + (1 - _EWMA_ALPHA) * self.interarrival_s
+            )
+        self.last_arrival = now
+
+
+class MicroBatcher:
+    """
+    Merges concurrent list-in/list-out engine calls that share a key (a
+    language pair, a spaCy model) into one call and splits the results back
+    per caller, in order.
+
+    Only one merged call per key runs at a time; requests arriving while it
+    runs collect into the next batch, so batching grows with load and adds
+    no latency when traffic is sparse. When the engine is idle the first
+    caller waits a short window, sized from the recent arrival rate, for
+    others to join. The batch size limit shrinks when merged calls exceed
+    the latency target and grows back when they finish well within it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        enabled: bool = MICRO_BATCH_ENABLED,
+        max_window_ms: float = MICRO_BATCH_MAX_WINDOW_MS,
+        max_items: int = MICRO_BATCH_MAX_ITEMS,
+        target_ms: float = MICRO_BATCH_TARGET_MS,
+    ):
+        self.name = name
+        self.enabled = enabled
+        self.max_window_s = max_window_ms / 1000
+        self.initial_items = max_items
+        self.target_s = target_ms / 1000
+        self._states: Dict[Hashable, _KeyState] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self, key: Hashable, texts: List[str], run: Callable[[List[str]], List[Any]]
+    ) -> List[Any]:
+        if not self.enabled or not texts:
+            return run(texts)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _KeyState(self.initial_items)
+            state.observe_arrival(time.monotonic())
+            batch = state.open
+            leader = batch is None or len(batch.texts) + len(texts) > state.max_items
+            if leader:
+                batch = state.open = _Batch()
+            offset = len(batch.texts)
+            batch.texts.extend(texts)
+            batch.callers += 1
+            batch.deadlines.append(deadlines.current())
+            if len(batch.texts) >= state.max_items:
+                state.open = None
+                batch.full.set()
+
+        if leader:
+            self._lead(state, batch, run)
+        elif not batch.done.wait(timeout=deadlines.remaining()):
+            # The merged call still runs for the callers that can wait.
+            raise deadlines.DeadlineExceeded("batched")
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[offset : offset + len(texts)]
+
+    def _window(self, state: _KeyState) -> float:
+        gap = state.interarrival_s
+        if gap is None or gap > self.max_window_s:
+            return 0.0
+        return min(self.max_window_s, 2 * gap)
+
+    def _lead(self, state: _KeyState, batch: _Batch, run):
+        window = self._window(state)
+        if window and not state.runner.locked():
+            batch.full.wait(window)
+        with state.runner:
+            with self._lock:
+                if state.open is batch:
+                    state.open = None
+            started = time.perf_counter()
+            try:
+                # The merged call is worth finishing while any caller waits.
+                with deadlines.scope(deadlines.latest(batch.deadlines)):
+                    batch.results = run(batch.texts)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                batch.error = e
+            finally:
+                self._adapt(state, len(batch.texts), time.perf_counter() - started)
+                BATCH_REQUESTS.observe(batch.callers, batcher=self.name)
+                BATCH_ITEMS.observe(len(batch.texts), batcher=self.name)
+                batch.done.set()
+
+    def _adapt(self, state: _KeyState, items: int, elapsed: float):
+        with self._lock:
+            if elapsed > self.target_s and state.max_items > MICRO_BATCH_MIN_ITEMS:
+                state.max_items = max(
+                    MICRO_BATCH_MIN_ITEMS, int(state.max_items * 0.75)
+                )
+            elif elapsed < self.target_s / 2 and items >= state.max_items:
+                state.max_items = min(MICRO_BATCH_ITEMS_CAP, state.max_items + 8)
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                str(key): {
+                    "max_items": state.max_items,
+                    "window_ms": round(self._window(state) * 1000, 2),
+                }
+                for key, state in self._states.items()
+            }
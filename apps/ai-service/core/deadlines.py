@@ -0,0 +1,77 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+# Remaining time budget of the caller, in milliseconds, counted from when the
+# request reaches the service. Relative so clock skew between hosts does not
+# matter.
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(RuntimeError):
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded ({stage})")
+        self.stage = stage
+
+
+def parse_timeout_ms(raw: Optional[str]) -> Optional[float]:
+    """
+    Absolute monotonic deadline for a header value; None if absent or invalid.
+    """
+    if not raw:
+        return None
+    try:
+        budget_ms = float(raw)
+    except ValueError:
+        return None
+    if budget_ms <= 0:
+        return None
+    return time.monotonic() + budget_ms / 1000
+
+
+@contextmanager
+def scope(deadline: Optional[float]):
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(stage: str):
+    """
+    Raises DeadlineExceeded if the current request's deadline has passed.
+    Cheap enough to call between batches, documents or segments.
+    """
+    if expired():
+        raise DeadlineExceeded(stage)
+
+
+def latest(deadlines: Iterable[Optional[float]]) -> Optional[float]:
+    """
+    Deadline for work done on behalf of several callers: it is only useless
+    once every caller has given up, and never if any of them has no deadline.
+    """
+    result = None
+    for deadline in deadlines:
+        if deadline is None:
+            return None
+        result = deadline if result is None else max(result, deadline)
+    return result
@@ -0,0 +1,541 @@
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import httpx
+import structlog
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from . import encoding, metrics
+
+logger = structlog.get_logger()
+
+# Dispatcher mode: this process only routes. DISPATCHER_WORKERS starts that
+# many local workers on consecutive ports; DISPATCHER_WORKER_URLS connects to
+# workers that are already running (other containers or nodes) instead.
+DISPATCHER_WORKERS = int(os.getenv("DISPATCHER_WORKERS", "0"))
+DISPATCHER_WORKER_URLS = os.getenv("DISPATCHER_WORKER_URLS", "")
+DISPATCHER_BASE_PORT = int(os.getenv("DISPATCHER_BASE_PORT", "8100"))
+DISPATCHER_HEALTH_INTERVAL_S = float(os.getenv("DISPATCHER_HEALTH_INTERVAL_S", "2"))
+# Consecutive failed probes before a worker leaves the ring. A refused
+# connection while proxying removes it at once.
+DISPATCHER_MAX_PROBE_FAILURES = int(os.getenv("DISPATCHER_MAX_PROBE_FAILURES", "2"))
+DISPATCHER_PROXY_TIMEOUT_S = float(os.getenv("DISPATCHER_PROXY_TIMEOUT_S", "600"))
+# Virtual nodes per worker; more points spread keys more evenly.
+DISPATCHER_RING_REPLICAS = int(os.getenv("DISPATCHER_RING_REPLICAS", "64"))
+
+_APP_DIR = Path(__file__).resolve().parents[1]
+# A worker that dies sooner than this after starting is respawned with a
+# delay so a crash loop does not spin the CPU.
+_MIN_WORKER_LIFETIME_S = 5.0
+_ROUTE_HISTORY = 10_000
+_KEYED_PATHS = {
+    "/translate",
+    "/filter",
+    "/lemma_index",
+    "/transcribe",
+    "/transcribe/stream",
+    "/detect_language",
+}
+_HOP_BY_HOP = {
+    "connection",
+    "content-length",
+    "host",
+    "keep-alive",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
+DISPATCHED_REQUESTS = metrics.REGISTRY.counter(
+    "ai_dispatch_requests_total",
+    "Requests proxied by the dispatcher, by worker.",
+    ("worker",),
+)
+DISPATCH_FAILOVERS = metrics.REGISTRY.counter(
+    "ai_dispatch_failovers_total",
+    "Requests retried on the next worker because theirs was unreachable.",
+)
+HEALTHY_WORKERS = metrics.REGISTRY.gauge(
+    "ai_dispatch_healthy_workers", "Workers currently in the hash ring."
+)
+
+
+class HashRing:
+    """
+    Consistent hashing over worker URLs. Removing a worker only moves the
+    keys it owned; everything else keeps its (warm) worker.
+    """
+
+    def __init__(
+        self, nodes: Iterable[str] = (), replicas: int = DISPATCHER_RING_REPLICAS
+    ):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(set(self._owners.values()))
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._owners.values()
+
+    def add(self, node: str):
+        for replica in range(self.replicas):
+            point = self._hash(f"{node}#{replica}")
+            if point not in self._owners:
+                bisect.insort(self._points, point)
+                self._owners[point] = node
+
+    def remove(self, node: str):
+        for replica in range(self.replicas):
+            point = self._hash(f"{node}#{replica}")
+            if self._owners.get(point) == node:
+                del self._owners[point]
+                self._points.remove(point)
+
+    def preference(self, key: str) -> List[str]:
+        """
+        Every node in the order it would take over `key`: the owner first,
+        then the nodes that inherit it as earlier ones fail.
+        """
+        if not self._points:
+            return []
+        order: List[str] = []
+        start = bisect.bisect(self._points, self._hash(key))
+        for offset in range(len(self._points)):
+            node = self._owners[self._points[(start + offset) % len(self._points)]]
+            if node not in order:
+                order.append(node)
+        return order
+
+
+def routing_key(path: str, headers, body: bytes) -> Optional[str]:
+    """
+    What a request needs warm: the language pair for /translate and the spaCy
+    language for /filter and /lemma_index. Transcriptions go by file, which
+    keeps the decode cache and request coalescing (both per process)
+    effective. None when any worker will do (media jobs, system endpoints).
+    """
+    if path not in _KEYED_PATHS:
+        return None
+    try:
+        coding = headers.get("content-encoding", "").strip().lower()
+        if coding and coding != "identity":
+            body = encoding.decompress(body, coding)
+        payload = json.loads(body)
+    except (ValueError, OverflowError, OSError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+    if path == "/translate":
+        return f"translate:{payload.get('source_lang')}-{payload.get('target_lang')}"
+    if path in ("/filter", "/lemma_index"):
+        return f"filter:{payload.get('language')}"
+    return f"audio:{payload.get('file_path')}"
+
+
+class Worker:  # pylint: disable=too-many-instance-attributes
+    """
+    One worker process, started here (`port` set) or reached by URL.
+    """
+
+    def __init__(self, url: str, port: Optional[int] = None):
+        self.url = url.rstrip("/")
+        self.port = port
+        self.process: Optional[subprocess.Popen] = None
+        self.started = 0.0
+        self.restarts = 0
+        self.probe_failures = 0
+        self.last_error: Optional[str] = None
+        self.health: Optional[Dict] = None
+
+    def spawn(self, env: Dict[str, str]):
+        command = [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(self.port),
+        ]
+        self.process = subprocess.Popen(  # noqa: S603  # pylint: disable=consider-using-with
+            command, cwd=_APP_DIR, env={**os.environ, **env}
+        )
+        self.started = time.monotonic()
+        logger.info("dispatch_worker_started", worker=self.url, pid=self.process.pid)
+
+    def exited(self) -> Optional[int]:
+        return self.process.poll() if self.process is not None else None
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+    def describe(self) -> Dict:
+        return {
+            "url": self.url,
+            "pid": self.process.pid if self.process is not None else None,
+            "restarts": self.restarts,
+            "error": self.last_error,
+            "health": self.health,
+        }
+
+
+class WorkerPool:
+    """
+    The workers, the ring of healthy ones and the client that proxies to
+    them. Local workers are respawned when they exit; any worker that stops
+    answering leaves the ring until it passes a probe again.
+    """
+
+    def __init__(
+        self,
+        workers: Sequence[Worker],
+        replicas: int = DISPATCHER_RING_REPLICAS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.workers = {worker.url: worker for worker in workers}
+        self.ring = HashRing(replicas=replicas)
+        self.client = httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(DISPATCHER_PROXY_TIMEOUT_S, connect=2.0),
+        )
+        self._next = itertools.count()
+        self._routes: "OrderedDict[str, str]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "WorkerPool":
+        urls = [url.strip() for url in DISPATCHER_WORKER_URLS.split(",") if url.strip()]
+        if urls:
+            return cls([Worker(url) for url in urls])
+        return cls(
+            [
+                Worker(f"http://127.0.0.1:{port}", port=port)
+                for port in range(
+                    DISPATCHER_BASE_PORT, DISPATCHER_BASE_PORT + DISPATCHER_WORKERS
+                )
+            ]
+        )
+
+    def start(self):
+        for worker in self.workers.values():
+            if worker.port is not None:
+                worker.spawn(self._preload_env(worker))
+
+    def _preload_env(self, worker: Worker) -> Dict[str, str]:
+        # Each worker warms only the pipelines and pairs the ring sends it.
+        ring = HashRing(self.workers, self.ring.replicas)
+        env = {"AI_SERVICE_WORKERS": "1", "AI_SERVICE_WORKER_ID": str(worker.port)}
+        for variable, prefix in (
+            ("SPACY_PRELOAD_LANGUAGES", "filter"),
+            ("TRANSLATION_PRELOAD_PAIRS", "translate"),
+        ):
+            default = "es,en" if prefix == "filter" else ""
+            items = [
+                item.strip()
+                for item in os.getenv(variable, default).split(",")
+                if item.strip()
+            ]
+            env[variable] = ",".join(
+                item
+                for item in items
+                if ring.preference(f"{prefix}:{item}")[0] == worker.url
+            )
+        return env
+
+    async def stop(self):
+        for worker in self.workers.values():
+            worker.stop()
+        await self.client.aclose()
+
+    def mark_down(self, worker: Worker, reason: str):
+        worker.last_error = reason
+        if worker.url in self.ring:
+            self.ring.remove(worker.url)
+            HEALTHY_WORKERS.set(len(self.ring.nodes))
+            logger.error("dispatch_worker_down", worker=worker.url, reason=reason)
+
+    def mark_up(self, worker: Worker):
+        worker.last_error = None
+        worker.probe_failures = 0
+        if worker.url not in self.ring:
+            self.ring.add(worker.url)
+            HEALTHY_WORKERS.set(len(self.ring.nodes))
+            logger.info("dispatch_worker_up", worker=worker.url)
+
+    def candidates(self, key: Optional[str]) -> List[Worker]:
+        """
+        Healthy workers in the order to try them.
+        """
+        if key is None:
+            nodes = self.ring.nodes
+            if not nodes:
+                return []
+            first = next(self._next) % len(nodes)
+            order = nodes[first:] + nodes[:first]
+        else:
+            order = self.ring.preference(key)
+        return [self.workers[url] for url in order]
+
+    def remember(self, request_id: str, worker: Worker):
+        self._routes[request_id] = worker.url
+        self._routes.move_to_end(request_id)
+        while len(self._routes) > _ROUTE_HISTORY:
+            self._routes.popitem(last=False)
+
+    def served(self, request_id: str) -> Optional[Worker]:
+        url = self._routes.get(request_id)
+        return self.workers.get(url) if url else None
+
+    async def probe(self, worker: Worker):
+        """
+        Respawns a local worker that exited, then checks its health.
+        """
+        exit_code = worker.exited()
+        if exit_code is not None:
+            self.mark_down(worker, f"exited with {exit_code}")
+            worker.restarts += 1
+            if time.monotonic() - worker.started < _MIN_WORKER_LIFETIME_S:
+                await asyncio.sleep(1.0)
+            worker.spawn(self._preload_env(worker))
+            return
+        await self.check_health(worker)
+
+    async def check_health(self, worker: Worker):
+        try:
+            response = await self.client.get(f"{worker.url}/health", timeout=2.0)
+            response.raise_for_status()
+            worker.health = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            worker.health = None
+            worker.probe_failures += 1
+            if worker.probe_failures >= DISPATCHER_MAX_PROBE_FAILURES:
+                self.mark_down(worker, f"health check failed: {e!r}")
+            return
+        self.mark_up(worker)
+
+    async def fetch(self, worker: Worker, path: str) -> Optional[httpx.Response]:
+        """
+        A worker's answer on a system endpoint; None when it cannot be reached.
+        """
+        try:
+            return await self.client.get(f"{worker.url}{path}", timeout=2.0)
+        except httpx.HTTPError:
+            return None
+
+    async def readiness(self, worker: Worker) -> Dict:
+        answer = await self.fetch(worker, "/ready")
+        try:
+            engines = answer.json().get("engines") if answer is not None else None
+        except ValueError:
+            engines = None
+        return {
+            "url": worker.url,
+            "ready": answer is not None and answer.status_code == 200,
+            "engines": engines,
+        }
+
+    async def monitor(self, interval: float = DISPATCHER_HEALTH_INTERVAL_S):
+        while True:
+            await asyncio.gather(*(self.probe(w) for w in self.workers.values()))
+            await asyncio.sleep(interval)
+
+
+def merge_metrics(own: str, scraped: Dict[str, str]) -> str:
+    """
+    One exposition of the dispatcher's metrics and every worker's, whose
+    samples get a `worker` label. Samples stay grouped under their family's
+    HELP and TYPE lines, as the text format requires.
+    """
+    headers: Dict[str, Dict[str, str]] = {}
+    samples: Dict[str, List[str]] = {}
+    for worker, text in [(None, own), *scraped.items()]:
+        family = None
+        for line in text.splitlines():
+            if line.startswith("#"):
+                parts = line.split(maxsplit=3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    family = parts[2]
+                    headers.setdefault(family, {}).setdefault(parts[1], line)
+                    samples.setdefault(family, [])
+            elif line.strip() and family is not None:
+                samples[family].append(
+                    line if worker is None else _with_label(line, "worker", worker)
+                )
+    lines = []
+    for family, header in headers.items():
+        lines.extend(header[kind] for kind in ("HELP", "TYPE") if kind in header)
+        lines.extend(samples[family])
+    return "\n".join(lines) + "\n"
+
+
+def _with_label(sample: str, name: str, value: str) -> str:
+    label = f'{name}="{value}"'
+    brace, space = sample.find("{"), sample.find(" ")
+    if brace != -1 and brace < space:
+        rest = sample[brace + 1 :]
+        separator = "" if rest.startswith("}") else ","
+        return f"{sample[: brace + 1]}{label}{separator}{rest}"
+    return f"{sample[:space]}{{{label}}}{sample[space:]}"
+
+
+def _forwarded_headers(headers) -> Dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in _HOP_BY_HOP}
+
+
+async def _proxy(pool: WorkerPool, request: Request) -> Response:
+    body = await request.body()
+    headers = _forwarded_headers(request.headers)
+    # The dispatcher assigns the request ID so /traces can find the worker.
+    request_id = request.headers.get("x-request-id") or str(uuid.uuid4())
+    headers["x-request-id"] = request_id
+    path = request.url.path
+    key = routing_key(path, request.headers, body)
+    candidates = pool.candidates(key)
+    if path.startswith("/traces/"):
+        served = pool.served(path.rsplit("/", 1)[-1])
+        if served is not None and served.url in pool.ring:
+            candidates = [served] + [w for w in candidates if w is not served]
+
+    for attempt, worker in enumerate(candidates):
+        outgoing = pool.client.build_request(
+            request.method,
+            f"{worker.url}{path}",
+            params=request.query_params,
+            headers=headers,
+            content=body,
+        )
+        try:
+            upstream = await pool.client.send(outgoing, stream=True)
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            # Nothing reached the worker, so retrying elsewhere is safe. The
+            # ring drops it; its keys move to their next owner.
+            pool.mark_down(worker, repr(e))
+            DISPATCH_FAILOVERS.inc()
+            continue
+        DISPATCHED_REQUESTS.inc(worker=worker.url)
+        pool.remember(request_id, worker)
+        if attempt:
+            logger.warning(
+                "dispatch_failover", worker=worker.url, key=key, attempt=attempt
+            )
+        return StreamingResponse(
+            upstream.aiter_raw(),
+            status_code=upstream.status_code,
+            headers=_forwarded_headers(upstream.headers),
+            background=BackgroundTask(upstream.aclose),
+        )
+
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "No healthy AI worker"},
+        headers={"Retry-After": "5", "X-Request-ID": request_id},
+    )
+
+
+def create_app(pool: WorkerPool, monitor: bool = True) -> FastAPI:
+    """
+    The dispatcher: aggregated /health, /ready and /metrics, everything else
+    proxied.
+    """
+
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI):
+        pool.start()
+        task = asyncio.create_task(pool.monitor()) if monitor else None
+        yield
+        if task is not None:
+            task.cancel()
+        await pool.stop()
+
+    app = FastAPI(title="AI Service dispatcher", lifespan=lifespan, openapi_url=None)
+
+    @app.get("/health")
+    async def health():
+        # Fresh answers; respawning is left to the monitor.
+        await asyncio.gather(*(pool.check_health(w) for w in pool.workers.values()))
+        healthy = [url for url in pool.workers if url in pool.ring]
+        return JSONResponse(
+            status_code=200 if healthy else 503,
+            content={
+                "status": "ai_service_active" if healthy else "no_healthy_workers",
+                "mode": "dispatcher",
+                "healthy_workers": len(healthy),
+                "workers": [
+                    {**worker.describe(), "healthy": worker.url in pool.ring}
+                    for worker in pool.workers.values()
+                ],
+            },
+        )
+
+    @app.get("/ready")
+    async def ready():
+        # Any worker may own a key, so the node is ready only when all are.
+        states = await asyncio.gather(
+            *(pool.readiness(w) for w in pool.workers.values())
+        )
+        all_ready = all(state["ready"] for state in states)
+        return JSONResponse(
+            status_code=200 if all_ready else 503,
+            content={"ready": all_ready, "mode": "dispatcher", "workers": states},
+        )
+
+    @app.get("/metrics")
+    async def dispatcher_metrics():
+        workers = list(pool.workers.values())
+        answers = await asyncio.gather(*(pool.fetch(w, "/metrics") for w in workers))
+        scraped = {
+            worker.url: answer.text
+            for worker, answer in zip(workers, answers, strict=True)
+            if answer is not None and answer.status_code == 200
+        }
+        return Response(
+            content=merge_metrics(metrics.REGISTRY.render(), scraped),
+            media_type=metrics.CONTENT_TYPE,
+        )
+
+    @app.api_route(
+        "/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD"]
+    )
+    async def proxy(request: Request):
+        return await _proxy(pool, request)
+
+    return app
+
+
+def configured() -> bool:
+    return DISPATCHER_WORKERS > 0 or bool(DISPATCHER_WORKER_URLS.strip())
+
+
+def serve(host: str, port: int):
+    pool = WorkerPool.from_env()
+    logger.info(
+        "dispatcher_listening", host=host, port=port, workers=list(pool.workers)
+    )
+    uvicorn.run(create_app(pool), host=host, port=port)
@@ -0,0 +1,326 @@
+import gzip
+import json
+import os
+import zlib
+from typing import Any, List, Optional, Tuple
+
+import pydantic_core
+import structlog
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+
+from . import tracing
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional speedup
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional speedup
+    zstandard = None
+
+logger = structlog.get_logger()
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_ALIASES = {
+    MSGPACK_MEDIA_TYPE,
+    "application/x-msgpack",
+    "application/vnd.msgpack",
+}
+
+# Responses smaller than this are sent as-is; compressing them costs more CPU
+# than it saves on the wire between containers.
+COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "4096"))
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
+ZSTD_LEVEL = int(os.getenv("RESPONSE_ZSTD_LEVEL", "3"))
+_DECODE_ERRORS = (ValueError, OSError, zlib.error) + (
+    (zstandard.ZstdError,) if zstandard is not None else ()
+)
+# Upper bound for a decompressed request body (decompression bomb guard).
+MAX_REQUEST_BODY_BYTES = int(os.getenv("REQUEST_BODY_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def _parse_quality_list(header: Optional[str]) -> List[Tuple[str, float]]:
+    """
+    Parses an Accept / Accept-Encoding header into (value, q) pairs.
+    """
+    items = []
+    for part in (header or "").split(","):
+        fields = part.strip().split(";")
+        value = fields[0].strip().lower()
+        if not value:
+            continue
+        quality = 1.0
+        for param in fields[1:]:
+            name, _, raw = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(raw)
+                except ValueError:
+                    quality = 0.0
+        items.append((value, quality))
+    return items
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """
+    Picks msgpack only when the client explicitly prefers it; JSON otherwise.
+    """
+    if msgpack is None:
+        return JSON_MEDIA_TYPE
+    best_msgpack = 0.0
+    best_json = 0.0
+    for value, quality in _parse_quality_list(accept):
+        if value in _MSGPACK_ALIASES:
+            best_msgpack = max(best_msgpack, quality)
+        elif value in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            best_json = max(best_json, quality)
+    if best_msgpack > 0 and best_msgpack >= best_json:
+        return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def negotiate_content_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Returns "zstd", "gzip" or None. zstd wins ties because it is cheaper to
+    produce at a comparable ratio.
+    """
+    available = {"gzip": 0.0}
+    if zstandard is not None:
+        available["zstd"] = 0.0
+    wildcard = None
+    for value, quality in _parse_quality_list(accept_encoding):
+        if value in available:
+            available[value] = max(available[value], quality)
+        elif value == "*":
+            wildcard = quality
+    if wildcard:
+        for coding, quality in available.items():
+            if quality == 0.0:
+                available[coding] = wildcard
+    ranked = sorted(
+        ((quality, coding == "zstd", coding) for coding, quality in available.items()),
+        reverse=True,
+    )
+    quality, _, coding = ranked[0]
+    return coding if quality > 0 else None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches `etag`: "*", or any tag in its
+    list under the weak comparison the header calls for (a W/ prefix on
+    either side is ignored).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == wanted for tag in if_none_match.split(",")
+    )
+
+
+def dumps_json(payload: Any) -> str:
+    """
+    Fast JSON encoding for hot paths such as SSE frames.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload).decode()  # pylint: disable=no-member
+    return json.dumps(payload)
+
+
+def encode_response(request: Request, payload: BaseModel) -> Response:
+    """
+    Serializes a response model as JSON or msgpack according to `Accept`.
+    JSON is produced directly by pydantic-core, skipping the dict round trip.
+    """
+    media_type = negotiate_media_type(request.headers.get("accept"))
+    with tracing.span("serialize", media_type=media_type):
+        if media_type == MSGPACK_MEDIA_TYPE:
+            body = msgpack.packb(payload.model_dump(), use_bin_type=True)
+        else:
+            body = pydantic_core.to_json(payload)
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def decompress(
+    body: bytes, coding: str, max_size: int = MAX_REQUEST_BODY_BYTES
+) -> bytes:
+    """
+    Decompresses a request body, refusing anything that inflates past max_size.
+    """
+    if coding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd request bodies are not supported")
+        reader = zstandard.ZstdDecompressor().stream_reader(body)
+        data = reader.read(max_size + 1)
+    elif coding in ("gzip", "x-gzip"):
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        data = inflater.decompress(body, max_size + 1)
+    else:
+        raise ValueError(f"Unsupported Content-Encoding: {coding}")
+    if len(data) > max_size:
+        raise OverflowError("Decompressed request body too large")
+    return data
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware for compressed request bodies and responses.
+
+    Buffered responses above the size threshold are compressed with the best
+    encoding the client accepts. Streaming responses (SSE) pass through
+    untouched so events are never held back.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        request_coding = headers.get("content-encoding", "").strip().lower()
+        if request_coding and request_coding != "identity":
+            try:
+                body = decompress(await _read_body(receive), request_coding)
+            except OverflowError:
+                await _send_error(scope, receive, send, 413, "Request body too large")
+                return
+            except _DECODE_ERRORS as e:
+                logger.warning(
+                    "request_decompression_failed", coding=request_coding, error=str(e)
+                )
+                await _send_error(
+                    scope, receive, send, 400, "Invalid request body encoding"
+                )
+                return
+            scope = _with_plain_body_headers(scope, len(body))
+            receive = _replay_body(body, receive)
+
+        coding = negotiate_content_encoding(headers.get("accept-encoding"))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(
+            scope, receive, _CompressingSender(send, coding, self.minimum_size)
+        )
+
+
+class _CompressingSender:
+    def __init__(self, send, coding: str, minimum_size: int):
+        self._send = send
+        self._coding = coding
+        self._minimum_size = minimum_size
+        self._start = None
+        self._streaming = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self._start = message
+            return
+        if message["type"] != "http.response.body" or self._start is None:
+            await self._send(message)
+            return
+
+        if self._streaming:
+            await self._send(message)
+            return
+
+        start, self._start = self._start, None
+        body = message.get("body", b"")
+        if message.get("more_body", False):
+            # First chunk of a stream: forward it unmodified from here on.
+            self._streaming = True
+            await self._send(start)
+            await self._send(message)
+            return
+
+        headers = MutableHeaders(raw=start["headers"])
+        content_type = headers.get("content-type", "")
+        if (
+            len(body) < self._minimum_size
+            or "content-encoding" in headers
+            or content_type.startswith("text/event-stream")
+        ):
+            await self._send(start)
+            await self._send(message)
+            return
+
+        body = compress(body, self._coding)
+        headers["Content-Encoding"] = self._coding
+        headers["Content-Length"] = str(len(body))
+        headers.add_vary_header("Accept-Encoding")
+        await self._send(start)
+        await self._send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_REQUEST_BODY_BYTES:
+            raise OverflowError("Request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replay_body(body: bytes, receive):
+    """
+    Serves the decoded body once, then defers to the original `receive` so
+    only a real client disconnect is reported (SSE responses listen for it).
+    """
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if sent:
+            return await receive()
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return replay
+
+
+def _with_plain_body_headers(scope, length: int):
+    raw = [
+        (name, value)
+        for name, value in scope["headers"]
+        if name not in (b"content-encoding", b"content-length")
+    ]
+    raw.append((b"content-length", str(length).encode()))
+    return {**scope, "headers": raw}
+
+
+async def _send_error(scope, receive, send, status_code: int, detail: str):
+    response = JSONResponse(status_code=status_code, content={"detail": detail})
+    await response(scope, receive, send)
@@ -0,0 +1,166 @@
+import asyncio
+import contextvars
+import os
+import threading
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+from .encoding import dumps_json
+
+# Events buffered between the producer thread and a slow client before the
+# producer blocks.
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "64"))
+# Segments arriving within this window of the first are sent as one event.
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "250"))
+SSE_COALESCE_MAX = int(os.getenv("SSE_COALESCE_MAX", "32"))
+# A progress event is sent after this long without any other event, so
+# proxies do not time out while a slow window is being transcribed.
+SSE_HEARTBEAT_S = float(os.getenv("SSE_HEARTBEAT_S", "15"))
+
+_END = object()
+
+
+class _ThreadPump:
+    """
+    Runs a blocking event iterator on its own thread and hands the events to
+    the event loop through a bounded asyncio.Queue. The producer blocks
+    while the queue is full, and closes the iterator (on its own thread)
+    once the consumer has gone.
+    """
+
+    def __init__(self, source: Iterator, name: str, maxsize: int):
+        self._source = source
+        self._name = name
+        self._slots = threading.Semaphore(maxsize)
+        # One extra place for the end marker or error.
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize + 1)
+        self._stop = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        # Carries the request's contextvars (deadline, log bindings) along.
+        context = contextvars.copy_context()
+        threading.Thread(
+            target=context.run,
+            args=(self._produce,),
+            name=f"{self._name}-producer",
+            daemon=True,
+        ).start()
+
+    def _deliver(self, item) -> bool:
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+            return True
+        except RuntimeError:  # event loop closed
+            return False
+
+    def _produce(self):
+        try:
+            for item in self._source:
+                # pylint: disable-next=consider-using-with
+                while not self._slots.acquire(timeout=0.5):
+                    if self._stop.is_set():
+                        return
+                if self._stop.is_set() or not self._deliver(item):
+                    return
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            self._deliver(e)
+            return
+        finally:
+            close = getattr(self._source, "close", None)
+            if callable(close):
+                close()
+        self._deliver(_END)
+
+    async def get(self):
+        item = await self._queue.get()
+        if item is not _END and not isinstance(item, Exception):
+            self._slots.release()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def stop(self):
+        self._stop.set()
+
+
+def _frame(event: Dict) -> Dict:
+    return {"event": event.get("type", "segment"), "data": dumps_json(event)}
+
+
+def _segments_frame(batch: List[Dict]) -> Dict:
+    if len(batch) == 1:
+        return _frame(batch[0])
+    return _frame({"type": "segments", "segments": batch})
+
+
+async def sse_events(
+    source: Iterator[Dict],
+    name: str,
+    queue_size: int = SSE_QUEUE_SIZE,
+    coalesce_ms: float = SSE_COALESCE_MS,
+    coalesce_max: int = SSE_COALESCE_MAX,
+    heartbeat_s: float = SSE_HEARTBEAT_S,
+) -> AsyncIterator[Dict]:
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    """
+    SSE frames for a blocking event iterator. Segment events produced close
+    together are combined into one `segments` event (up to `coalesce_max`
+    within `coalesce_ms` of the first); a `progress` event goes out after
+    `heartbeat_s` without anything else to send.
+    """
+    loop = asyncio.get_running_loop()
+    pump = _ThreadPump(source, name, queue_size)
+    pump.start()
+    position = 0.0
+    start = 0.0
+    duration = None
+    pending = None
+    try:
+        while True:
+            if pending is not None:
+                item, pending = pending, None
+            else:
+                try:
+                    item = await asyncio.wait_for(pump.get(), heartbeat_s)
+                except asyncio.TimeoutError:
+                    yield _frame(_progress(position, duration, start))
+                    continue
+            if item is _END:
+                return
+            if item.get("type", "segment") != "segment":
+                if item.get("type") == "info":
+                    # A time-range transcription covers [start, start + duration].
+                    start = position = item.get("start") or 0.0
+                    duration = item.get("duration")
+                yield _frame(item)
+                continue
+
+            batch = [item]
+            flush_at = loop.time() + coalesce_ms / 1000
+            while len(batch) < coalesce_max:
+                remaining = flush_at - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    following = await asyncio.wait_for(pump.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if following is _END or following.get("type", "segment") != "segment":
+                    pending = following
+                    break
+                batch.append(following)
+            position = batch[-1].get("end", position)
+            yield _segments_frame(batch)
+    finally:
+        pump.stop()
+
+
+def _progress(position: float, duration: Optional[float], start: float = 0.0) -> Dict:
+    percent = round((position - start) / duration * 100, 1) if duration else None
+    return {
+        "type": "progress",
+        "position": round(position, 2),
+        "duration": duration,
+        "percent": percent,
+    }
@@ -0,0 +1,398 @@
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass, fields
+from typing import Iterable, List, Optional, Tuple
+
+from . import audio, deadlines, metrics, quality
+from .models import (
+    DecodeSettings,
+    LanguageDetection,
+    Segment,
+    TokenAnalysis,
+    TranscriptionResult,
+)
+from .transcriber import LANGUAGE_PROBE_WINDOW_S, LANGUAGE_PROBE_WINDOWS, info_event
+
+# Deterministic stand-ins for the model engines, for exercising scheduling,
+# batching and backpressure on any machine without loading a model. Outputs
+# depend only on the inputs and FAKE_SEED, so runs are reproducible.
+FAKE_SEED = int(os.getenv("FAKE_SEED", "0"))
+# Audio length assumed when a file has no readable duration.
+FAKE_TRANSCRIBER_DEFAULT_DURATION_S = float(
+    os.getenv("FAKE_TRANSCRIBER_DEFAULT_DURATION_S", "10")
+)
+FAKE_TRANSCRIBER_SEGMENT_S = float(os.getenv("FAKE_TRANSCRIBER_SEGMENT_S", "5"))
+
+
+def enabled(engine: str) -> bool:
+    """
+    AI_SERVICE_FAKE_ENGINES selects the fakes: "1" or "all" for every engine,
+    or a comma-separated list such as "translator,filter". Each fake reads
+    its cost model from FAKE_<ENGINE>_* (see CostModel).
+    """
+    selected = os.getenv("AI_SERVICE_FAKE_ENGINES", "").strip()
+    if selected in ("1", "all"):
+        return True
+    return engine in {name.strip() for name in selected.split(",")}
+
+
+class FakeEngineError(RuntimeError):
+    """A failure injected by a fake engine's cost model."""
+
+
+@dataclass(frozen=True)
+class CostModel:
+    """
+    How long a fake engine spends on a call, and how it fails.
+
+    A call over n items costs overhead_ms + item_ms * n ** batch_exponent, so
+    an exponent below 1 models batching speedup (0.7: a batch of 32 costs as
+    much as 11 single items). `concurrency` callers are inside the engine at
+    once (1 serialises like the real engines' locks; 0 is unlimited). Each
+    call fails with probability failure_rate. load_ms is paid once per model
+    (language, pair or profile) on first use.
+    """
+
+    item_ms: float = 0.0
+    overhead_ms: float = 0.0
+    batch_exponent: float = 1.0
+    concurrency: int = 1
+    failure_rate: float = 0.0
+    load_ms: float = 0.0
+
+    @classmethod
+    def from_env(cls, engine: str, **defaults) -> "CostModel":
+        values = {}
+        for spec in fields(cls):
+            raw = os.getenv(f"FAKE_{engine.upper()}_{spec.name.upper()}")
+            default = defaults.get(spec.name, spec.default)
+            values[spec.name] = type(spec.default)(raw) if raw else default
+        return cls(**values)
+
+    def call_seconds(self, items: int, scale: float = 1.0) -> float:
+        if items <= 0:
+            return 0.0
+        return (
+            self.overhead_ms + self.item_ms * scale * items**self.batch_exponent
+        ) / 1000
+
+
+class _Slots:
+    """
+    The engine "lock": N concurrent holders, or none at all. Accepts the
+    acquire(timeout=-1) form metrics.timed_lock uses for "no deadline".
+    """
+
+    def __init__(self, concurrency: int):
+        self._semaphore = (
+            threading.BoundedSemaphore(concurrency) if concurrency > 0 else None
+        )
+
+    def acquire(self, timeout: float = -1) -> bool:
+        if self._semaphore is None:
+            return True
+        return self._semaphore.acquire(timeout=None if timeout < 0 else timeout)
+
+    def release(self):
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+
+class _FakeEngine:
+    name = ""
+
+    def __init__(self, cost: CostModel):
+        self.cost = cost
+        self._slots = _Slots(cost.concurrency)
+        self._rng = random.Random(f"{FAKE_SEED}:{self.name}")  # noqa: S311  # nosec B311
+        self._rng_lock = threading.Lock()
+        self._loaded = set()
+
+    def reset_after_fork(self):
+        self._slots = _Slots(self.cost.concurrency)
+        self._rng_lock = threading.Lock()
+
+    def loaded_models(self) -> List[str]:
+        return sorted(self._loaded)
+
+    def shed_models(self) -> List[str]:
+        # The next call per model pays load_ms again, as after a real shed.
+        with self._rng_lock:
+            dropped, self._loaded = sorted(self._loaded), set()
+        return dropped
+
+    def _admit(self, model: str):
+        # Called with a slot held, like the real engines' lazy model loads.
+        with self._rng_lock:
+            failed = self._rng.random() < self.cost.failure_rate
+            first_use = model not in self._loaded
+            self._loaded.add(model)
+        if first_use and self.cost.load_ms:
+            time.sleep(self.cost.load_ms / 1000)
+            metrics.MODEL_LOAD_SECONDS.set(
+                self.cost.load_ms / 1000, engine=self.name, model=model
+            )
+        if failed:
+            raise FakeEngineError(f"injected {self.name} failure")
+
+    def _spend(self, seconds: float, items: int, stage: str):
+        # The cost is spread over the items so deadlines are checked at the
+        # same granularity as in the real engines.
+        steps = max(1, items)
+        for _ in range(steps):
+            deadlines.check(stage)
+            time.sleep(seconds / steps)
+
+
+def _beam_scale(settings: Optional[DecodeSettings], full_beam: int) -> float:
+    # Decode cost grows roughly with the square root of the beam width.
+    if settings is None:
+        return 1.0
+    return math.sqrt(settings.beam_size / max(1, full_beam))
+
+
+def _stable_choice(options: Tuple[str, ...], key: str) -> str:
+    return options[zlib.crc32(key.encode()) % len(options)]
+
+
+class FakeTranscriber(_FakeEngine):
+    """
+    One segment per FAKE_TRANSCRIBER_SEGMENT_S of audio, each costing item_ms
+    per audio second (item_ms 50 is 20x real time).
+    """
+
+    name = "transcriber"
+
+    def __init__(self, cost: Optional[CostModel] = None):
+        super().__init__(cost or CostModel.from_env(self.name, item_ms=50.0))
+
+    def warmup(self):
+        with metrics.timed_lock(self._slots, self.name):
+            self._admit("fake-whisper")
+
+    def _applied(self, settings: Optional[DecodeSettings]) -> DecodeSettings:
+        settings = settings or quality.transcription_settings(quality.FULL)
+        return settings.model_copy(
+            update={
+                "model": settings.model or "fake-whisper",
+                "compute_type": settings.compute_type or "float32",
+            }
+        )
+
+    def _windows(
+        self, file_path: str, start: float = 0.0, length: Optional[float] = None
+    ) -> Tuple[float, List[Tuple[float, float]]]:
+        total = audio.probe_duration(file_path) or FAKE_TRANSCRIBER_DEFAULT_DURATION_S
+        end = total if length is None else min(total, start + length)
+        duration = max(0.0, end - start)
+        count = max(1, math.ceil(duration / FAKE_TRANSCRIBER_SEGMENT_S))
+        return duration, [
+            (
+                start + index * FAKE_TRANSCRIBER_SEGMENT_S,
+                min(end, start + (index + 1) * FAKE_TRANSCRIBER_SEGMENT_S),
+            )
+            for index in range(count)
+        ]
+
+    def _decode(self, start: float, end: float, applied: DecodeSettings, tag: str):
+        scale = _beam_scale(applied, quality.WHISPER_BEAM_SIZE)
+        self._spend(self.cost.call_seconds(1, scale * (end - start)), 1, tag)
+        return {"start": start, "end": end, "text": f" segment at {start:g}s"}
+
+    def transcribe(
+        self,
+        file_path: str,
+        language: Optional[str] = None,
+        settings: Optional[DecodeSettings] = None,
+        start: float = 0.0,
+        duration: Optional[float] = None,
+    ) -> TranscriptionResult:
+        _, windows = self._windows(file_path, start, duration)
+        applied = self._applied(settings)
+        with metrics.timed_lock(self._slots, self.name):
+            self._admit(applied.model)
+            segments = [
+                Segment(**self._decode(begin, end, applied, "transcribe"))
+                for begin, end in windows
+            ]
+        return TranscriptionResult(
+            segments=segments,
+            language=language or "en",
+            language_probability=1.0,
+            quality=applied,
+        )
+
+    def detect_language(self, file_path: str) -> LanguageDetection:
+        # Priced like decoding the probe windows, and never cached, so load
+        # tests keep exercising the engine.
+        offsets = audio.spread_windows(
+            audio.probe_duration(file_path) or FAKE_TRANSCRIBER_DEFAULT_DURATION_S,
+            LANGUAGE_PROBE_WINDOWS,
+            LANGUAGE_PROBE_WINDOW_S,
+        )
+        with metrics.timed_lock(self._slots, self.name):
+            self._admit("fake-whisper")
+            self._spend(
+                self.cost.call_seconds(1, len(offsets) * LANGUAGE_PROBE_WINDOW_S),
+                len(offsets),
+                "detect_language",
+            )
+        return LanguageDetection(
+            language="en", probability=1.0, languages={"en": 1.0}, windows=offsets
+        )
+
+    def transcribe_stream(
+        self,
+        file_path: str,
+        language: Optional[str] = None,
+        settings: Optional[DecodeSettings] = None,
+        start: float = 0.0,
+        duration: Optional[float] = None,
+    ):
+        length, windows = self._windows(file_path, start, duration)
+        applied = self._applied(settings)
+        with metrics.timed_lock(self._slots, self.name):
+            self._admit(applied.model)
+            yield info_event(language, start, length, applied)
+            for begin, end in windows:
+                yield {
+                    "type": "segment",
+                    **self._decode(begin, end, applied, "transcribe"),
+                }
+
+    def transcribe_refined(
+        self,
+        file_path: str,
+        language: Optional[str] = None,
+        start: float = 0.0,
+        duration: Optional[float] = None,
+    ):
+        preview = DecodeSettings(level="preview", beam_size=1, model="fake-preview")
+        for event in self.transcribe_stream(
+            file_path, language, preview, start, duration
+        ):
+            if event["type"] == "segment":
+                event["provisional"] = True
+            yield event
+        _, windows = self._windows(file_path, start, duration)
+        refined = self._applied(
+            DecodeSettings(
+                level="refined",
+                beam_size=quality.WHISPER_BEAM_SIZE,
+                model="fake-refine",
+            )
+        )
+        for begin, end in windows:
+            # Each window takes the engine separately so foreground work
+            # can interleave, as in the real engine.
+            with metrics.timed_lock(self._slots, self.name):
+                self._admit(refined.model)
+                segment = self._decode(begin, end, refined, "transcribe_refine")
+            yield {
+                "type": "segment_update",
+                "start": begin,
+                "end": end,
+                "segments": [segment],
+                "quality": refined.model_dump(),
+            }
+
+
+class FakeFilter(_FakeEngine):
+    """Whitespace tokens with stable lemmas and POS tags."""
+
+    name = "filter"
+    _POS = ("NOUN", "VERB", "ADJ", "ADV", "PRON", "DET", "ADP")
+
+    def __init__(self, cost: Optional[CostModel] = None):
+        super().__init__(
+            cost or CostModel.from_env(self.name, item_ms=2.0, batch_exponent=0.8)
+        )
+
+    def warmup(self, languages: Iterable[str]):
+        for language in languages:
+            self.analyze_batch(["Hola, esto es una prueba."], language)
+
+    def analyze(self, text: str, language: str) -> List[TokenAnalysis]:
+        return self.analyze_batch([text], language)[0]
+
+    def model_version(self, language: str) -> str:
+        return f"{language}_fake"
+
+    def analyze_batch(
+        self, texts: List[str], language: str
+    ) -> List[List[TokenAnalysis]]:
+        with metrics.timed_lock(self._slots, self.name):
+            self._admit(language)
+            started = time.perf_counter()
+            self._spend(self.cost.call_seconds(len(texts)), len(texts), "filter")
+            metrics.SPACY_DOCS.inc(len(texts), language=language)
+            metrics.observe_rate(
+                metrics.SPACY_DOCS_PER_SECOND,
+                len(texts),
+                time.perf_counter() - started,
+                language=language,
+            )
+        return [self._tokens(text) for text in texts]
+
+    def _tokens(self, text: str) -> List[TokenAnalysis]:
+        words = text.split()
+        tokens = []
+        for index, word in enumerate(words):
+            lemma = word.strip(".,;:!?¿¡\"'").lower() or word
+            tokens.append(
+                TokenAnalysis(
+                    text=word,
+                    lemma=lemma,
+                    pos=_stable_choice(self._POS, lemma),
+                    is_stop=len(lemma) <= 3,
+                    whitespace=" " if index < len(words) - 1 else "",
+                )
+            )
+        return tokens
+
+
+class FakeTranslator(_FakeEngine):
+    """Prefixes each text with the pair; one token per word."""
+
+    name = "translator"
+
+    def __init__(self, cost: Optional[CostModel] = None):
+        super().__init__(
+            cost
+            or CostModel.from_env(
+                self.name, item_ms=30.0, overhead_ms=20.0, batch_exponent=0.7
+            )
+        )
+
+    def warmup(self, pairs: Iterable[Tuple[str, str]]):
+        for source_lang, target_lang in pairs:
+            self.translate(["hola"], source_lang, target_lang)
+
+    def translate(
+        self,
+        texts: List[str],
+        source_lang: str,
+        target_lang: str,
+        settings: Optional[DecodeSettings] = None,
+    ) -> List[str]:
+        pair = f"{source_lang}-{target_lang}"
+        scale = _beam_scale(settings, quality.TRANSLATION_BEAM_SIZE)
+        with metrics.timed_lock(self._slots, self.name):
+            self._admit(pair)
+            started = time.perf_counter()
+            self._spend(
+                self.cost.call_seconds(len(texts), scale), len(texts), "translate"
+            )
+            tokens = sum(len(text.split()) + 1 for text in texts)
+            metrics.TRANSLATION_TOKENS.inc(tokens, pair=pair)
+            metrics.observe_rate(
+                metrics.TRANSLATION_TOKENS_PER_SECOND,
+                tokens,
+                time.perf_counter() - started,
+                pair=pair,
+            )
+        return [f"[{target_lang}] {text}" for text in texts]
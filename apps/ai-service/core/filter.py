@@ -1,23 +1,32 @@
 import os
 import threading
-from typing import List, Dict
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List
 
-import spacy
 import structlog
+from . import deadlines, memory, metrics, tracing
 from .models import TokenAnalysis
 
+if TYPE_CHECKING:
+    from spacy.language import Language
+
 logger = structlog.get_logger()
 
 
 class SpacyFilter:
     def __init__(self):
-        self._models: Dict[str, spacy.language.Language] = {}
+        self._models: Dict[str, "Language"] = {}
+        self._lock = threading.Lock()
+
+    def reset_after_fork(self):
         self._lock = threading.Lock()
 
     def _get_model(self, lang: str):
         # Double checked locking optimization or just lock the whole method
         # Since this is lazy loading, locking the whole method is safer and simple enough
         if lang not in self._models:
+            import spacy  # pylint: disable=import-outside-toplevel
+
             if os.getenv("AI_SERVICE_TEST_MODE") == "1":
                 blank_lang = lang if lang in ["en", "es"] else "en"
                 self._models[lang] = spacy.blank(blank_lang)
@@ -30,7 +39,15 @@ class SpacyFilter:
             for model_name in model_candidates:
                 logger.info("loading_spacy_model", model=model_name)
                 try:
-                    self._models[lang] = spacy.load(model_name)
+                    started = time.perf_counter()
+                    with (
+                        memory.FOOTPRINTS.track("filter", model_name),
+                        tracing.span("model_load", engine="filter", model=model_name),
+                    ):
+                        self._models[lang] = spacy.load(model_name)
+                    metrics.MODEL_LOAD_SECONDS.set(
+                        time.perf_counter() - started, engine="filter", model=model_name
+                    )
                     loaded = True
                     break
                 except OSError as e:
@@ -41,15 +58,52 @@ class SpacyFilter:
                     f"Spacy model for language '{lang}' not found. "
                     "Ensure it is installed in the container image."
                 ) from last_error
+        # Most recently used last, for shed_models.
+        self._models[lang] = self._models.pop(lang)
         return self._models[lang]
 
+    def loaded_models(self) -> List[str]:
+        return list(self._models)
+
+    def model_version(self, language: str) -> str:
+        """
+        Name and version of the pipeline that analyzes `language` (loading
+        it if needed), so results cached or tagged from its analyses change
+        when the model does.
+        """
+        with self._lock:
+            nlp = self._get_model(language)
+        return f"{nlp.lang}_{nlp.meta['name']}-{nlp.meta['version']}"
+
+    def shed_models(self) -> List[str]:
+        """
+        Drops every pipeline but the most recently used; the rest reload on
+        next use.
+        """
+        with self._lock:
+            dropped = list(self._models)[:-1]
+            for lang in dropped:
+                model = self._models.pop(lang)
+                memory.FOOTPRINTS.forget("filter", f"{model.lang}_{model.meta['name']}")
+        return dropped
+
+    def warmup(self, languages: Iterable[str]):
+        """
+        Loads the given pipelines and runs a short text through each.
+        """
+        for language in languages:
+            self.analyze_batch(["Hola, esto es una prueba."], language)
+
     def analyze(self, text: str, language: str) -> List[TokenAnalysis]:
         """
         Analyzes a single text using Spacy.
         """
-        with self._lock:
+        with metrics.timed_lock(self._lock, "filter"):
             nlp = self._get_model(language)
-            doc = nlp(text)
+            started = time.perf_counter()
+            with tracing.span("inference", engine="filter", language=language, texts=1):
+                doc = nlp(text)
+            _record_docs(language, 1, time.perf_counter() - started)
 
         tokens = []
         for token in doc:
@@ -70,10 +124,18 @@ class SpacyFilter:
         """
         Analyzes a batch of texts using Spacy.
         """
-        with self._lock:
+        with metrics.timed_lock(self._lock, "filter"):
             nlp = self._get_model(language)
+            started = time.perf_counter()
             # Using nlp.pipe for efficient batch processing
-            docs = list(nlp.pipe(texts))
+            docs = []
+            with tracing.span(
+                "inference", engine="filter", language=language, texts=len(texts)
+            ):
+                for doc in nlp.pipe(texts):
+                    deadlines.check("filter")
+                    docs.append(doc)
+            _record_docs(language, len(docs), time.perf_counter() - started)
 
         results = []
         for doc in docs:
@@ -90,3 +152,10 @@ class SpacyFilter:
                 )
             results.append(tokens)
         return results
+
+
+def _record_docs(language: str, count: int, elapsed: float):
+    metrics.SPACY_DOCS.inc(count, language=language)
+    metrics.observe_rate(
+        metrics.SPACY_DOCS_PER_SECOND, count, elapsed, language=language
+    )
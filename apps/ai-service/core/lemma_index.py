@@ -0,0 +1,134 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import structlog
+from . import tracing
+from .models import LemmaIndex, TokenAnalysis
+
+logger = structlog.get_logger()
+
+# Built indexes are kept per content key, bounded by their total row count
+# (one row per unique lemma) rather than by the number of videos.
+LEMMA_INDEX_CACHE_ROWS = int(os.getenv("LEMMA_INDEX_CACHE_ROWS", "500000"))
+LEMMA_INDEX_FIELDS = [
+    "lemma",
+    "pos",
+    "is_stop",
+    "count",
+    "first_segment",
+    "segment_ids",
+]
+# Tokens that are not vocabulary.
+_SKIPPED_POS = {"PUNCT", "SPACE", "SYM", "NUM"}
+
+
+def build(
+    analyses: Sequence[List[TokenAnalysis]], segment_ids: Sequence[int], language: str
+) -> LemmaIndex:
+    """
+    Folds per-segment token analyses into one row per (lemma, POS) with its
+    count, first segment and the IDs of every segment it occurs in. Segments
+    are expected in playback order.
+    """
+    rows: Dict[Tuple[str, str], list] = {}
+    tokens = 0
+    for segment_id, analysis in zip(segment_ids, analyses, strict=True):
+        for token in analysis:
+            # Pipelines without a lemmatizer leave the lemma empty.
+            lemma = token.lemma.strip() or token.text.strip().lower()
+            if token.pos in _SKIPPED_POS or not any(c.isalnum() for c in lemma):
+                continue
+            tokens += 1
+            row = rows.get((lemma, token.pos))
+            if row is None:
+                rows[(lemma, token.pos)] = [
+                    lemma,
+                    token.pos,
+                    token.is_stop,
+                    1,
+                    segment_id,
+                    [segment_id],
+                ]
+                continue
+            row[3] += 1
+            if row[5][-1] != segment_id:
+                row[5].append(segment_id)
+    # Stable, so equal counts stay in order of first occurrence.
+    ordered = sorted(rows.values(), key=lambda row: -row[3])
+    return LemmaIndex(
+        language=language,
+        segments=len(segment_ids),
+        tokens=tokens,
+        fields=LEMMA_INDEX_FIELDS,
+        lemmas=[tuple(row) for row in ordered],
+    )
+
+
+class _IndexCache:
+    def __init__(self, max_rows: int = LEMMA_INDEX_CACHE_ROWS):
+        self.max_rows = max_rows
+        self._entries: "OrderedDict[str, LemmaIndex]" = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[LemmaIndex]:
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+        return index
+
+    def put(self, key: str, index: LemmaIndex):
+        if len(index.lemmas) > self.max_rows:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._rows -= len(previous.lemmas)
+            self._entries[key] = index
+            self._rows += len(index.lemmas)
+            while self._rows > self.max_rows:
+                _, evicted = self._entries.popitem(last=False)
+                self._rows -= len(evicted.lemmas)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "rows": self._rows,
+                "max_rows": self.max_rows,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+
+INDEXES = _IndexCache()
+
+
+def index_segments(
+    text_filter, texts: List[str], segment_ids: List[int], language: str, key: str
+) -> LemmaIndex:
+    """
+    Returns the cached index for `key`, or analyzes the segments with the
+    filter engine and caches the result.
+    """
+    cached = INDEXES.get(key)
+    if cached is not None:
+        return cached.model_copy(update={"cached": True})
+    analyses = text_filter.analyze_batch(texts, language)
+    with tracing.span("lemma_index", segments=len(texts)):
+        index = build(analyses, segment_ids, language)
+    INDEXES.put(key, index)
+    logger.info(
+        "lemma_index_built",
+        language=language,
+        segments=len(texts),
+        tokens=index.tokens,
+        lemmas=len(index.lemmas),
+    )
+    return index
@@ -0,0 +1,266 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import structlog
+
+from . import metrics
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# event=fraction of records kept, e.g. "request_received=0.1"
+DEFAULT_SAMPLE_RATES = ""
+# event=max records per second, e.g. "transcription_progress=1"
+DEFAULT_RATE_LIMITS = "transcription_progress=1,translation_complete=20"
+
+LOG_RECORDS_DROPPED = metrics.REGISTRY.counter(
+    "ai_log_records_dropped_total",
+    "Log records not written, by reason.",
+    ("reason",),
+)
+
+_WARNING_AND_ABOVE = {"warning", "warn", "error", "exception", "critical", "fatal"}
+
+
+def parse_event_rates(raw: str) -> Dict[str, float]:
+    rates = {}
+    for item in raw.split(","):
+        name, _, value = item.strip().partition("=")
+        if name and value:
+            rates[name.strip()] = float(value)
+    return rates
+
+
+# Polled by orchestrators and scrapers; keep them out of the access log.
+QUIET_PATHS = {"/health", "/ready", "/metrics"}
+
+
+class EndpointFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        args = getattr(record, "args", None)
+        path = None
+
+        if isinstance(args, (tuple, list)):
+            if len(args) >= 3:
+                path = args[2]
+        elif isinstance(args, dict):
+            path = args.get("path")
+
+        if path is None:
+            return True
+
+        return path not in QUIET_PATHS
+
+
+def rename_event_to_message(_logger, _method_name, event_dict):
+    if "event" in event_dict:
+        event_dict["message"] = event_dict.pop("event")
+    return event_dict
+
+
+class EventSampler:
+    """
+    structlog processor that samples and rate-limits high-frequency events.
+
+    Sampling is deterministic (1 of every 1/rate records, with `sample_rate`
+    attached so readers can scale counts). Rate limits use a per-event token
+    bucket; the next record let through carries `suppressed=<n>`. Warnings
+    and errors are never dropped.
+    """
+
+    def __init__(self, sample_rates: Dict[str, float], rate_limits: Dict[str, float]):
+        self._sample_rates = sample_rates
+        self._rate_limits = rate_limits
+        self._credit: Dict[str, float] = {}
+        self._tokens: Dict[str, float] = {}
+        self._refilled: Dict[str, float] = {}
+        self._suppressed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, _logger, method_name, event_dict):
+        event = event_dict.get("event")
+        if method_name in _WARNING_AND_ABOVE or not isinstance(event, str):
+            return event_dict
+        rate = self._sample_rates.get(event)
+        limit = self._rate_limits.get(event)
+        if rate is None and limit is None:
+            return event_dict
+
+        with self._lock:
+            if rate is not None and rate < 1.0:
+                credit = self._credit.get(event, 1.0 - rate) + rate
+                if credit < 1.0:
+                    self._credit[event] = credit
+                    LOG_RECORDS_DROPPED.inc(reason="sampled")
+                    raise structlog.DropEvent
+                self._credit[event] = credit - 1.0
+                event_dict["sample_rate"] = rate
+            if limit is not None and not self._take_token(event, limit):
+                self._suppressed[event] = self._suppressed.get(event, 0) + 1
+                LOG_RECORDS_DROPPED.inc(reason="rate_limited")
+                raise structlog.DropEvent
+            suppressed = self._suppressed.pop(event, 0)
+        if suppressed:
+            event_dict["suppressed"] = suppressed
+        return event_dict
+
+    def _take_token(self, event: str, limit: float) -> bool:
+        now = time.monotonic()
+        tokens = min(
+            limit,
+            self._tokens.get(event, limit)
+            + (now - self._refilled.get(event, now)) * limit,
+        )
+        self._refilled[event] = now
+        if tokens < 1.0:
+            self._tokens[event] = tokens
+            return False
+        self._tokens[event] = tokens - 1.0
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the writer thread untouched. The stock QueueHandler
+    formats in prepare(), which would keep JSON rendering on the caller.
+    """
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block a request on logging.
+            LOG_RECORDS_DROPPED.inc(reason="queue_full")
+
+
+class LogPipeline:
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.queue_handler = _DeferredQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def start(self):
+        self.listener = logging.handlers.QueueListener(
+            self.queue_handler.queue, *self.handlers, respect_handler_level=True
+        )
+        self.listener.start()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def restart_after_fork(self):
+        # The writer thread does not exist in a forked child and the queue's
+        # mutex may have been copied while held, so start over with new ones.
+        self.queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+        self.listener = None
+        self.start()
+
+
+_state: Dict[str, Any] = {"pipeline": None, "logs_dir": None, "level": logging.INFO}
+
+
+def log_file_name(worker: Optional[str] = None) -> str:
+    # Workers of one node share LOGS_DIR, and RotatingFileHandler is not
+    # safe across processes, so each worker writes and rotates its own file.
+    return f"ai-service.worker-{worker}.log" if worker else "ai-service.log"
+
+
+def configure_logging(
+    logs_dir: Path, level: int = logging.INFO, worker: Optional[str] = None
+) -> LogPipeline:
+    """
+    Routes structlog and stdlib logging through a bounded queue drained by a
+    background writer (stdout + size-rotated file). Callers only pay for the
+    cheap processors; JSON rendering and I/O happen on the writer thread.
+    """
+    if _state["pipeline"] is not None:
+        _state["pipeline"].stop()
+    _state["logs_dir"], _state["level"] = logs_dir, level
+
+    formatter = structlog.stdlib.ProcessorFormatter(
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            rename_event_to_message,
+            structlog.processors.JSONRenderer(),
+        ],
+        foreign_pre_chain=[
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso"),
+        ],
+    )
+    stream_handler = logging.StreamHandler(sys.stdout)
+    file_handler = logging.handlers.RotatingFileHandler(
+        logs_dir / log_file_name(worker),
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+    for handler in (stream_handler, file_handler):
+        handler.setFormatter(formatter)
+
+    pipeline = LogPipeline([stream_handler, file_handler])
+    _state["pipeline"] = pipeline
+    root = logging.getLogger()
+    root.handlers = [pipeline.queue_handler]
+    root.setLevel(level)
+
+    structlog.configure(
+        processors=[
+            structlog.contextvars.merge_contextvars,  # Added for Request ID
+            structlog.stdlib.filter_by_level,
+            EventSampler(
+                parse_event_rates(os.getenv("LOG_SAMPLE_RATES", DEFAULT_SAMPLE_RATES)),
+                parse_event_rates(os.getenv("LOG_RATE_LIMITS", DEFAULT_RATE_LIMITS)),
+            ),
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+        ],
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
+
+    pipeline.start()
+    return pipeline
+
+
+def reopen_for_worker(worker: str):
+    """
+    Moves this process's file output to the file of worker `worker`, for
+    workers forked after logging was configured.
+    """
+    if _state["pipeline"] is not None:
+        configure_logging(_state["logs_dir"], _state["level"], worker)
+
+
+def _stop_pipeline():
+    if _state["pipeline"] is not None:
+        _state["pipeline"].stop()
+
+
+def _restart_pipeline_in_child():
+    if _state["pipeline"] is not None:
+        _state["pipeline"].restart_after_fork()
+
+
+atexit.register(_stop_pipeline)
+os.register_at_fork(after_in_child=_restart_pipeline_in_child)
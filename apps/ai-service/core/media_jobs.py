@@ -0,0 +1,209 @@
+import asyncio
+import os
+import shlex
+import shutil
+import signal
+import time
+from typing import List, Optional
+
+import structlog
+
+from . import deadlines, metrics
+
+logger = structlog.get_logger()
+
+# Limits are per worker process.
+FFMPEG_MAX_JOBS = int(
+    os.getenv("FFMPEG_MAX_JOBS", str(max(1, (os.cpu_count() or 2) // 2)))
+)
+FFMPEG_MAX_QUEUE = int(os.getenv("FFMPEG_MAX_QUEUE", "100"))
+FFMPEG_TIMEOUT_S = float(os.getenv("FFMPEG_TIMEOUT_S", "300"))
+# Niceness added to ffmpeg (0 disables) and ionice "class:level" (empty
+# disables). The defaults keep media jobs behind inference for CPU and disk.
+FFMPEG_NICE = int(os.getenv("FFMPEG_NICE", "10"))
+FFMPEG_IONICE = os.getenv("FFMPEG_IONICE", "2:7")
+
+MEDIA_JOBS_QUEUED = metrics.REGISTRY.gauge(
+    "ai_media_jobs_queued", "Media jobs waiting for an ffmpeg slot."
+)
+MEDIA_JOBS_RUNNING = metrics.REGISTRY.gauge(
+    "ai_media_jobs_running", "Media jobs currently running."
+)
+MEDIA_JOBS = metrics.REGISTRY.counter(
+    "ai_media_jobs_total", "Finished media jobs, by outcome.", ("outcome",)
+)
+MEDIA_JOB_QUEUE_WAIT = metrics.REGISTRY.histogram(
+    "ai_media_job_queue_wait_seconds", "Time media jobs spent waiting for a slot."
+)
+MEDIA_JOB_SECONDS = metrics.REGISTRY.histogram(
+    "ai_media_job_seconds", "Wall-clock run time of media jobs."
+)
+
+
+class MediaQueueFull(RuntimeError):
+    pass
+
+
+class MediaJobTimeout(RuntimeError):
+    pass
+
+
+class MediaJobFailed(RuntimeError):
+    pass
+
+
+def priority_prefix(nice: int, ionice: str) -> List[str]:
+    """
+    Wrapper commands that lower ffmpeg's CPU and I/O priority. Both exec the
+    target, so the job keeps its pid and process group.
+    """
+    prefix: List[str] = []
+    if ionice and shutil.which("ionice"):
+        io_class, _, level = ionice.partition(":")
+        prefix += ["ionice", "-c", io_class]
+        if level and io_class == "2":
+            prefix += ["-n", level]
+    if nice and shutil.which("nice"):
+        prefix += ["nice", "-n", str(nice)]
+    return prefix
+
+
+class MediaJobExecutor:  # pylint: disable=too-many-instance-attributes
+    """
+    Runs ffmpeg jobs with a fixed number of slots and a bounded wait queue.
+
+    Jobs beyond `max_jobs` wait for a slot; once `max_queue` jobs are
+    waiting, new ones are rejected with MediaQueueFull. Each job runs in its
+    own session so a timeout (or a cancelled request) kills the whole
+    process group, including anything ffmpeg spawned.
+    """
+
+    def __init__(
+        self,
+        max_jobs: int = FFMPEG_MAX_JOBS,
+        max_queue: int = FFMPEG_MAX_QUEUE,
+        timeout_s: float = FFMPEG_TIMEOUT_S,
+        prefix: Optional[List[str]] = None,
+    ):
+        self.max_jobs = max(1, max_jobs)
+        self.max_queue = max_queue
+        self.timeout_s = timeout_s
+        self.prefix = (
+            priority_prefix(FFMPEG_NICE, FFMPEG_IONICE) if prefix is None else prefix
+        )
+        self.queued = 0
+        self.running = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Semaphores bind to the loop that first waits on them; a new loop
+        # (tests, a forked worker) starts from a fresh one.
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_jobs)
+            self._loop = loop
+        return self._slots
+
+    async def run(self, cmd: List[str], timeout_s: Optional[float] = None) -> bytes:
+        """
+        Runs `cmd` once a slot is free and returns its stdout.
+        Raises MediaQueueFull, MediaJobTimeout or MediaJobFailed, or
+        DeadlineExceeded once the request's deadline has passed.
+        """
+        deadlines.check("media_queue")
+        slots = self._semaphore()
+        if slots.locked() and self.queued >= self.max_queue:
+            MEDIA_JOBS.inc(outcome="rejected")
+            raise MediaQueueFull(f"media job queue is full ({self.queued} waiting)")
+
+        self.queued += 1
+        MEDIA_JOBS_QUEUED.set(self.queued)
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(slots.acquire(), deadlines.remaining())
+        except asyncio.TimeoutError as e:
+            MEDIA_JOBS.inc(outcome="expired")
+            raise deadlines.DeadlineExceeded("media_queue") from e
+        finally:
+            self.queued -= 1
+            MEDIA_JOBS_QUEUED.set(self.queued)
+        MEDIA_JOB_QUEUE_WAIT.observe(time.perf_counter() - queued_at)
+
+        self.running += 1
+        MEDIA_JOBS_RUNNING.set(self.running)
+        started = time.perf_counter()
+        outcome = "failed"
+        timeout_s = timeout_s or self.timeout_s
+        budget = deadlines.remaining()
+        # When the request's budget is shorter than the job timeout, running
+        # out of time means the caller's deadline passed, not that the job
+        # hung.
+        deadline_bound = budget is not None and budget < timeout_s
+        if deadline_bound:
+            timeout_s = max(0.0, budget)
+        try:
+            stdout = await self._execute(cmd, timeout_s)
+            outcome = "ok"
+            return stdout
+        except MediaJobTimeout as e:
+            if deadline_bound:
+                outcome = "expired"
+                raise deadlines.DeadlineExceeded("media_job") from e
+            outcome = "timeout"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            slots.release()
+            self.running -= 1
+            MEDIA_JOBS_RUNNING.set(self.running)
+            MEDIA_JOB_SECONDS.observe(time.perf_counter() - started)
+            MEDIA_JOBS.inc(outcome=outcome)
+
+    async def _execute(self, cmd: List[str], timeout_s: float) -> bytes:
+        argv = self.prefix + cmd
+        logger.info("running_ffmpeg_async", command=shlex.join(argv))
+        process = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout_s)
+        except asyncio.TimeoutError as e:
+            await _kill_group(process)
+            logger.error("media_job_timeout", timeout_s=timeout_s, command=cmd[0])
+            raise MediaJobTimeout(f"{cmd[0]} timed out after {timeout_s:g}s") from e
+        except asyncio.CancelledError:
+            await _kill_group(process)
+            raise
+
+        if process.returncode != 0:
+            error_msg = stderr.decode() if stderr else "Unknown ffmpeg error"
+            raise MediaJobFailed(f"ffmpeg failed: {error_msg}")
+        return stdout
+
+    def stats(self) -> dict:
+        return {
+            "max_jobs": self.max_jobs,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": self.queued,
+        }
+
+
+async def _kill_group(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        return
+    try:
+        await asyncio.wait_for(process.wait(), 5)
+    except asyncio.TimeoutError:
+        logger.warning("media_job_not_reaped", pid=process.pid)
+
+
+MEDIA_EXECUTOR = MediaJobExecutor()
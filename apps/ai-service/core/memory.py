@@ -0,0 +1,336 @@
+import ctypes
+import ctypes.util
+import gc
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+import structlog
+from . import metrics
+
+logger = structlog.get_logger()
+
+# Resident size at which the watchdog sheds caches (0 disables it).
+MEMORY_RSS_LIMIT_MB = float(os.getenv("MEMORY_RSS_LIMIT_MB", "0"))
+MEMORY_WATCHDOG_INTERVAL_S = float(os.getenv("MEMORY_WATCHDOG_INTERVAL_S", "15"))
+# Minimum time between two sheds, so a limit set below the working set does
+# not keep unloading models that are immediately needed again.
+MEMORY_SHED_COOLDOWN_S = float(os.getenv("MEMORY_SHED_COOLDOWN_S", "120"))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))
+
+RESIDENT_BYTES = metrics.REGISTRY.gauge(
+    "ai_process_resident_bytes", "Resident set size of this worker process."
+)
+MODEL_RESIDENT_BYTES = metrics.REGISTRY.gauge(
+    "ai_model_resident_bytes",
+    "Estimated resident size of each loaded model (RSS growth while loading).",
+    ("engine", "model"),
+)
+MEMORY_SHEDS = metrics.REGISTRY.counter(
+    "ai_memory_sheds_total", "Cache sheds triggered by the RSS watchdog."
+)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes() -> int:
+    """
+    Current resident set size. Reads /proc where available; elsewhere
+    falls back to the peak, which is the best the platform reports.
+    """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _Footprints:
+    """
+    Per-model resident size, estimated as the RSS growth while the model
+    loaded. Engines load on their own threads, so tracked loads take turns
+    to keep one model's growth out of another's figure; allocations by
+    concurrent requests can still inflate it.
+    """
+
+    def __init__(self):
+        self._sizes: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._loading = threading.Lock()
+
+    @contextmanager
+    def track(self, engine: str, model: str):
+        with self._loading:
+            before = rss_bytes()
+            yield
+            size = max(0, rss_bytes() - before)
+        with self._lock:
+            self._sizes[(engine, model)] = size
+        MODEL_RESIDENT_BYTES.set(size, engine=engine, model=model)
+
+    def forget(self, engine: str, model: str):
+        with self._lock:
+            self._sizes.pop((engine, model), None)
+        MODEL_RESIDENT_BYTES.set(0, engine=engine, model=model)
+
+    def by_engine(self) -> Dict[str, Dict]:
+        with self._lock:
+            sizes = dict(self._sizes)
+        engines: Dict[str, Dict] = {}
+        for (engine, model), size in sorted(sizes.items()):
+            entry = engines.setdefault(engine, {"estimated_bytes": 0, "models": {}})
+            entry["models"][model] = size
+            entry["estimated_bytes"] += size
+        return engines
+
+
+FOOTPRINTS = _Footprints()
+
+
+class _Caches:
+    """
+    Named caches the watchdog can report on and shed. `size` returns a
+    stats dict; `shed` drops whatever can be rebuilt on demand. Caches
+    registered without one (on disk, not in process memory) are only
+    reported.
+    """
+
+    def __init__(self):
+        self._caches: Dict[
+            str, Tuple[Callable[[], Dict], Optional[Callable[[], None]]]
+        ] = {}
+
+    def register(
+        self,
+        name: str,
+        size: Callable[[], Dict],
+        shed: Optional[Callable[[], None]] = None,
+    ):
+        self._caches[name] = (size, shed)
+
+    def stats(self) -> Dict[str, Dict]:
+        sizes = {}
+        for name, (size, _) in self._caches.items():
+            try:
+                sizes[name] = size()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                sizes[name] = {"error": str(e)}
+        return sizes
+
+    def shed(self) -> List[str]:
+        shed = []
+        for name, (_, drop) in self._caches.items():
+            if drop is None:
+                continue
+            try:
+                drop()
+                shed.append(name)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.warning("memory_shed_failed", cache=name, error=str(e))
+        gc.collect()
+        _release_free_heap()
+        return shed
+
+
+CACHES = _Caches()
+
+
+def _release_free_heap():
+    # glibc keeps freed arenas mapped; hand them back so RSS actually drops.
+    libc_name = ctypes.util.find_library("c")
+    if libc_name and sys.platform == "linux":
+        try:
+            ctypes.CDLL(libc_name).malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class AllocationTracer:
+    """
+    tracemalloc snapshots on demand. The first snapshot starts tracing
+    (which slows allocation noticeably, so it is off until asked for); each
+    later one reports the top allocation sites and the growth since the
+    previous snapshot.
+    """
+
+    def __init__(self, frames: int = TRACEMALLOC_FRAMES):
+        self.frames = frames
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    def snapshot(self, limit: int = 20) -> Dict:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._previous = None
+                logger.info("tracemalloc_started", frames=self.frames)
+                return {"tracing": True, "started": True}
+            snapshot = _filtered(tracemalloc.take_snapshot())
+            previous, self._previous = self._previous, snapshot
+        traced, peak = tracemalloc.get_traced_memory()
+        body = {
+            "tracing": True,
+            "started": False,
+            "traced_bytes": traced,
+            "peak_traced_bytes": peak,
+            "top": [_stat(stat) for stat in snapshot.statistics("lineno")[:limit]],
+        }
+        if previous is not None:
+            body["growth"] = [
+                _stat(stat) for stat in snapshot.compare_to(previous, "lineno")[:limit]
+            ]
+        return body
+
+    def stop(self):
+        with self._lock:
+            self._previous = None
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+                logger.info("tracemalloc_stopped")
+
+    def stats(self) -> Dict:
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        traced, peak = tracemalloc.get_traced_memory()
+        return {"tracing": True, "traced_bytes": traced, "peak_traced_bytes": peak}
+
+
+def _filtered(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )
+    )
+
+
+def _stat(stat) -> Dict:
+    frame = stat.traceback[0]
+    entry = {
+        "site": f"{frame.filename}:{frame.lineno}",
+        "bytes": stat.size,
+        "count": stat.count,
+    }
+    if hasattr(stat, "size_diff"):
+        entry["bytes_diff"] = stat.size_diff
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+TRACER = AllocationTracer()
+
+
+class RssWatchdog:
+    """
+    Samples RSS in the background. Past `limit_bytes` it logs a warning and
+    sheds the registered caches, at most once per cooldown.
+    """
+
+    def __init__(
+        self,
+        limit_bytes: int = int(MEMORY_RSS_LIMIT_MB * 1024 * 1024),
+        interval: float = MEMORY_WATCHDOG_INTERVAL_S,
+        cooldown: float = MEMORY_SHED_COOLDOWN_S,
+    ):
+        self.limit_bytes = limit_bytes
+        self.interval = interval
+        self.cooldown = cooldown
+        self.sheds = 0
+        self.last_shed: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self, now: Optional[float] = None) -> bool:
+        """
+        One sample; returns True when it shed.
+        """
+        now = time.monotonic() if now is None else now
+        rss = rss_bytes()
+        RESIDENT_BYTES.set(rss)
+        if not self.limit_bytes or rss < self.limit_bytes:
+            return False
+        if self.last_shed is not None and now - self.last_shed < self.cooldown:
+            return False
+        self.last_shed = now
+        self.sheds += 1
+        MEMORY_SHEDS.inc()
+        shed = CACHES.shed()
+        logger.warning(
+            "memory_limit_exceeded",
+            rss_bytes=rss,
+            limit_bytes=self.limit_bytes,
+            shed=shed,
+            rss_after_bytes=rss_bytes(),
+        )
+        return True
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="rss-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stats(self) -> Dict:
+        return {
+            "limit_bytes": self.limit_bytes or None,
+            "sheds": self.sheds,
+            "last_shed_s_ago": (
+                round(time.monotonic() - self.last_shed, 1)
+                if self.last_shed is not None
+                else None
+            ),
+        }
+
+
+WATCHDOG = RssWatchdog()
+
+
+def report(top: int = 0) -> Dict:
+    """
+    Everything the memory endpoint shows. `top` > 0 adds the current top
+    allocation sites when tracemalloc is running.
+    """
+    rss = rss_bytes()
+    RESIDENT_BYTES.set(rss)
+    engines = FOOTPRINTS.by_engine()
+    body = {
+        "rss_bytes": rss,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "engines": engines,
+        "unattributed_bytes": max(
+            0, rss - sum(e["estimated_bytes"] for e in engines.values())
+        ),
+        "caches": CACHES.stats(),
+        "tracemalloc": TRACER.stats(),
+        "watchdog": WATCHDOG.stats(),
+    }
+    if top and tracemalloc.is_tracing():
+        snapshot = _filtered(tracemalloc.take_snapshot())
+        body["tracemalloc"]["top"] = [
+            _stat(stat) for stat in snapshot.statistics("lineno")[:top]
+        ]
+    return body
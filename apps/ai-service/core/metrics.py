@@ -0,0 +1,324 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+from anyio import to_thread
+
+from . import deadlines, tracing
+
+# Minimal Prometheus text-format registry. The service only needs a handful of
+# series, so this avoids another runtime dependency.
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+    600.0,
+)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+REAL_TIME_FACTOR_BUCKETS = (0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra=None) -> str:
+    pairs = list(zip(names, values, strict=True))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def total(self) -> float:
+        with self._lock:
+            return sum(self._values.values())
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Layout: one slot per bucket, then +Inf, then sum.
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0.0
+            for bound, hits in zip(
+                self.buckets + (math.inf,), series[:-1], strict=True
+            ):
+                cumulative += hits
+                labels = _format_labels(
+                    self.labelnames, key, ("le", _format_value(bound))
+                )
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(
+            Histogram(name, documentation, labelnames, buckets=buckets)
+        )
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "ai_request_duration_seconds",
+    "Time until the response starts, per endpoint.",
+    ("endpoint", "method", "status"),
+)
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "ai_requests_in_flight", "Requests currently being handled.", ("endpoint",)
+)
+ENGINE_LOCK_WAIT = REGISTRY.histogram(
+    "ai_engine_lock_wait_seconds",
+    "Time spent waiting for an engine lock.",
+    ("engine",),
+)
+ENGINE_BUSY = REGISTRY.gauge(
+    "ai_engine_busy", "Callers holding or waiting for an engine lock.", ("engine",)
+)
+MODEL_LOAD_SECONDS = REGISTRY.gauge(
+    "ai_model_load_seconds", "Duration of the last model load.", ("engine", "model")
+)
+WHISPER_REAL_TIME_FACTOR = REGISTRY.histogram(
+    "ai_whisper_real_time_factor",
+    "Audio seconds transcribed per wall-clock second.",
+    buckets=REAL_TIME_FACTOR_BUCKETS,
+)
+WHISPER_AUDIO_SECONDS = REGISTRY.counter(
+    "ai_whisper_audio_seconds_total", "Audio seconds transcribed."
+)
+TRANSLATION_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "ai_translation_tokens_per_second",
+    "Generated tokens per second for each translate call.",
+    ("pair",),
+    buckets=RATE_BUCKETS,
+)
+TRANSLATION_TOKENS = REGISTRY.counter(
+    "ai_translation_tokens_total", "Tokens generated by MarianMT.", ("pair",)
+)
+SPACY_DOCS_PER_SECOND = REGISTRY.histogram(
+    "ai_spacy_docs_per_second",
+    "Documents processed per second for each analysis call.",
+    ("language",),
+    buckets=RATE_BUCKETS,
+)
+SPACY_DOCS = REGISTRY.counter(
+    "ai_spacy_docs_total", "Documents processed by spaCy.", ("language",)
+)
+DEADLINES_EXCEEDED = REGISTRY.counter(
+    "ai_deadlines_exceeded_total",
+    "Requests abandoned because their deadline passed, by stage.",
+    ("stage",),
+)
+THREADPOOL_TOKENS = REGISTRY.gauge(
+    "ai_threadpool_tokens",
+    "Worker threads of the sync endpoint threadpool, by state.",
+    ("state",),
+)
+
+
+# Smoothed recent lock wait per engine, for the overload controller. Decays
+# while nobody acquires the lock, so it settles once traffic stops.
+_LOCK_WAIT_ALPHA = 0.3
+_LOCK_WAIT_HALF_LIFE_S = 10.0
+_recent_lock_waits: Dict[str, Tuple[float, float]] = {}
+_recent_lock_waits_guard = threading.Lock()
+
+
+def recent_lock_wait(engine: str) -> float:
+    with _recent_lock_waits_guard:
+        entry = _recent_lock_waits.get(engine)
+    if entry is None:
+        return 0.0
+    value, at = entry
+    return value * 0.5 ** ((time.monotonic() - at) / _LOCK_WAIT_HALF_LIFE_S)
+
+
+def _note_lock_wait(engine: str, waited: float):
+    previous = recent_lock_wait(engine)
+    value = _LOCK_WAIT_ALPHA * waited + (1 - _LOCK_WAIT_ALPHA) * previous
+    with _recent_lock_waits_guard:
+        _recent_lock_waits[engine] = (value, time.monotonic())
+
+
+@contextmanager
+def timed_lock(lock, engine: str):
+    """
+    Acquires an engine lock while recording how long the caller queued for it.
+
+    Waits no longer than the request's deadline: work whose caller has given
+    up is dropped before it ever holds the engine.
+    """
+    ENGINE_BUSY.inc(engine=engine)
+    started = time.perf_counter()
+    try:
+        budget = deadlines.remaining()
+        if budget is not None and budget <= 0:
+            raise deadlines.DeadlineExceeded(f"{engine}_queue")
+        if not lock.acquire(timeout=-1 if budget is None else budget):
+            raise deadlines.DeadlineExceeded(f"{engine}_queue")
+        try:
+            waited = time.perf_counter() - started
+            ENGINE_LOCK_WAIT.observe(waited, engine=engine)
+            _note_lock_wait(engine, waited)
+            tracing.record("lock_wait", waited, engine=engine)
+            yield
+        finally:
+            lock.release()
+    finally:
+        ENGINE_BUSY.dec(engine=engine)
+
+
+def observe_rate(histogram: Histogram, amount: float, elapsed: float, **labels):
+    if amount > 0 and elapsed > 0:
+        histogram.observe(amount / elapsed, **labels)
+
+
+def update_threadpool_gauges():
+    """
+    Samples AnyIO's default limiter (the pool running sync endpoints).
+    Must be called from the event loop.
+    """
+    limiter = to_thread.current_default_thread_limiter()
+    THREADPOOL_TOKENS.set(limiter.total_tokens, state="total")
+    THREADPOOL_TOKENS.set(limiter.borrowed_tokens, state="borrowed")
+    THREADPOOL_TOKENS.set(limiter.statistics().tasks_waiting, state="waiting")
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from pydantic import BaseModel
 
 
@@ -17,7 +17,39 @@ class TokenAnalysis(BaseModel):
     translation: Optional[str] = None
 
 
+class DecodeSettings(BaseModel):
+    level: str
+    beam_size: int
+    model: Optional[str] = None
+    compute_type: Optional[str] = None
+    max_new_tokens: Optional[int] = None
+    temperature_fallback: Optional[bool] = None
+
+
 class TranscriptionResult(BaseModel):
     segments: List[Segment]
     language: str
     language_probability: float
+    quality: Optional[DecodeSettings] = None
+
+
+class LanguageDetection(BaseModel):
+    language: str
+    probability: float
+    # Most likely languages, averaged over the probed windows.
+    languages: Dict[str, float]
+    # Start of each probed window, in seconds.
+    windows: List[float]
+    cached: bool = False
+
+
+class LemmaIndex(BaseModel):
+    language: str
+    segments: int
+    tokens: int
+    # Column names for each row of `lemmas`.
+    fields: List[str]
+    # One row per (lemma, POS), most frequent first:
+    # [lemma, pos, is_stop, count, first_segment, segment_ids]
+    lemmas: List[Tuple[str, str, bool, int, int, List[int]]]
+    cached: bool = False
@@ -0,0 +1,60 @@
+import os
+from pathlib import Path
+
+
+def get_default_media_root() -> Path:
+    """Prefer Docker path, then local repo media path for development."""
+    docker_media = Path("/app/media")
+    if docker_media.exists():
+        return docker_media
+    repo_media = Path(__file__).resolve().parents[3] / "media"
+    return repo_media
+
+
+def get_media_root() -> Path:
+    """Resolve the shared media root from environment."""
+    configured = os.environ.get("MEDIA_ROOT")
+    if configured:
+        return Path(configured).resolve()
+    return get_default_media_root().resolve()
+
+
+def get_audio_base_dir() -> Path:
+    """Resolve the current transcribe base directory from environment."""
+    configured = os.environ.get("AUDIO_BASE_DIR")
+    if configured:
+        return Path(configured).resolve()
+    return get_media_root()
+
+
+def resolve_candidate_path(raw_path: str, allowed_root: Path) -> Path:
+    if not raw_path or not str(raw_path).strip():
+        raise ValueError("Empty file path")
+    if "\x00" in str(raw_path):
+        raise ValueError("Invalid file path")
+
+    base_path = os.path.abspath(str(allowed_root))
+    user_path = str(raw_path)
+
+    if os.path.isabs(user_path):
+        fullpath = os.path.normpath(user_path)
+    else:
+        fullpath = os.path.normpath(os.path.join(base_path, user_path))
+
+    if not fullpath.startswith(base_path):
+        raise ValueError("Path traversal detected")
+
+    return Path(fullpath)
+
+
+def resolve_candidate_audio_path(raw_path: str, audio_base_dir: Path) -> Path:
+    return resolve_candidate_path(raw_path, audio_base_dir)
+
+
+def classify_path_error(error: Exception) -> str:
+    error_msg = str(error).lower()
+    if "empty" in error_msg:
+        return "empty_path"
+    if "absolute" in error_msg:
+        return "absolute_path"
+    return "path_traversal"
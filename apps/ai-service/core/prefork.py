@@ -0,0 +1,151 @@
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional
+
+import structlog
+import uvicorn
+
+from . import log_pipeline, tracing
+from .admission import AdmissionCounter
+from .readiness import EngineRegistry
+
+logger = structlog.get_logger()
+
+# A worker that dies sooner than this after starting is respawned with a
+# delay so a crash loop does not spin the CPU.
+_MIN_WORKER_LIFETIME_S = 5.0
+
+
+def serve(  # pylint: disable=too-many-arguments,too-many-locals
+    app,
+    engines: EngineRegistry,
+    host: str,
+    port: int,
+    workers: int,
+    *,
+    admission: Optional[AdmissionCounter] = None,
+):
+    """
+    Loads every engine once, then forks `workers` uvicorn processes that
+    share the listening socket and the model weights (copy-on-write).
+    Each worker counts admitted requests in its own cell of `admission`,
+    which is zeroed when the worker is respawned.
+    """
+    engines.load_all(warmup=os.getenv("AI_SERVICE_WARMUP", "1") == "1")
+    if engines.failed():
+        logger.error("prefork_engines_failed", engines=engines.failed())
+        sys.exit(1)
+
+    if _uses_cuda(engines):
+        # CUDA contexts do not survive fork(); fall back to one process.
+        logger.error("prefork_unsupported_on_cuda", workers=workers)
+        uvicorn.run(app, host=host, port=port)
+        return
+
+    sock = socket.create_server((host, port), backlog=2048)
+    sock.set_inheritable(True)
+    # Move everything allocated so far out of the GC's reach so collections
+    # in the workers do not write to (and un-share) those pages.
+    gc.freeze()
+
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    children: Dict[int, tuple] = {}
+    stopping = False
+
+    def spawn(index: int):
+        if admission is not None:
+            # Slots held by a worker that was killed are never released.
+            admission.reset(index)
+        pid = os.fork()
+        if pid == 0:
+            if admission is not None:
+                admission.bind(index)
+            _run_worker(app, engines, sock, index, threads_per_worker)
+        children[pid] = (index, time.monotonic())
+        logger.info("prefork_worker_started", worker=index, pid=pid)
+
+    def stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info("prefork_listening", host=host, port=port, workers=workers)
+    for index in range(workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index, started = children.pop(pid, (None, 0.0))
+        if stopping or index is None:
+            continue
+        logger.error(
+            "prefork_worker_exited",
+            worker=index,
+            pid=pid,
+            exit_code=os.waitstatus_to_exitcode(status),
+        )
+        if time.monotonic() - started < _MIN_WORKER_LIFETIME_S:
+            time.sleep(1.0)
+        spawn(index)
+
+    sock.close()
+
+
+def _run_worker(app, engines: EngineRegistry, sock, index: int, threads: int):
+    exit_code = 0
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        log_pipeline.reopen_for_worker(str(index))
+        tracing.TRACES.reopen_for_worker(str(index))
+        reset_engines_after_fork(engines)
+        _limit_torch_threads(threads)
+        server = uvicorn.Server(uvicorn.Config(app, lifespan="on"))
+        server.run(sockets=[sock])
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.error("prefork_worker_crashed", worker=index, error=str(e))
+        exit_code = 1
+    finally:
+        # Never fall back into the parent's supervisor loop.
+        os._exit(exit_code)  # pylint: disable=protected-access
+
+
+def reset_engines_after_fork(engines: EngineRegistry):
+    """
+    Gives each worker its own engine locks (a lock copied while held by a
+    parent thread would stay locked forever) and lets engines rebuild state
+    that does not survive fork().
+    """
+    for name in engines.names:
+        engine = engines.peek(name)
+        reset = getattr(engine, "reset_after_fork", None)
+        if callable(reset):
+            reset()
+
+
+def _uses_cuda(engines: EngineRegistry) -> bool:
+    return any(
+        getattr(engines.peek(name), "device", None) == "cuda" for name in engines.names
+    )
+
+
+def _limit_torch_threads(threads: int):
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
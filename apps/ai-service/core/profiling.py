@@ -0,0 +1,257 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional
+
+import structlog
+from starlette.datastructures import Headers
+
+from . import metrics
+
+logger = structlog.get_logger()
+
+PROFILE_HEADER = "X-Profile"
+SAMPLE_INTERVAL_S = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+MAX_PROFILE_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "900"))
+PROFILE_HISTORY = int(os.getenv("PROFILE_HISTORY", "50"))
+
+# Leaf frames of threads that are parked rather than doing work. Samples that
+# end in one of these are dropped so idle pool workers do not swamp profiles.
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("socket.py", "accept"),
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES
+
+
+class StackSampler:
+    """
+    Wall-clock sampler over all interpreter threads.
+
+    Sync endpoints run on threadpool workers, so the sampler looks at every
+    thread rather than the one that started it. Concurrent requests show up in
+    the same profile; the in-flight count at start is recorded for context.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_S):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        names = {}
+        deadline = self.started + MAX_PROFILE_SECONDS
+        while not self._stop.wait(self.interval):
+            if time.perf_counter() > deadline:
+                logger.warning("profile_max_duration_reached")
+                break
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():  # pylint: disable=protected-access
+                if ident == own_ident or _is_idle(frame):
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """
+        Brendan Gregg's collapsed-stack format, readable by flamegraph.pl,
+        speedscope and inferno.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class ProfileStore:
+    """
+    Writes finished profiles to disk and keeps per-function totals for the
+    most recent ones.
+    """
+
+    def __init__(self, history: int = PROFILE_HISTORY):
+        self._recent: Deque[Dict] = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def save(
+        self,
+        directory: Path,
+        request_id: str,
+        path: str,
+        sampler: StackSampler,
+        concurrent: int,
+    ) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        safe_id = "".join(c for c in request_id if c.isalnum() or c in "-_")[:64]
+        target = directory / f"{safe_id or 'profile'}.folded"
+        target.write_text(sampler.folded(), encoding="utf-8")
+
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in sampler.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+
+        with self._lock:
+            self._recent.append(
+                {
+                    "request_id": request_id,
+                    "path": path,
+                    "file": str(target),
+                    "duration_s": round(sampler.elapsed, 3),
+                    "samples": sampler.samples,
+                    "concurrent_requests": concurrent,
+                    "self": self_counts,
+                    "total": total_counts,
+                }
+            )
+        logger.info(
+            "profile_written",
+            file=str(target),
+            samples=sampler.samples,
+            duration_s=round(sampler.elapsed, 3),
+        )
+        return target
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"profiles": len(self._recent)}
+
+    def clear(self):
+        # The folded files stay on disk; only the in-memory totals go.
+        with self._lock:
+            self._recent.clear()
+
+    def summary(self, limit: int = 20) -> Dict:
+        with self._lock:
+            recent = list(self._recent)
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        stack_samples = 0
+        for entry in recent:
+            self_counts.update(entry["self"])
+            total_counts.update(entry["total"])
+            stack_samples += sum(entry["self"].values())
+        return {
+            "profiles": [
+                {k: v for k, v in entry.items() if k not in ("self", "total")}
+                for entry in recent
+            ],
+            "stack_samples": stack_samples,
+            "top_self": _ranked(self_counts, stack_samples, limit),
+            "top_total": _ranked(total_counts, stack_samples, limit),
+        }
+
+
+def _ranked(counts: Counter, denominator: int, limit: int) -> List[Dict]:
+    return [
+        {
+            "function": function,
+            "samples": count,
+            "percent": round(100.0 * count / denominator, 2) if denominator else 0.0,
+        }
+        for function, count in counts.most_common(limit)
+    ]
+
+
+PROFILES = ProfileStore()
+
+
+def profiling_requested(header_value: Optional[str], api_key: Optional[str]) -> bool:
+    """
+    Profiling is honored only when an API key is configured and presented.
+    """
+    if not header_value or header_value.strip().lower() in ("0", "false", "off"):
+        return False
+    expected = os.getenv("AI_SERVICE_API_KEY")
+    return bool(expected) and api_key == expected
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests that ask for it (see profiling_requested) and
+    saves each profile under `directory()`. The sampler stops as soon as the
+    app call ends: after the last chunk of a streaming body, or when sending
+    fails or is cancelled because the client went away.
+    """
+
+    def __init__(self, app, directory: Callable[[], Path], key_header: str):
+        self.app = app
+        self.directory = directory
+        self.key_header = key_header
+
+    async def __call__(self, scope, receive, send):
+        headers = Headers(scope=scope) if scope["type"] == "http" else None
+        if headers is None or not profiling_requested(
+            headers.get(PROFILE_HEADER), headers.get(self.key_header)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        concurrent = int(metrics.REQUESTS_IN_FLIGHT.total())
+        request_id = "unknown"
+
+        async def send_noting_id(message):
+            nonlocal request_id
+            if message["type"] == "http.response.start":
+                sent = Headers(raw=message["headers"])
+                request_id = sent.get("X-Request-ID", request_id)
+            await send(message)
+
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_noting_id)
+        finally:
+            sampler.stop()
+        await asyncio.to_thread(
+            PROFILES.save,
+            self.directory(),
+            request_id,
+            scope["path"],
+            sampler,
+            concurrent,
+        )
@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import structlog
+
+from . import metrics
+from .models import DecodeSettings
+
+logger = structlog.get_logger()
+
+QUALITY_ADAPTIVE = os.getenv("QUALITY_ADAPTIVE", "1") == "1"
+# Callers already holding or queued for an engine that move new work to the
+# reduced / minimal settings.
+QUALITY_REDUCED_QUEUE = int(os.getenv("QUALITY_REDUCED_QUEUE", "3"))
+QUALITY_MINIMAL_QUEUE = int(os.getenv("QUALITY_MINIMAL_QUEUE", "8"))
+# Recent engine lock wait, in seconds, with the same effect.
+QUALITY_REDUCED_WAIT_S = float(os.getenv("QUALITY_REDUCED_WAIT_S", "5"))
+QUALITY_MINIMAL_WAIT_S = float(os.getenv("QUALITY_MINIMAL_WAIT_S", "30"))
+# Load has to stay below a level's thresholds this long before quality
+# steps back up, so it does not flap at the boundary.
+QUALITY_RECOVER_S = float(os.getenv("QUALITY_RECOVER_S", "30"))
+
+WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "5"))
+# Smaller Whisper profile used at the minimal level (empty: keep the model).
+WHISPER_DEGRADED_MODEL = os.getenv("WHISPER_DEGRADED_MODEL", "")
+TRANSLATION_BEAM_SIZE = int(os.getenv("TRANSLATION_BEAM_SIZE", "4"))
+TRANSLATION_REDUCED_MAX_TOKENS = int(os.getenv("TRANSLATION_REDUCED_MAX_TOKENS", "256"))
+TRANSLATION_MINIMAL_MAX_TOKENS = int(os.getenv("TRANSLATION_MINIMAL_MAX_TOKENS", "128"))
+
+FULL, REDUCED, MINIMAL = 0, 1, 2
+LEVEL_NAMES = ("full", "reduced", "minimal")
+
+QUALITY_LEVEL = metrics.REGISTRY.gauge(
+    "ai_decode_quality_level",
+    "Decode quality applied to new work (0 full, 1 reduced, 2 minimal).",
+    ("engine",),
+)
+QUALITY_CHANGES = metrics.REGISTRY.counter(
+    "ai_decode_quality_changes_total",
+    "Decode quality level changes, by direction.",
+    ("engine", "direction"),
+)
+
+
+def transcription_settings(level: int) -> DecodeSettings:
+    """
+    Whisper settings for a level. Reduced decodes greedily; minimal also
+    drops temperature fallback (no re-decoding of doubtful segments) and
+    switches to the degraded profile when one is configured. `model` None
+    means the engine's own profile.
+    """
+    return DecodeSettings(
+        level=LEVEL_NAMES[level],
+        beam_size=WHISPER_BEAM_SIZE if level == FULL else 1,
+        model=(WHISPER_DEGRADED_MODEL or None) if level == MINIMAL else None,
+        temperature_fallback=level != MINIMAL,
+    )
+
+
+def translation_settings(level: int) -> DecodeSettings:
+    """
+    MarianMT settings for a level: greedy decoding and a shorter output
+    limit once degraded.
+    """
+    return DecodeSettings(
+        level=LEVEL_NAMES[level],
+        beam_size=TRANSLATION_BEAM_SIZE if level == FULL else 1,
+        max_new_tokens=(
+            None,
+            TRANSLATION_REDUCED_MAX_TOKENS,
+            TRANSLATION_MINIMAL_MAX_TOKENS,
+        )[level],
+    )
+
+
+class _EngineState:
+    def __init__(self):
+        self.level = FULL
+        self.calm_since = time.monotonic()
+
+
+class OverloadController:
+    """
+    Picks the decode quality for new work on an engine from how many callers
+    are already holding or queued for it and how long they recently waited.
+
+    Quality drops as soon as either signal crosses a threshold and recovers
+    one level at a time, after load has stayed below that level's thresholds
+    for the recovery period.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = QUALITY_ADAPTIVE,
+        reduced_queue: int = QUALITY_REDUCED_QUEUE,
+        minimal_queue: int = QUALITY_MINIMAL_QUEUE,
+        reduced_wait_s: float = QUALITY_REDUCED_WAIT_S,
+        minimal_wait_s: float = QUALITY_MINIMAL_WAIT_S,
+        recover_s: float = QUALITY_RECOVER_S,
+    ):  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.enabled = enabled
+        self.queue_thresholds = (reduced_queue, minimal_queue)
+        self.wait_thresholds = (reduced_wait_s, minimal_wait_s)
+        self.recover_s = recover_s
+        self._states: Dict[str, _EngineState] = {}
+        self._lock = threading.Lock()
+
+    def demanded(self, engine: str) -> int:
+        """
+        Level the current load calls for, ignoring hysteresis.
+        """
+        queued = metrics.ENGINE_BUSY.value(engine=engine)
+        waited = metrics.recent_lock_wait(engine)
+        level = FULL
+        for candidate, (queue_limit, wait_limit) in enumerate(
+            zip(self.queue_thresholds, self.wait_thresholds, strict=True),
+            start=REDUCED,
+        ):
+            if queued >= queue_limit or waited >= wait_limit:
+                level = candidate
+        return level
+
+    def level(self, engine: str, now: Optional[float] = None) -> int:
+        if not self.enabled:
+            return FULL
+        demanded = self.demanded(engine)
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._states.get(engine)
+            if state is None:
+                state = self._states[engine] = _EngineState()
+            previous = state.level
+            if demanded >= state.level:
+                state.level = demanded
+                state.calm_since = now
+            elif now - state.calm_since >= self.recover_s:
+                state.level -= 1
+                state.calm_since = now
+            level = state.level
+        QUALITY_LEVEL.set(level, engine=engine)
+        if level != previous:
+            direction = "degraded" if level > previous else "restored"
+            QUALITY_CHANGES.inc(engine=engine, direction=direction)
+            logger.warning(
+                f"decode_quality_{direction}",
+                engine=engine,
+                level=LEVEL_NAMES[level],
+                queued=metrics.ENGINE_BUSY.value(engine=engine),
+                recent_wait_s=round(metrics.recent_lock_wait(engine), 3),
+            )
+        return level
+
+    def stats(self) -> Dict[str, str]:
+        with self._lock:
+            return {
+                engine: LEVEL_NAMES[state.level]
+                for engine, state in self._states.items()
+            }
+
+
+QUALITY = OverloadController()
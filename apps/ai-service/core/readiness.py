@@ -0,0 +1,242 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+PENDING = "pending"
+LOADING = "loading"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+# A failing factory is retried with exponential backoff before the engine is
+# marked failed for good.
+ENGINE_LOAD_ATTEMPTS = int(os.getenv("ENGINE_LOAD_ATTEMPTS", "3"))
+ENGINE_LOAD_BACKOFF_S = float(os.getenv("ENGINE_LOAD_BACKOFF_S", "5"))
+
+
+class EngineNotReady(RuntimeError):
+    def __init__(self, name: str, status: str):
+        super().__init__(f"Engine '{name}' is not ready ({status})")
+        self.name = name
+        self.status = status
+
+
+class _EngineSlot:  # pylint: disable=too-many-instance-attributes
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        warmup: Optional[Callable[[Any], None]],
+    ):
+        self.name = name
+        self.factory = factory
+        self.warmup = warmup
+        self.instance = None
+        self.status = PENDING
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.ready = threading.Event()
+
+
+class EngineRegistry:
+    """
+    Holds the engines and loads them off the request path.
+
+    Each engine is built on its own background thread once the server is
+    accepting connections, so one becomes ready without waiting for the
+    others, then warmed up with a dummy inference so the first real request
+    does not pay for lazy initialisation.
+    """
+
+    def __init__(
+        self,
+        attempts: int = ENGINE_LOAD_ATTEMPTS,
+        backoff_s: float = ENGINE_LOAD_BACKOFF_S,
+    ):
+        self.attempts = max(1, attempts)
+        self.backoff_s = backoff_s
+        self._slots: Dict[str, _EngineSlot] = {}
+        self._started = False
+        self._stopping = threading.Event()
+        self._on_failure: Optional[Callable[[str, str], None]] = None
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        warmup: Optional[Callable[[Any], None]] = None,
+    ):
+        self._slots[name] = _EngineSlot(name, factory, warmup)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._slots)
+
+    def start_background_load(
+        self,
+        warmup: bool = True,
+        on_failure: Optional[Callable[[str, str], None]] = None,
+    ):
+        """
+        Starts loading every engine in the background. `on_failure(name,
+        error)` is called for an engine that still fails after its retries.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._on_failure = on_failure
+            threading.Thread(
+                target=self._load_all,
+                args=(warmup,),
+                name="engine-loader",
+                daemon=True,
+            ).start()
+
+    def load_all(self, warmup: bool = True):
+        """
+        Loads every engine and returns once all are ready or failed (used
+        before forking workers).
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self._load_all(warmup)
+
+    def reset(self):
+        """
+        Forgets loaded engines and returns to the state before loading started;
+        loads still in flight finish into the discarded slots.
+        """
+        with self._lock:
+            self._stopping.set()
+            self._stopping = threading.Event()
+            self._slots = {
+                name: _EngineSlot(name, slot.factory, slot.warmup)
+                for name, slot in self._slots.items()
+            }
+            self._started = False
+            self._on_failure = None
+
+    def _load_all(self, warmup: bool):
+        stopping = self._stopping
+        loaders = [
+            threading.Thread(
+                target=self._load,
+                args=(slot, warmup, stopping),
+                name=f"engine-loader-{slot.name}",
+                daemon=True,
+            )
+            for slot in self._slots.values()
+        ]
+        for loader in loaders:
+            loader.start()
+        for loader in loaders:
+            loader.join()
+        if self.all_ready():
+            logger.info("startup_models_loaded")
+            print("[AI Service] Models loaded. Ready to accept requests.", flush=True)
+
+    def _build(self, slot: _EngineSlot, stopping: threading.Event) -> bool:
+        for attempt in range(1, self.attempts + 1):
+            started = time.perf_counter()
+            try:
+                slot.instance = slot.factory()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                slot.error = str(e)
+                logger.error(
+                    "engine_load_failed",
+                    engine=slot.name,
+                    attempt=attempt,
+                    attempts=self.attempts,
+                    error=str(e),
+                )
+                if attempt == self.attempts or stopping.wait(
+                    self.backoff_s * 2 ** (attempt - 1)
+                ):
+                    return False
+                continue
+            slot.error = None
+            slot.load_seconds = time.perf_counter() - started
+            return True
+        return False
+
+    def _load(self, slot: _EngineSlot, warmup: bool, stopping: threading.Event):
+        slot.status = LOADING
+        logger.info("engine_loading", engine=slot.name)
+        if not self._build(slot, stopping):
+            slot.status = FAILED
+            slot.ready.set()
+            on_failure = self._on_failure
+            if on_failure is not None and not stopping.is_set():
+                on_failure(slot.name, slot.error or "")
+            return
+
+        if warmup and slot.warmup is not None:
+            slot.status = WARMING
+            started = time.perf_counter()
+            try:
+                slot.warmup(slot.instance)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # A failed warm-up only costs first-request latency.
+                logger.warning("engine_warmup_failed", engine=slot.name, error=str(e))
+            slot.warmup_seconds = time.perf_counter() - started
+        slot.status = READY
+        logger.info(
+            "engine_ready",
+            engine=slot.name,
+            load_s=round(slot.load_seconds, 3),
+            warmup_s=round(slot.warmup_seconds or 0.0, 3),
+        )
+        slot.ready.set()
+
+    def get(self, name: str, timeout: float):
+        """
+        Returns the engine, waiting up to `timeout` seconds while it loads.
+
+        Returns None when loading was never started (the app is being driven
+        without its lifespan, e.g. in tests), matching the old behaviour.
+        """
+        slot = self._slots[name]
+        if not self._started and slot.status == PENDING:
+            return None
+        slot.ready.wait(timeout)
+        if slot.status != READY:
+            raise EngineNotReady(name, slot.status)
+        return slot.instance
+
+    def peek(self, name: str):
+        """
+        Returns the engine if it is ready, without waiting.
+        """
+        slot = self._slots[name]
+        return slot.instance if slot.status == READY else None
+
+    def all_ready(self) -> bool:
+        return all(slot.status == READY for slot in self._slots.values())
+
+    def failed(self) -> List[str]:
+        return [name for name, slot in self._slots.items() if slot.status == FAILED]
+
+    def status(self) -> Dict[str, Dict]:
+        return {
+            name: {
+                "status": slot.status,
+                "error": slot.error,
+                "load_s": _rounded(slot.load_seconds),
+                "warmup_s": _rounded(slot.warmup_seconds),
+            }
+            for name, slot in self._slots.items()
+        }
+
+
+def _rounded(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
@@ -0,0 +1,136 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from .models import DecodeSettings, Segment, TokenAnalysis
+from .paths import get_media_root, resolve_candidate_path
+
+
+class ThumbnailRequest(BaseModel):
+    file_path: str
+
+    @field_validator("file_path")
+    @classmethod
+    def path_must_be_safe(cls, v: str) -> str:
+        return str(resolve_candidate_path(v, get_media_root()))
+
+
+class ThumbnailResponse(BaseModel):
+    thumbnail_path: str
+
+
+class TrickplayRequest(ThumbnailRequest):
+    interval: float = Field(10.0, ge=1.0, le=600.0)
+    tile_width: int = Field(160, ge=32, le=640)
+    columns: int = Field(10, ge=1, le=32)
+    rows: int = Field(10, ge=1, le=32)
+    start: float = Field(0.0, ge=0.0)
+    poster_offset: float = Field(1.0, ge=0.0)
+    keyframes_only: bool = True
+
+
+class TrickplayResponse(BaseModel):
+    poster_path: str
+    sprite_paths: List[str]
+    vtt_path: str
+    duration: float
+    interval: float
+    tile_width: int
+    tile_height: int
+    columns: int
+    rows: int
+    count: int
+    cached: bool
+
+
+class AudioFileRequest(BaseModel):
+    file_path: str
+
+    @field_validator("file_path")
+    @classmethod
+    def path_must_be_safe(cls, v: str) -> str:
+        # Route-level logic applies strict path policy and canonicalization.
+        # Keep model-level validation lightweight to avoid duplicate/conflicting checks.
+        if not v or not str(v).strip():
+            raise ValueError("Empty file path")
+        return str(v)
+
+
+class TranscriptionRequest(AudioFileRequest):
+    language: str = "es"
+    # Optional time range in seconds. Only that part of the audio is decoded
+    # (ffmpeg seeks to `start`); returned timestamps stay on the source
+    # timeline.
+    start: float = Field(default=0.0, ge=0)
+    end: Optional[float] = Field(default=None, gt=0)
+    # Transcribe only this many seconds from `start` (quick previews).
+    first_seconds: Optional[float] = Field(default=None, gt=0)
+
+    @model_validator(mode="after")
+    def range_must_be_valid(self):
+        if self.end is not None and self.first_seconds is not None:
+            raise ValueError("Set either end or first_seconds, not both")
+        if self.end is not None and self.end <= self.start:
+            raise ValueError("end must be after start")
+        return self
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Seconds to transcribe from `start`; None means to the end."""
+        if self.first_seconds is not None:
+            return self.first_seconds
+        if self.end is not None:
+            return self.end - self.start
+        return None
+
+
+class StreamTranscriptionRequest(TranscriptionRequest):
+    # Two passes: provisional segments from a fast model first, then
+    # segment_update events from a larger one.
+    refine: bool = False
+
+
+class TranscriptionResponse(BaseModel):
+    segments: List[Segment]
+    language: str
+    language_probability: float
+    # Decode settings applied; degraded while the service is overloaded.
+    quality: Optional[DecodeSettings] = None
+
+
+class TranslationRequest(BaseModel):
+    texts: List[str]
+    source_lang: str = "es"
+    # Added fallback logic in core/translator.py handles pair validity,
+    # but here we allow "es", "en" etc.
+    target_lang: str = "en"
+
+
+class TranslationResponse(BaseModel):
+    translations: List[str]
+    quality: Optional[DecodeSettings] = None
+
+
+class FilterRequest(BaseModel):
+    texts: List[str]
+    language: str = "es"
+
+
+class FilterResponse(BaseModel):
+    results: List[List[TokenAnalysis]]
+
+
+class LemmaIndexRequest(FilterRequest):
+    # IDs of the segments in `texts`, in the same order; defaults to their
+    # positions.
+    segment_ids: Optional[List[int]] = None
+
+    @model_validator(mode="after")
+    def segment_ids_must_match(self):
+        if self.segment_ids is None:
+            return self
+        if len(self.segment_ids) != len(self.texts):
+            raise ValueError("segment_ids must have one ID per text")
+        if len(set(self.segment_ids)) != len(self.segment_ids):
+            raise ValueError("segment_ids must be unique")
+        return self
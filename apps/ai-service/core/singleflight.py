@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import structlog
+
+from . import deadlines, metrics, tracing
+
+logger = structlog.get_logger()
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1") == "1"
+
+COALESCED_REQUESTS = metrics.REGISTRY.counter(
+    "ai_coalesced_requests_total",
+    "Requests served by joining an identical request already in flight.",
+    ("endpoint",),
+)
+
+
+def request_key(*parts: Any) -> str:
+    """
+    Canonical key for a request: identical inputs (after path resolution and
+    defaults) produce the same key regardless of field order.
+    """
+    material = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Runs one computation per key at a time. Callers arriving while it runs
+    wait for it and share its result (or its exception) instead of running
+    it again. Nothing is cached once the computation has finished.
+    """
+
+    def __init__(self, name: str, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        if not self.enabled:
+            return fn()
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+            if leader:
+                break
+
+            COALESCED_REQUESTS.inc(endpoint=self.name)
+            logger.info("request_coalesced", endpoint=self.name)
+            # Bounded by our own deadline, not the leader's computation.
+            with tracing.span("coalesced_wait", endpoint=self.name):
+                finished = call.done.wait(timeout=deadlines.remaining())
+            if not finished:
+                raise deadlines.DeadlineExceeded("coalesced")
+            if isinstance(call.error, deadlines.DeadlineExceeded):
+                # The leader's caller gave up; ours may still be waiting.
+                deadlines.check("coalesced")
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class _Broadcast:
+    def __init__(self):
+        self.events: List[Any] = []
+        self.done = False
+        self.closing = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.cond = threading.Condition()
+
+
+class StreamFlight:
+    """
+    Single-flight for event streams. The first subscriber starts a producer
+    thread that drains the stream into a buffer; identical subscribers that
+    join later get every earlier event replayed, then follow live. The
+    producer stops early (closing the source stream) once every subscriber
+    has gone.
+    """
+
+    def __init__(self, name: str, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self._flights: Dict[str, _Broadcast] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, key: str, factory: Callable[[], Iterator]) -> Iterator:
+        if not self.enabled:
+            return factory()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                with flight.cond:
+                    if flight.closing:
+                        flight = None
+                    else:
+                        flight.subscribers += 1
+            if flight is None:
+                flight = self._flights[key] = _Broadcast()
+                flight.subscribers = 1
+                threading.Thread(
+                    target=self._produce_in,
+                    args=(tracing.current(), key, flight, factory),
+                    name=f"{self.name}-producer",
+                    daemon=True,
+                ).start()
+            else:
+                COALESCED_REQUESTS.inc(endpoint=self.name)
+                logger.info(
+                    "stream_coalesced", endpoint=self.name, replayed=len(flight.events)
+                )
+        return self._follow(flight)
+
+    def _produce_in(self, span, *args):
+        # The engine's spans join the trace of the request that started the
+        # stream; threads do not inherit the caller's context.
+        with tracing.attached(span):
+            self._produce(*args)
+
+    def _produce(self, key: str, flight: _Broadcast, factory: Callable[[], Iterator]):
+        stream = None
+        try:
+            stream = factory()
+            for item in stream:
+                with flight.cond:
+                    flight.events.append(item)
+                    flight.cond.notify_all()
+                    if flight.subscribers == 0:
+                        flight.closing = True
+                        logger.info("stream_abandoned", endpoint=self.name)
+                        break
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            flight.error = e
+        finally:
+            close = getattr(stream, "close", None)
+            if callable(close):
+                close()
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            with flight.cond:
+                flight.closing = True
+                flight.done = True
+                flight.cond.notify_all()
+
+    @staticmethod
+    def _follow(flight: _Broadcast) -> Iterator:
+        index = 0
+        try:
+            while True:
+                with flight.cond:
+                    while index >= len(flight.events) and not flight.done:
+                        flight.cond.wait()
+                    if index < len(flight.events):
+                        item = flight.events[index]
+                        index += 1
+                    elif flight.error is not None:
+                        raise flight.error
+                    else:
+                        return
+                yield item
+        finally:
+            with flight.cond:
+                flight.subscribers -= 1
@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import structlog
+from pydantic import BaseModel
+
+logger = structlog.get_logger()
+
+MANIFEST_NAME = "manifest.json"
+SPRITE_PATTERN = "sprite_%03d.jpg"
+
+
+class TrickplayOptions(BaseModel):
+    interval: float = 10.0
+    tile_width: int = 160
+    columns: int = 10
+    rows: int = 10
+    start: float = 0.0
+    poster_offset: float = 1.0
+    keyframes_only: bool = True
+
+
+def probe_video(path: str) -> Tuple[float, int, int]:
+    """
+    Reads duration and frame size from the container header (no decoding).
+    """
+    import av  # pylint: disable=import-outside-toplevel
+
+    with av.open(path) as container:
+        stream = container.streams.video[0]
+        duration = container.duration / 1_000_000 if container.duration else 0.0
+        if not duration and stream.duration and stream.time_base:
+            duration = float(stream.duration * stream.time_base)
+        return duration, stream.width, stream.height
+
+
+def _digest(material) -> str:
+    encoded = json.dumps(material, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def file_signature(path: str) -> str:
+    """
+    Identifies one version of a file: path, mtime and size.
+    """
+    stat = os.stat(path)
+    return _digest([os.path.abspath(path), stat.st_mtime_ns, stat.st_size])
+
+
+def options_key(options: TrickplayOptions) -> str:
+    """
+    Identifies one rendering: every option that changes the output.
+    """
+    return _digest(options.model_dump())
+
+
+def trickplay_root(path: str) -> Path:
+    base, _ = os.path.splitext(path)
+    return Path(f"{base}.trickplay")
+
+
+def tile_height(tile_width: int, width: int, height: int) -> int:
+    # Mirrors ffmpeg's scale=W:-2 (keep aspect, round to an even number).
+    if not width or not height:
+        return tile_width
+    return max(2, int(round(tile_width * height / width / 2.0)) * 2)
+
+
+def build_command(
+    path: str, out_dir: Path, options: TrickplayOptions, poster_at: float
+) -> List[str]:
+    """
+    One ffmpeg process for everything. The sprite input decodes only
+    keyframes (when allowed) from `start` on; the poster input is seeked
+    separately so it stays exact and costs a single decoded frame. Both use
+    input seeking (-ss before -i) rather than decoding up to the offset.
+    """
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+    if options.keyframes_only:
+        cmd += ["-skip_frame", "nokey"]
+    if options.start > 0:
+        cmd += ["-ss", f"{options.start:.3f}"]
+    cmd += ["-i", path, "-ss", f"{poster_at:.3f}", "-i", path]
+    graph = (
+        f"[0:v]fps=1/{options.interval:g}:eof_action=pass,scale={options.tile_width}:-2,"
+        f"tile={options.columns}x{options.rows}[sheet]"
+    )
+    cmd += [
+        "-an",
+        "-sn",
+        "-filter_complex",
+        graph,
+        "-map",
+        "1:v:0",
+        "-frames:v",
+        "1",
+        "-q:v",
+        "2",
+        str(out_dir / "poster.jpg"),
+        "-map",
+        "[sheet]",
+        "-q:v",
+        "5",
+        str(out_dir / SPRITE_PATTERN),
+    ]
+    return cmd
+
+
+def _timestamp(seconds: float) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+
+def build_vtt(
+    duration: float, tile_h: int, options: TrickplayOptions
+) -> Tuple[str, int, int]:
+    """
+    WebVTT index mapping each interval to its tile (`sprite_NNN.jpg#xywh=`).
+    Returns (vtt text, thumbnail count, sheet count).
+    """
+    count = max(1, math.ceil(max(0.0, duration - options.start) / options.interval))
+    per_sheet = options.columns * options.rows
+    lines = ["WEBVTT", ""]
+    for index in range(count):
+        begin = options.start + index * options.interval
+        end = min(begin + options.interval, max(duration, begin + 0.001))
+        sheet, position = divmod(index, per_sheet)
+        x = (position % options.columns) * options.tile_width
+        y = (position // options.columns) * tile_h
+        lines += [
+            f"{_timestamp(begin)} --> {_timestamp(end)}",
+            f"{SPRITE_PATTERN % (sheet + 1)}#xywh={x},{y},{options.tile_width},{tile_h}",
+            "",
+        ]
+    return "\n".join(lines), count, math.ceil(count / per_sheet)
+
+
+def _write_index(
+    work_dir: Path,
+    out_dir: Path,
+    duration: float,
+    tile_h: int,
+    options: TrickplayOptions,
+) -> Dict:
+    vtt, count, sheets = build_vtt(duration, tile_h, options)
+    (work_dir / "index.vtt").write_text(vtt, encoding="utf-8")
+    manifest = {
+        "poster_path": str(out_dir / "poster.jpg"),
+        "sprite_paths": [
+            str(out_dir / (SPRITE_PATTERN % (i + 1))) for i in range(sheets)
+        ],
+        "vtt_path": str(out_dir / "index.vtt"),
+        "duration": duration,
+        "interval": options.interval,
+        "tile_width": options.tile_width,
+        "tile_height": tile_h,
+        "columns": options.columns,
+        "rows": options.rows,
+        "count": count,
+    }
+    (work_dir / MANIFEST_NAME).write_text(json.dumps(manifest), encoding="utf-8")
+    return manifest
+
+
+def load_cached(out_dir: Path) -> Dict:
+    manifest = out_dir / MANIFEST_NAME
+    if not manifest.exists():
+        return {}
+    return json.loads(manifest.read_text(encoding="utf-8"))
+
+
+async def generate_trickplay(path: str, options: TrickplayOptions, run) -> Dict:
+    """
+    Produces poster, sprite sheets and VTT index, or returns the cached set.
+    `run` executes an ffmpeg argv list and raises on failure.
+    """
+    root = trickplay_root(path)
+    signature = file_signature(path)
+    key = options_key(options)
+    # Renderings with different options live side by side under the file
+    # version they were made from.
+    out_dir = root / signature / key
+    cached = load_cached(out_dir)
+    if cached:
+        logger.info("trickplay_cache_hit", file_path=path, key=key)
+        return {**cached, "cached": True}
+
+    duration, width, height = await asyncio.to_thread(probe_video, path)
+    # Short clips: take the poster from the middle rather than past the end.
+    poster_at = min(options.poster_offset, duration / 2) if duration else 0.0
+    work_dir = root / signature / f".{key}.{uuid.uuid4().hex[:8]}.tmp"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        await run(build_command(path, work_dir, options, poster_at))
+        manifest = _write_index(
+            work_dir,
+            out_dir,
+            duration,
+            tile_height(options.tile_width, width, height),
+            options,
+        )
+        try:
+            work_dir.rename(out_dir)
+        except OSError:
+            # A concurrent request finished the same rendering first.
+            shutil.rmtree(work_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    _prune_stale(root, keep=signature)
+    return {**manifest, "cached": False}
+
+
+def _prune_stale(root: Path, keep: str):
+    # Renderings of older file versions are never reused; other options for
+    # the current version stay.
+    for entry in root.iterdir():
+        if entry.is_dir() and entry.name != keep and not entry.name.startswith("."):
+            shutil.rmtree(entry, ignore_errors=True)
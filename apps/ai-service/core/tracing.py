@@ -0,0 +1,381 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Spans are kept for the most recent traces and appended, one trace per line
+# in OTLP/JSON (the format of the OpenTelemetry file exporter), to a local
+# file that a collector's otlpjsonfile receiver or any JSON tool can read.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") == "1"
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "500"))
+# Traces waiting for the file writer; beyond this they are kept in memory only.
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "1000"))
+# Lookups of traces no longer in memory read at most this much of the end of
+# the trace file.
+TRACE_SCAN_BYTES = int(os.getenv("TRACE_SCAN_BYTES", str(8 * 1024 * 1024)))
+SERVICE_NAME = "ai-service"
+
+_SERVER, _INTERNAL = 2, 1
+_STATUS_OK, _STATUS_ERROR = 1, 2
+
+
+class _Trace:
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.trace_id = secrets.token_hex(16)
+        self.started_ns = time.time_ns()
+        self.spans: List[Dict] = []
+
+
+class _Span:
+    """The active span, as seen by code running inside it."""
+
+    __slots__ = ("trace", "span_id")
+
+    def __init__(self, trace: _Trace, span_id: str):
+        self.trace = trace
+        self.span_id = span_id
+
+
+_current: ContextVar[Optional[_Span]] = ContextVar("trace_span", default=None)
+
+
+def current() -> Optional[_Span]:
+    return _current.get()
+
+
+@contextmanager
+def attached(parent: Optional[_Span]):
+    """
+    Continues `parent` on another thread (threads do not inherit contextvars).
+    """
+    token = _current.set(parent)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def _attributes(values: Dict[str, Any]) -> List[Dict]:
+    encoded = []
+    for key, value in values.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        encoded.append({"key": key, "value": typed})
+    return encoded
+
+
+def _finish(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    trace: _Trace,
+    span_id: str,
+    parent_id: Optional[str],
+    name: str,
+    start_ns: int,
+    end_ns: int,
+    attributes: Dict[str, Any],
+    error: Optional[str] = None,
+    kind: int = _INTERNAL,
+):
+    entry = {
+        "traceId": trace.trace_id,
+        "spanId": span_id,
+        "name": name,
+        "kind": kind,
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": _attributes(attributes),
+        "status": {"code": _STATUS_OK},
+    }
+    if parent_id:
+        entry["parentSpanId"] = parent_id
+    if error is not None:
+        entry["status"] = {"code": _STATUS_ERROR, "message": error}
+    # list.append is atomic; engine threads add spans concurrently.
+    trace.spans.append(entry)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Times the block as a child of the active span. A no-op outside a trace,
+    so engines can be instrumented unconditionally.
+    """
+    parent = _current.get()
+    if parent is None:
+        yield
+        return
+    span_id = secrets.token_hex(8)
+    token = _current.set(_Span(parent.trace, span_id))
+    start_ns = time.time_ns()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        _finish(
+            parent.trace,
+            span_id,
+            parent.span_id,
+            name,
+            start_ns,
+            time.time_ns(),
+            attributes,
+            error,
+        )
+
+
+def record(name: str, seconds: float, **attributes):
+    """
+    Adds a span that ended just now and lasted `seconds`, for phases timed
+    elsewhere (lock waits) or inside generators, where a context manager
+    would span the consumer's time too.
+    """
+    parent = _current.get()
+    if parent is None:
+        return
+    end_ns = time.time_ns()
+    _finish(
+        parent.trace,
+        secrets.token_hex(8),
+        parent.span_id,
+        name,
+        end_ns - int(seconds * 1e9),
+        end_ns,
+        attributes,
+    )
+
+
+def since_request_start(name: str, **attributes):
+    """
+    Records a span from the start of the current request to now.
+    """
+    parent = _current.get()
+    if parent is not None:
+        elapsed_ns = time.time_ns() - parent.trace.started_ns
+        record(name, elapsed_ns / 1e9, **attributes)
+
+
+class _OtlpJsonFormatter(logging.Formatter):
+    def format(self, record):  # pylint: disable=redefined-outer-name
+        return json.dumps(record.msg, separators=(",", ":"))
+
+
+class TraceStore:  # pylint: disable=too-many-instance-attributes
+    """
+    Recent traces by request ID, plus the append-only OTLP/JSON file.
+
+    Traces are finished on the event loop, so serializing and writing them
+    happens on a background writer thread, as for the service log.
+    """
+
+    def __init__(self, history: int = TRACE_HISTORY):
+        self.history = history
+        self.path: Optional[Path] = None
+        self._base: Optional[Path] = None
+        self._rotation = (0, 0)
+        self._handler: Optional[logging.Handler] = None
+        self._queue: "queue.Queue[logging.LogRecord]" = queue.Queue(TRACE_QUEUE_SIZE)
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._recent: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        path: Path,
+        max_bytes: int,
+        backup_count: int,
+        worker: Optional[str] = None,
+    ):
+        # Rotated like the service log so the file cannot grow unbounded,
+        # and per worker like it, since rotation is not multi-process safe.
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._base, self._rotation = path, (max_bytes, backup_count)
+        if worker:
+            path = path.with_name(f"{path.stem}.worker-{worker}{path.suffix}")
+        handler = logging.handlers.RotatingFileHandler(
+            path,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+            delay=True,
+        )
+        handler.setFormatter(_OtlpJsonFormatter())
+        self.close()
+        self.path, self._handler = path, handler
+        self._start_writer()
+
+    def reopen_for_worker(self, worker: str):
+        """
+        Moves the trace file to worker `worker`'s, for forked workers.
+        """
+        if self._base is not None:
+            self.configure(self._base, *self._rotation, worker=worker)
+
+    def _start_writer(self):
+        self._listener = logging.handlers.QueueListener(self._queue, self._handler)
+        self._listener.start()
+
+    def close(self):
+        """
+        Writes out the queued traces and stops the writer.
+        """
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        if self._handler is not None:
+            self._handler.close()
+
+    def restart_after_fork(self):
+        # Same as the log pipeline: the writer thread is gone in a forked
+        # child and the queue's lock may have been copied while held.
+        self._queue = queue.Queue(TRACE_QUEUE_SIZE)
+        if self._listener is not None:
+            self._start_writer()
+
+    @contextmanager
+    def request(self, request_id: str, name: str, **attributes):
+        """
+        Root span for one request. Yields a callback that ends it; the
+        caller invokes it once the response body has been sent, which for
+        streams is long after the handler returned.
+        """
+        if not TRACING_ENABLED:
+            yield lambda status=None, error=None: None
+            return
+        trace = _Trace(request_id)
+        root_id = secrets.token_hex(8)
+        token = _current.set(_Span(trace, root_id))
+        finished = False
+
+        def finish(status: Optional[int] = None, error: Optional[str] = None):
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            if error is None and status is not None and status >= 500:
+                error = f"HTTP {status}"
+            _finish(
+                trace,
+                root_id,
+                None,
+                name,
+                trace.started_ns,
+                time.time_ns(),
+                {
+                    "http.request_id": request_id,
+                    "http.status_code": status,
+                    **attributes,
+                },
+                error,
+                kind=_SERVER,
+            )
+            self._store(trace)
+
+        try:
+            yield finish
+        finally:
+            _current.reset(token)
+
+    def _store(self, trace: _Trace):
+        document = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _attributes(
+                            {"service.name": SERVICE_NAME, "process.pid": os.getpid()}
+                        )
+                    },
+                    "scopeSpans": [
+                        {"scope": {"name": SERVICE_NAME}, "spans": list(trace.spans)}
+                    ],
+                }
+            ]
+        }
+        with self._lock:
+            self._recent[trace.request_id] = document
+            self._recent.move_to_end(trace.request_id)
+            while len(self._recent) > self.history:
+                self._recent.popitem(last=False)
+        if self._listener is not None:
+            try:
+                self._queue.put_nowait(logging.makeLogRecord({"msg": document}))
+            except queue.Full:
+                # Never block a request on tracing; the trace stays in memory.
+                pass
+
+    def get(self, request_id: str) -> Optional[Dict]:
+        """
+        The trace for a request: from memory when recent, otherwise the
+        newest match in the last TRACE_SCAN_BYTES of this process's trace
+        file, then of the other workers' files.
+        """
+        with self._lock:
+            document = self._recent.get(request_id)
+        if document is not None or self.path is None:
+            return document
+        siblings = self._base.parent.glob(f"{self._base.stem}*{self._base.suffix}")
+        for path in [self.path, *sorted(set(siblings) - {self.path})]:
+            found = _scan(path, request_id)
+            if found is not None:
+                return json.loads(found)
+        return None
+
+
+def _scan(path: Path, request_id: str) -> Optional[str]:
+    needle = json.dumps(request_id)
+    found = None
+    try:
+        f = path.open("rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        start = max(0, f.seek(0, os.SEEK_END) - TRACE_SCAN_BYTES)
+        if start:
+            # Skip to the first line that starts inside the window.
+            f.seek(start - 1)
+            f.readline()
+        else:
+            f.seek(0)
+        for raw in f:
+            line = raw.decode("utf-8", errors="replace")
+            if needle in line and _request_id(line) == request_id:
+                found = line
+    return found
+
+
+def _request_id(line: str) -> Optional[str]:
+    for resource in json.loads(line)["resourceSpans"]:
+        for scope in resource["scopeSpans"]:
+            for entry in scope["spans"]:
+                if "parentSpanId" in entry:
+                    continue
+                for attribute in entry["attributes"]:
+                    if attribute["key"] == "http.request_id":
+                        return attribute["value"]["stringValue"]
+    return None
+
+
+TRACES = TraceStore()
+atexit.register(TRACES.close)
+os.register_at_fork(after_in_child=TRACES.restart_after_fork)
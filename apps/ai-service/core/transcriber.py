@@ -1,45 +1,345 @@
+import contextvars
 import os
+import queue
 import threading
-from typing import Optional
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
 
 import structlog
-import torch
-from faster_whisper import WhisperModel
-from .models import TranscriptionResult, Segment
+from . import audio, deadlines, memory, metrics, quality, tracing
+from .audio_cache import AUDIO_CACHE
+from .models import DecodeSettings, LanguageDetection, TranscriptionResult, Segment
 
 logger = structlog.get_logger()
 
+# Streamed transcription decodes with ffmpeg into memory while Whisper runs
+# instead of letting Whisper decode the whole file up front.
+WHISPER_STREAM_DECODE = os.getenv("WHISPER_STREAM_DECODE", "1") == "1"
+WHISPER_STREAM_FIRST_WINDOW_S = float(os.getenv("WHISPER_STREAM_FIRST_WINDOW_S", "30"))
+WHISPER_STREAM_WINDOW_S = float(os.getenv("WHISPER_STREAM_WINDOW_S", "120"))
+# Tail of the previous window's text passed as the prompt for the next one.
+_PROMPT_CHARS = 200
+# Two-pass streaming: a fast preview profile, then a larger one refining
+# each window at background priority.
+WHISPER_PREVIEW_MODEL = os.getenv("WHISPER_PREVIEW_MODEL", "tiny")
+WHISPER_PREVIEW_COMPUTE_TYPE = os.getenv("WHISPER_PREVIEW_COMPUTE_TYPE", "int8")
+WHISPER_REFINE_MODEL = os.getenv("WHISPER_REFINE_MODEL", "small")
+# Longest a refinement window waits for foreground work to drain before it
+# runs anyway, so refinement cannot starve under sustained load.
+WHISPER_REFINE_MAX_DEFER_S = float(os.getenv("WHISPER_REFINE_MAX_DEFER_S", "30"))
+# Language detection decodes only a few short windows spread across the
+# file; results are kept per file version (the audio cache key).
+LANGUAGE_PROBE_WINDOWS = int(os.getenv("LANGUAGE_PROBE_WINDOWS", "3"))
+LANGUAGE_PROBE_WINDOW_S = float(os.getenv("LANGUAGE_PROBE_WINDOW_S", "10"))
+LANGUAGE_CACHE_SIZE = int(os.getenv("LANGUAGE_CACHE_SIZE", "1024"))
+_TOP_LANGUAGES = 5
 
-class WhisperTranscriber:
+
+class _LanguageCache:
+    def __init__(self, size: int = LANGUAGE_CACHE_SIZE):
+        self.size = size
+        self._entries: "OrderedDict[str, LanguageDetection]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[LanguageDetection]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, detection: LanguageDetection):
+        with self._lock:
+            self._entries[key] = detection
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.size}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+LANGUAGE_CACHE = _LanguageCache()
+
+_DONE = object()
+
+
+class _ForegroundGate:
+    """
+    Counts the foreground callers holding or queued for the engine.
+    Background work waits on the condition until the count drops to zero.
+    """
+
+    def __init__(self):
+        self._idle = threading.Condition()
+        self._active = 0
+
+    def __enter__(self):
+        with self._idle:
+            self._active += 1
+
+    def __exit__(self, *exc):
+        with self._idle:
+            self._active -= 1
+            if not self._active:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: Optional[float], stop: Callable[[], bool]) -> bool:
+        """
+        Blocks until no foreground caller is left, `stop()` is true or
+        `timeout` runs out; returns whether the engine went idle.
+        """
+        with self._idle:
+            self._idle.wait_for(lambda: stop() or not self._active, timeout)
+            return not self._active
+
+    def wake(self):
+        with self._idle:
+            self._idle.notify_all()
+
+
+class _RefineJob:
+    """
+    The refinement pass of a two-pass stream, on its own thread. The preview
+    feeds it each window as it finishes; the job re-transcribes them in
+    order, each once the engine has no foreground work (or after
+    WHISPER_REFINE_MAX_DEFER_S), and queues a `segment_update` per window.
+    """
+
+    def __init__(
+        self, refine_window: Callable, gate: _ForegroundGate, language: Optional[str]
+    ):
+        self._refine_window = refine_window
+        # Replaced by the language the preview detects.
+        self.language = language
+        self._gate = gate
+        self._windows: queue.Queue = queue.Queue()
+        self._updates: queue.Queue = queue.Queue()
+        self._cancelled = False
+
+    def start(self):
+        # Carries the request's contextvars (deadline, trace) along.
+        context = contextvars.copy_context()
+        threading.Thread(
+            target=context.run, args=(self._run,), name="whisper-refine", daemon=True
+        ).start()
+
+    def feed(self, offset: float, samples):
+        self._windows.put((offset, samples, self.language))
+
+    def finish(self):
+        self._windows.put(None)
+
+    def cancel(self):
+        self._cancelled = True
+        self._windows.put(None)
+        self._gate.wake()
+
+    def updates(self):
+        """
+        The `segment_update` events, blocking until the last window is
+        refined; an error on the job thread is raised here.
+        """
+        while True:
+            item = self._updates.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def _run(self):
+        prompt = None
+        try:
+            while True:
+                window = self._windows.get()
+                if window is None or self._cancelled:
+                    break
+                budget = deadlines.remaining()
+                timeout = WHISPER_REFINE_MAX_DEFER_S
+                if budget is not None:
+                    timeout = max(0.0, min(timeout, budget))
+                self._gate.wait_idle(timeout, lambda: self._cancelled)
+                if self._cancelled:
+                    break
+                deadlines.check("transcribe_refine")
+                update = self._refine_window(*window, prompt)
+                text = "".join(s["text"] for s in update["segments"])
+                prompt = text[-_PROMPT_CHARS:].strip() or None
+                self._updates.put(update)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            self._updates.put(e)
+            return
+        self._updates.put(_DONE)
+
+
+class WhisperTranscriber:  # pylint: disable=too-many-instance-attributes
     def __init__(self, model_size="tiny", device=None, compute_type="float32"):
         self._test_mode = os.getenv("AI_SERVICE_TEST_MODE") == "1"
+        self.model_size = model_size
+        self.compute_type = compute_type
+        # Other profiles (degraded, preview, refinement) by (model, compute
+        # type), loaded on first use.
+        self._profiles: Dict[Tuple[str, str], object] = {}
         if self._test_mode:
             self.model = None
+            self.device = "cpu"
         else:
             if device is None:
-                device = "cuda" if torch.cuda.is_available() else "cpu"
-            self.model = WhisperModel(
-                model_size, device=device, compute_type=compute_type
+                device = "cuda" if cuda_available() else "cpu"
+            self.device = device
+            self.model = self._load_model()
+        self._lock = threading.Lock()
+        self._foreground = _ForegroundGate()
+
+    def _load_model(
+        self, model_size: Optional[str] = None, compute_type: Optional[str] = None
+    ):
+        # Heavy imports stay off the module import path so the app can
+        # start serving before the model is loaded.
+        from faster_whisper import WhisperModel  # pylint: disable=import-outside-toplevel
+
+        model_size = model_size or self.model_size
+        compute_type = compute_type or self.compute_type
+        started = time.perf_counter()
+        profile = f"{model_size}/{compute_type}"
+        with (
+            memory.FOOTPRINTS.track("transcriber", profile),
+            tracing.span("model_load", engine="transcriber", model=profile),
+        ):
+            model = WhisperModel(
+                model_size, device=self.device, compute_type=compute_type
             )
+        metrics.MODEL_LOAD_SECONDS.set(
+            time.perf_counter() - started, engine="transcriber", model=model_size
+        )
+        return model
+
+    def _resolve(self, settings: Optional[DecodeSettings]):
+        """
+        The model to decode with and the settings as actually applied (with
+        the profile filled in). Called with the engine lock held.
+        """
+        settings = settings or quality.transcription_settings(quality.FULL)
+        profile = (
+            settings.model or self.model_size,
+            settings.compute_type or self.compute_type,
+        )
+        applied = settings.model_copy(
+            update={"model": profile[0], "compute_type": profile[1]}
+        )
+        if self._test_mode or profile == (self.model_size, self.compute_type):
+            return self.model, applied
+        if profile not in self._profiles:
+            logger.info("loading_whisper_profile", model=profile[0], compute=profile[1])
+            self._profiles[profile] = self._load_model(*profile)
+        return self._profiles[profile], applied
+
+    def reset_after_fork(self):
+        """
+        Prepares the engine for use in a freshly forked worker. CTranslate2
+        runs inference on its own thread pool, which does not survive fork(),
+        so the Whisper model is rebuilt (its files are already in page cache).
+        """
         self._lock = threading.Lock()
+        self._foreground = _ForegroundGate()
+        if self.model is not None:
+            self.model = self._load_model()
+        for profile in self._profiles:
+            self._profiles[profile] = self._load_model(*profile)
+
+    @contextmanager
+    def _engine(self):
+        """
+        The engine lock for a foreground caller. Refinement waits while any
+        foreground caller holds or queues for it.
+        """
+        with self._foreground, metrics.timed_lock(self._lock, "transcriber"):
+            yield
+
+    def loaded_models(self):
+        profiles = [(self.model_size, self.compute_type), *self._profiles]
+        return [f"{model}/{compute}" for model, compute in profiles]
+
+    def shed_models(self):
+        """
+        Drops the secondary profiles; they reload on next use.
+        """
+        with self._lock:
+            dropped, self._profiles = list(self._profiles), {}
+        for model, compute in dropped:
+            memory.FOOTPRINTS.forget("transcriber", f"{model}/{compute}")
+        return [f"{model}/{compute}" for model, compute in dropped]
+
+    def warmup(self):
+        """
+        Runs one second of silence through the model to initialise kernels.
+        """
+        if self._test_mode:
+            return
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        with self._engine():
+            # Loads the degraded profile now rather than under load.
+            model, _ = self._resolve(quality.transcription_settings(quality.MINIMAL))
+            for candidate in (
+                (self.model,) if model is self.model else (self.model, model)
+            ):
+                segments, _info = candidate.transcribe(
+                    np.zeros(16000, dtype=np.float32), language="en", beam_size=1
+                )
+                for _ in segments:
+                    pass
 
     def transcribe(
-        self, file_path: str, language: Optional[str] = None
+        self,
+        file_path: str,
+        language: Optional[str] = None,
+        settings: Optional[DecodeSettings] = None,
+        start: float = 0.0,
+        duration: Optional[float] = None,
     ) -> TranscriptionResult:
-        with self._lock:
+        """
+        Transcribes the file, or `duration` seconds of it from `start`.
+        Timestamps are always on the source timeline.
+        """
+        # Decoding (or mapping the cached decode) happens before taking the
+        # lock, so it overlaps with another request's inference.
+        source = file_path
+        ranged = start > 0 or duration is not None
+        if not self._test_mode and (AUDIO_CACHE.enabled or ranged):
+            with tracing.span("audio_decode"):
+                source = AUDIO_CACHE.decode(file_path, start, duration)
+        with self._engine():
+            model, applied = self._resolve(settings)
             if self._test_mode:
                 return TranscriptionResult(
-                    segments=[Segment(start=0, end=1, text="test")],
+                    segments=[Segment(start=start, end=start + 1, text="test")],
                     language=language or "en",
                     language_probability=1.0,
+                    quality=applied,
+                )
+            started = time.perf_counter()
+            with tracing.span("inference", engine="transcriber", model=applied.model):
+                segments, info = model.transcribe(
+                    source, language=language, **_decode_options(applied)
                 )
-            segments, info = self.model.transcribe(
-                file_path, language=language, beam_size=5
-            )
 
-            result_segments = []
-            for s in segments:
-                result_segments.append(Segment(start=s.start, end=s.end, text=s.text))
+                result_segments = []
+                for s in segments:
+                    # Segments are decoded lazily; stop once the caller is gone.
+                    deadlines.check("transcribe")
+                    result_segments.append(
+                        Segment(start=start + s.start, end=start + s.end, text=s.text)
+                    )
+            _record_real_time_factor(info.duration, time.perf_counter() - started)
 
         logger.info(
             "whisper_detected_language",
@@ -51,53 +351,406 @@ class WhisperTranscriber:
             segments=result_segments,
             language=info.language,
             language_probability=info.language_probability,
+            quality=applied,
         )
 
-    def transcribe_stream(self, file_path: str, language: Optional[str] = None):
+    def detect_language(self, file_path: str) -> LanguageDetection:
+        """
+        Whisper's language probabilities for a few short windows spread
+        across the file, averaged. Only those windows are decoded (with a
+        seek each); results are cached per file version.
+        """
+        key = (
+            f"{AUDIO_CACHE.key(file_path)}:"
+            f"{LANGUAGE_PROBE_WINDOWS}x{LANGUAGE_PROBE_WINDOW_S:g}"
+        )
+        cached = LANGUAGE_CACHE.get(key)
+        if cached is not None:
+            return cached.model_copy(update={"cached": True})
+
+        offsets = audio.spread_windows(
+            audio.probe_duration(file_path),
+            LANGUAGE_PROBE_WINDOWS,
+            LANGUAGE_PROBE_WINDOW_S,
+        )
+        if self._test_mode:
+            totals = {"en": 1.0}
+        else:
+            with tracing.span("audio_decode", windows=len(offsets)):
+                windows = [
+                    AUDIO_CACHE.decode(file_path, offset, LANGUAGE_PROBE_WINDOW_S)
+                    for offset in offsets
+                ]
+            windows = [samples for samples in windows if samples.size]
+            if not windows:
+                raise audio.AudioDecodeError(f"No audio in {file_path}")
+            totals: Dict[str, float] = {}
+            with (
+                self._engine(),
+                tracing.span("inference", engine="transcriber", windows=len(windows)),
+            ):
+                for samples in windows:
+                    deadlines.check("detect_language")
+                    _, _, probabilities = self.model.detect_language(audio=samples)
+                    for language, probability in probabilities:
+                        totals[language] = totals.get(
+                            language, 0.0
+                        ) + probability / len(windows)
+
+        ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+        ranked = ranked[:_TOP_LANGUAGES]
+        detection = LanguageDetection(
+            language=ranked[0][0],
+            probability=round(ranked[0][1], 4),
+            languages={language: round(p, 4) for language, p in ranked},
+            windows=offsets,
+        )
+        logger.info(
+            "whisper_language_probed",
+            language=detection.language,
+            probability=detection.probability,
+            windows=len(offsets),
+        )
+        LANGUAGE_CACHE.put(key, detection)
+        return detection
+
+    def transcribe_stream(
+        self,
+        file_path: str,
+        language: Optional[str] = None,
+        settings: Optional[DecodeSettings] = None,
+        start: float = 0.0,
+        duration: Optional[float] = None,
+    ):
         if self._test_mode:
+            _, applied = self._resolve(settings)
+            length = 10.0 if duration is None else duration
+            yield info_event(language, start, length, applied)
+            yield {"type": "segment", "start": start, "end": start + 5, "text": "test"}
             yield {
-                "type": "info",
-                "language": language or "en",
-                "probability": 1.0,
-                "duration": 10.0,
+                "type": "segment",
+                "start": start + 5,
+                "end": start + 10,
+                "text": "stream",
             }
-            yield {"type": "segment", "start": 0.0, "end": 5.0, "text": "test"}
-            yield {"type": "segment", "start": 5.0, "end": 10.0, "text": "stream"}
             return
 
-        with self._lock:
-            segments, info = self.model.transcribe(
-                file_path, language=language, beam_size=5
-            )
+        if not WHISPER_STREAM_DECODE and not start and duration is None:
+            with self._engine():
+                yield from self._stream_from_file(file_path, language, settings)
+            return
+
+        # Opened before waiting for the lock: a cache hit is mapped and a
+        # miss starts decoding ahead while another request holds the model.
+        with AUDIO_CACHE.open(file_path, start, duration) as source:
+            with self._engine():
+                yield from self._stream_from_pcm(
+                    source, file_path, language, settings, start, duration
+                )
 
-            logger.info(
-                "whisper_stream_detected_language",
-                language=info.language,
-                probability=info.language_probability,
-                duration=info.duration,
+    def transcribe_refined(
+        self,
+        file_path: str,
+        language: Optional[str] = None,
+        start: float = 0.0,
+        duration: Optional[float] = None,
+    ):
+        """
+        Two-pass streaming. A fast preview profile streams provisional
+        segments right away. Each window it finishes is handed to a
+        background job that re-transcribes it with a larger profile once the
+        engine is free of foreground work; each refined window yields a
+        `segment_update` replacing the provisional segments in its range.
+        """
+        if self._test_mode:
+            yield from _canned_refined_events(language, start, duration)
+            return
+
+        preview = DecodeSettings(
+            level="preview",
+            beam_size=1,
+            model=WHISPER_PREVIEW_MODEL,
+            compute_type=WHISPER_PREVIEW_COMPUTE_TYPE,
+            temperature_fallback=False,
+        )
+        job = _RefineJob(self._refine_window, self._foreground, language)
+        job.start()
+        try:
+            with AUDIO_CACHE.open(file_path, start, duration) as source:
+                with self._engine():
+                    for event in self._stream_from_pcm(
+                        source,
+                        file_path,
+                        language,
+                        preview,
+                        start,
+                        duration,
+                        on_window=job.feed,
+                    ):
+                        if event["type"] == "info":
+                            # Refinement keeps the language the preview
+                            # detected.
+                            job.language = event["language"]
+                        else:
+                            event["provisional"] = True
+                        yield event
+            job.finish()
+            yield from job.updates()
+        finally:
+            # Stops the job early when the client has gone.
+            job.cancel()
+        logger.info("transcription_refined", file_path=file_path)
+
+    def _refine_window(
+        self, offset: float, samples, language: Optional[str], prompt: Optional[str]
+    ) -> dict:
+        settings = DecodeSettings(
+            level="refined",
+            beam_size=quality.WHISPER_BEAM_SIZE,
+            model=WHISPER_REFINE_MODEL,
+        )
+        with (
+            metrics.timed_lock(self._lock, "transcriber"),
+            tracing.span(
+                "inference",
+                engine="transcriber",
+                model=WHISPER_REFINE_MODEL,
+                window_offset=offset,
+            ),
+        ):
+            model, applied = self._resolve(settings)
+            segments, _info = model.transcribe(
+                samples,
+                language=language,
+                initial_prompt=prompt,
+                **_decode_options(applied),
             )
+            refined = [
+                {
+                    "start": offset + segment.start,
+                    "end": offset + segment.end,
+                    "text": segment.text,
+                }
+                for segment in segments
+            ]
+        return {
+            "type": "segment_update",
+            "start": offset,
+            "end": offset + samples.size / audio.SAMPLE_RATE,
+            "segments": refined,
+            "quality": applied.model_dump(),
+        }
+
+    def _stream_from_file(
+        self,
+        file_path: str,
+        language: Optional[str],
+        settings: Optional[DecodeSettings],
+    ):
+        model, applied = self._resolve(settings)
+        started = time.perf_counter()
+        segments, info = model.transcribe(
+            file_path, language=language, **_decode_options(applied)
+        )
 
+        logger.info(
+            "whisper_stream_detected_language",
+            language=info.language,
+            probability=info.language_probability,
+            duration=info.duration,
+        )
+
+        yield {
+            "type": "info",
+            "language": info.language,
+            "probability": info.language_probability,
+            "duration": info.duration,
+            "quality": applied.model_dump(),
+        }
+
+        segment_count = 0
+        for segment in segments:
+            segment_count += 1
+            if segment_count % 10 == 0:
+                _log_progress(segment_count, segment.end, info.duration)
             yield {
-                "type": "info",
-                "language": info.language,
-                "probability": info.language_probability,
-                "duration": info.duration,
+                "type": "segment",
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
             }
+        tracing.record(
+            "inference",
+            time.perf_counter() - started,
+            engine="transcriber",
+            model=applied.model,
+        )
+        _record_real_time_factor(info.duration, time.perf_counter() - started)
 
-            segment_count = 0
+    def _stream_from_pcm(
+        self,
+        source,
+        file_path: str,
+        language: Optional[str],
+        settings: Optional[DecodeSettings],
+        start: float = 0.0,
+        length: Optional[float] = None,
+        on_window: Optional[Callable] = None,
+    ):
+        # pylint: disable=too-many-locals,too-many-arguments,too-many-positional-arguments
+        """
+        Transcribes audio windows as ffmpeg decodes them (any container,
+        video included). Windows are cut at pauses; timestamps are shifted
+        back to the source timeline (past `start` for a range) and each
+        window is prompted with the tail of the previous one for continuity.
+        `on_window(offset, samples)` is called as each window is finished.
+        """
+        model, applied = self._resolve(settings)
+        started = time.perf_counter()
+        if isinstance(source, audio.PcmArray):
+            duration = source.samples.size / audio.SAMPLE_RATE
+        else:
+            duration = max(0.0, (audio.probe_duration(file_path) or 0.0) - start)
+            if length is not None:
+                duration = min(duration, length)
+        prompt = None
+        info_sent = False
+        segment_count = 0
+        for offset, samples in audio.stream_windows(
+            source, WHISPER_STREAM_FIRST_WINDOW_S, WHISPER_STREAM_WINDOW_S
+        ):
+            offset += start
+            window_started = time.perf_counter()
+            segments, info = model.transcribe(
+                samples,
+                language=language,
+                initial_prompt=prompt,
+                **_decode_options(applied),
+            )
+            if not info_sent:
+                # Later windows reuse the language detected on the first.
+                language = info.language
+                logger.info(
+                    "whisper_stream_detected_language",
+                    language=info.language,
+                    probability=info.language_probability,
+                    duration=duration,
+                )
+                yield {
+                    "type": "info",
+                    "language": info.language,
+                    "probability": info.language_probability,
+                    "start": start,
+                    "duration": duration,
+                    "quality": applied.model_dump(),
+                }
+                info_sent = True
+
+            texts = []
             for segment in segments:
                 segment_count += 1
                 if segment_count % 10 == 0:
-                    pct = round(segment.end / info.duration * 100, 1) if info.duration else 0
-                    logger.info(
-                        "transcription_progress",
-                        segments_yielded=segment_count,
-                        audio_position_s=round(segment.end, 1),
-                        percent=pct,
-                    )
+                    _log_progress(segment_count, offset + segment.end, duration, start)
+                texts.append(segment.text)
                 yield {
                     "type": "segment",
-                    "start": segment.start,
-                    "end": segment.end,
+                    "start": offset + segment.start,
+                    "end": offset + segment.end,
                     "text": segment.text,
                 }
+            prompt = "".join(texts)[-_PROMPT_CHARS:].strip() or None
+            # Recorded rather than a span: a context variable set here would
+            # leak into the consumer across each yield. Segments are decoded
+            # lazily, so the window includes the (brief) hand-offs.
+            tracing.record(
+                "inference",
+                time.perf_counter() - window_started,
+                engine="transcriber",
+                model=applied.model,
+                window_offset=offset,
+            )
+            if on_window is not None:
+                on_window(offset, samples)
+        _record_real_time_factor(
+            source.samples_read / audio.SAMPLE_RATE, time.perf_counter() - started
+        )
+
+
+def info_event(
+    language: Optional[str],
+    start: float,
+    length: float,
+    applied: Optional[DecodeSettings] = None,
+) -> dict:
+    """
+    Stream info event of the canned and fake engines, which always report
+    the requested language (English by default) with full confidence.
+    """
+    event = {
+        "type": "info",
+        "language": language or "en",
+        "probability": 1.0,
+        "start": start,
+        "duration": length,
+    }
+    if applied is not None:
+        event["quality"] = applied.model_dump()
+    return event
+
+
+def _canned_refined_events(
+    language: Optional[str], start: float = 0.0, duration: Optional[float] = None
+):
+    # Laid out over the requested window, like the real passes.
+    length = 10.0 if duration is None else duration
+    end, middle = start + length, start + length / 2
+    yield info_event(language, start, length)
+    yield {
+        "type": "segment",
+        "start": start,
+        "end": end,
+        "text": "test stream",
+        "provisional": True,
+    }
+    yield {
+        "type": "segment_update",
+        "start": start,
+        "end": end,
+        "segments": [
+            {"start": start, "end": middle, "text": "test"},
+            {"start": middle, "end": end, "text": "stream"},
+        ],
+    }
+
+
+def _decode_options(settings: DecodeSettings) -> dict:
+    options = {"beam_size": settings.beam_size}
+    if settings.temperature_fallback is False:
+        # A single greedy pass; no re-decoding at higher temperatures.
+        options["temperature"] = 0.0
+    return options
+
+
+def _log_progress(
+    segment_count: int, position: float, duration: float, start: float = 0.0
+):
+    pct = round((position - start) / duration * 100, 1) if duration else 0
+    logger.info(
+        "transcription_progress",
+        segments_yielded=segment_count,
+        audio_position_s=round(position, 1),
+        percent=pct,
+    )
+
+
+def _record_real_time_factor(audio_seconds: float, wall_seconds: float):
+    if not audio_seconds:
+        return
+    metrics.WHISPER_AUDIO_SECONDS.inc(audio_seconds)
+    metrics.observe_rate(metrics.WHISPER_REAL_TIME_FACTOR, audio_seconds, wall_seconds)
+
+
+def cuda_available() -> bool:
+    import torch  # pylint: disable=import-outside-toplevel
+
+    return torch.cuda.is_available()
@@ -1,9 +1,10 @@
 import threading
-from typing import List
+import time
+from typing import Iterable, List, Optional, Tuple
 
 import structlog
-import torch
-from transformers import MarianMTModel, MarianTokenizer
+from . import deadlines, memory, metrics, tracing
+from .models import DecodeSettings
 
 logger = structlog.get_logger()
 
@@ -18,10 +19,17 @@ FALLBACK_MAPPING = {
 
 class OpusTranslator:  # pylint: disable=too-few-public-methods
     def __init__(self, device=None):
-        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        if device is None:
+            import torch  # pylint: disable=import-outside-toplevel
+
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = device
         self._models = {}
         self._lock = threading.RLock()
 
+    def reset_after_fork(self):
+        self._lock = threading.RLock()
+
     def _get_model(self, source_lang: str, target_lang: str):
         # Normalize
         pair = f"{source_lang}-{target_lang}"
@@ -37,10 +45,27 @@ class OpusTranslator:  # pylint: disable=too-few-public-methods
         with self._lock:
             if model_name not in self._models:
                 logger.info("loading_marian_model", model_name=model_name)
+                # pylint: disable-next=import-outside-toplevel
+                from transformers import MarianMTModel, MarianTokenizer
+
                 try:
-                    tokenizer = MarianTokenizer.from_pretrained(model_name)  # nosec
-                    model = MarianMTModel.from_pretrained(model_name).to(self.device)  # nosec
+                    started = time.perf_counter()
+                    with (
+                        memory.FOOTPRINTS.track("translator", model_name),
+                        tracing.span(
+                            "model_load", engine="translator", model=model_name
+                        ),
+                    ):
+                        tokenizer = MarianTokenizer.from_pretrained(model_name)  # nosec
+                        model = MarianMTModel.from_pretrained(model_name).to(  # nosec
+                            self.device
+                        )
                     self._models[model_name] = (tokenizer, model)
+                    metrics.MODEL_LOAD_SECONDS.set(
+                        time.perf_counter() - started,
+                        engine="translator",
+                        model=model_name,
+                    )
                 except Exception as e:
                     logger.error(
                         "marian_model_load_failed", model=model_name, error=str(e)
@@ -48,39 +73,89 @@ class OpusTranslator:  # pylint: disable=too-few-public-methods
                     raise ValueError(
                         f"Translation model for {source_lang}->{target_lang} failed to load."
                     ) from e
+            # Most recently used last, for shed_models.
+            self._models[model_name] = self._models.pop(model_name)
             return self._models[model_name]
 
+    def loaded_models(self) -> List[str]:
+        return list(self._models)
+
+    def shed_models(self) -> List[str]:
+        """
+        Drops every model but the most recently used; the rest reload on
+        next use.
+        """
+        with self._lock:
+            dropped = list(self._models)[:-1]
+            for model_name in dropped:
+                del self._models[model_name]
+                memory.FOOTPRINTS.forget("translator", model_name)
+        return dropped
+
+    def warmup(self, pairs: Iterable[Tuple[str, str]]):
+        """
+        Loads the given language pairs and runs one short generation each.
+        """
+        for source_lang, target_lang in pairs:
+            self.translate(["hola"], source_lang, target_lang)
+
     def translate(
-        self, texts: List[str], source_lang: str, target_lang: str
+        self,
+        texts: List[str],
+        source_lang: str,
+        target_lang: str,
+        settings: Optional[DecodeSettings] = None,
     ) -> List[str]:
         # pylint: disable=too-many-locals
         """
         Translates a list of texts from source language to target language.
+        `settings` overrides the beam width and output length (the model's
+        generation defaults otherwise).
         """
         # Lock during inference to prevent OOM/Concurrency issues
         # MarianMT inference is relatively heavy.
-        with self._lock:
+        import torch  # pylint: disable=import-outside-toplevel
+
+        pair = f"{source_lang}-{target_lang}"
+        with metrics.timed_lock(self._lock, "translator"):
             tokenizer, model = self._get_model(source_lang, target_lang)
 
             # Batch size for translation
             batch_size = 32
             translated_texts = []
+            generated_tokens = 0
+            started = time.perf_counter()
 
             for i in range(0, len(texts), batch_size):
+                deadlines.check("translate")
                 batch_texts = texts[i : i + batch_size]
 
-                inputs = tokenizer(
-                    batch_texts, return_tensors="pt", padding=True, truncation=True
-                ).to(self.device)
-
-                with torch.no_grad():
-                    generated = model.generate(**inputs)
-
-                batch_translations = tokenizer.batch_decode(
-                    generated, skip_special_tokens=True
-                )
+                with tracing.span(
+                    "inference", engine="translator", pair=pair, texts=len(batch_texts)
+                ):
+                    inputs = tokenizer(
+                        batch_texts, return_tensors="pt", padding=True, truncation=True
+                    ).to(self.device)
+
+                    with torch.no_grad():
+                        generated = model.generate(
+                            **inputs, **_generate_options(settings)
+                        )
+                    generated_tokens += _token_count(generated, tokenizer.pad_token_id)
+
+                    batch_translations = tokenizer.batch_decode(
+                        generated, skip_special_tokens=True
+                    )
                 translated_texts.extend(batch_translations)
 
+            metrics.TRANSLATION_TOKENS.inc(generated_tokens, pair=pair)
+            metrics.observe_rate(
+                metrics.TRANSLATION_TOKENS_PER_SECOND,
+                generated_tokens,
+                time.perf_counter() - started,
+                pair=pair,
+            )
+
         logger.info(
             "translation_complete",
             count=len(translated_texts),
@@ -88,3 +163,25 @@ class OpusTranslator:  # pylint: disable=too-few-public-methods
             target=target_lang,
         )
         return translated_texts
+
+
+def _generate_options(settings: Optional[DecodeSettings]) -> dict:
+    # At full quality the model's own generation config applies unchanged.
+    if settings is None or settings.level == "full":
+        return {}
+    options = {"num_beams": settings.beam_size}
+    if settings.max_new_tokens is not None:
+        options["max_new_tokens"] = settings.max_new_tokens
+    return options
+
+
+def _token_count(generated, pad_token_id: Optional[int]) -> int:
+    """
+    Tokens actually generated: the padding of shorter outputs in the batch
+    (and Marian's decoder start token, which is the pad token) is not counted.
+    """
+    numel = getattr(generated, "numel", None)
+    if not callable(numel):
+        return 0
+    tokens = generated != pad_token_id if pad_token_id is not None else None
+    return int(tokens.sum()) if hasattr(tokens, "sum") else int(numel())
@@ -1,56 +1,78 @@
 import os
-import sys
 import asyncio
 import logging
-import shlex
+import signal
+import time
 import uuid
-from contextlib import asynccontextmanager
+from contextlib import aclosing, asynccontextmanager
 from pathlib import Path
 from typing import Annotated, List
 
-import json
 import structlog
-import torch
 import uvicorn
 from fastapi import Depends, FastAPI, HTTPException, Request, Security
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.security.api_key import APIKeyHeader
-from pydantic import BaseModel, field_validator
 from sse_starlette.sse import EventSourceResponse
+from core import (
+    deadlines,
+    fakes,
+    memory,
+    metrics,
+    prefork,
+    profiling,
+    quality,
+    thumbnails,
+    tracing,
+)
+from core.admission import ADMISSION, AdmissionMiddleware
+from core.audio import AudioDecodeError
+from core.audio_cache import AUDIO_CACHE
+from core.batching import MicroBatcher
+from core.deadlines import DeadlineExceeded
+from core.encoding import CompressionMiddleware, encode_response, etag_matches
+from core.event_stream import sse_events
 from core.filter import SpacyFilter
-from core.models import Segment, TokenAnalysis
-from core.transcriber import WhisperTranscriber
+from core.lemma_index import INDEXES, index_segments
+from core.log_pipeline import (
+    LOG_BACKUP_COUNT,
+    LOG_MAX_BYTES,
+    QUIET_PATHS,
+    EndpointFilter,
+    configure_logging,
+)
+from core.media_jobs import MEDIA_EXECUTOR, MediaJobTimeout, MediaQueueFull
+from core.models import LanguageDetection, LemmaIndex
+from core.paths import (
+    classify_path_error,
+    get_audio_base_dir,
+    resolve_candidate_audio_path,
+)
+from core.quality import QUALITY
+from core.readiness import EngineNotReady, EngineRegistry
+from core.schemas import (
+    AudioFileRequest,
+    FilterRequest,
+    FilterResponse,
+    LemmaIndexRequest,
+    StreamTranscriptionRequest,
+    ThumbnailRequest,
+    ThumbnailResponse,
+    TranscriptionRequest,
+    TranscriptionResponse,
+    TranslationRequest,
+    TranslationResponse,
+    TrickplayRequest,
+    TrickplayResponse,
+)
+from core.singleflight import SingleFlight, StreamFlight, request_key
+from core.transcriber import LANGUAGE_CACHE, WhisperTranscriber
 from core.translator import OpusTranslator
 
 # Silence TensorFlow oneDNN warnings
 os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
 
 
-def get_default_media_root() -> Path:
-    """Prefer Docker path, then local repo media path for development."""
-    docker_media = Path("/app/media")
-    if docker_media.exists():
-        return docker_media
-    repo_media = Path(__file__).resolve().parents[2] / "media"
-    return repo_media
-
-
-def get_media_root() -> Path:
-    """Resolve the shared media root from environment."""
-    configured = os.environ.get("MEDIA_ROOT")
-    if configured:
-        return Path(configured).resolve()
-    return get_default_media_root().resolve()
-
-
-def get_audio_base_dir() -> Path:
-    """Resolve the current transcribe base directory from environment."""
-    configured = os.environ.get("AUDIO_BASE_DIR")
-    if configured:
-        return Path(configured).resolve()
-    return get_media_root()
-
-
 # --- Security ---
 API_KEY_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
@@ -59,6 +81,9 @@ api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 def get_api_key(
     api_key_header_val: str = Security(api_key_header),
 ):
+    # The first sync dependency of a secured route: the request has just been
+    # handed a threadpool worker.
+    tracing.since_request_start("threadpool_wait")
     expected_api_key = os.getenv("AI_SERVICE_API_KEY")
     if not expected_api_key:
         return None
@@ -76,80 +101,147 @@ def get_api_key(
 LOGS_DIR = Path(os.getenv("LOGS_DIR", "logs")).resolve()
 LOGS_DIR.mkdir(exist_ok=True, parents=True)
 
-logging.root.handlers = []
+# Set on workers started by the dispatcher; pre-forked workers switch to
+# their own files when they fork.
+WORKER_ID = os.getenv("AI_SERVICE_WORKER_ID") or None
+configure_logging(LOGS_DIR, worker=WORKER_ID)
+tracing.TRACES.configure(
+    LOGS_DIR / "traces.jsonl", LOG_MAX_BYTES, LOG_BACKUP_COUNT, worker=WORKER_ID
+)
+logger = structlog.get_logger()
+logging.getLogger("uvicorn.access").addFilter(EndpointFilter())
 
 
-def rename_event_to_message(_logger, _method_name, event_dict):
-    if "event" in event_dict:
-        event_dict["message"] = event_dict.pop("event")
-    return event_dict
+# --- State ---
+ENGINE_READY_TIMEOUT_S = float(os.getenv("ENGINE_READY_TIMEOUT_S", "120"))
+# An engine that still fails to load after its retries stops the process so
+# the orchestrator restarts it, instead of answering 503 indefinitely.
+ENGINE_EXIT_ON_FAILURE = os.getenv("ENGINE_EXIT_ON_FAILURE", "1") == "1"
 
 
-structlog.configure(
-    processors=[
-        structlog.contextvars.merge_contextvars,  # Added for Request ID
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        rename_event_to_message,
-        structlog.processors.JSONRenderer(),
-    ],
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    wrapper_class=structlog.stdlib.BoundLogger,
-    cache_logger_on_first_use=True,
-)
+def _language_list(raw: str) -> List[str]:
+    return [item.strip() for item in raw.split(",") if item.strip()]
 
-std_logger = logging.getLogger()
-std_logger.setLevel(logging.INFO)
-std_logger.addHandler(logging.StreamHandler(sys.stdout))
-std_logger.addHandler(logging.FileHandler(LOGS_DIR / "ai-service.log"))
 
-logger = structlog.get_logger()
+def _build_transcriber() -> WhisperTranscriber:
+    if fakes.enabled("transcriber"):
+        return fakes.FakeTranscriber()
+    if os.getenv("AI_SERVICE_TEST_MODE") == "1":
+        return WhisperTranscriber(model_size="tiny", device="cpu")
+    return WhisperTranscriber(model_size="tiny")
+
 
+def _build_filter() -> SpacyFilter:
+    if fakes.enabled("filter"):
+        return fakes.FakeFilter()
+    return SpacyFilter()
 
-class EndpointFilter(logging.Filter):
-    def filter(self, record: logging.LogRecord) -> bool:
-        args = getattr(record, "args", None)
-        path = None
 
-        if isinstance(args, (tuple, list)):
-            if len(args) >= 3:
-                path = args[2]
-        elif isinstance(args, dict):
-            path = args.get("path")
+def _build_translator() -> OpusTranslator:
+    if fakes.enabled("translator"):
+        return fakes.FakeTranslator()
+    if os.getenv("AI_SERVICE_TEST_MODE") == "1":
+        return OpusTranslator(device="cpu")
+    return OpusTranslator()
 
-        if path is None:
-            return True
 
-        return bool(path != "/health")
+def _warm_transcriber(transcriber: WhisperTranscriber):
+    transcriber.warmup()
 
 
-logging.getLogger("uvicorn.access").addFilter(EndpointFilter())
+def _warm_filter(text_filter: SpacyFilter):
+    text_filter.warmup(_language_list(os.getenv("SPACY_PRELOAD_LANGUAGES", "es,en")))
 
 
-# --- State ---
-brain_state = {
-    "transcriber": None,
-    "filter": None,
-    "translator": None,
-}
+def _warm_translator(translator: OpusTranslator):
+    # Marian models may need a download, so none are preloaded by default.
+    pairs = _language_list(os.getenv("TRANSLATION_PRELOAD_PAIRS", ""))
+    translator.warmup(tuple(pair.split("-", 1)) for pair in pairs if "-" in pair)
+
+
+def _stop_on_engine_failure(name: str, error: str):
+    if not ENGINE_EXIT_ON_FAILURE:
+        return
+    logger.critical("engine_failed_stopping", engine=name, error=error)
+    # Graceful shutdown; uvicorn re-raises the signal, so the exit status
+    # reports the failure.
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+brain_state = EngineRegistry()
+brain_state.register("transcriber", _build_transcriber, _warm_transcriber)
+brain_state.register("filter", _build_filter, _warm_filter)
+brain_state.register("translator", _build_translator, _warm_translator)
+
+
+def _engine_models():
+    return {
+        name: engine.loaded_models()
+        for name in brain_state.names
+        if hasattr(engine := brain_state.peek(name), "loaded_models")
+    }
+
+
+def _shed_engine_models():
+    # Keeps each engine's default model; extra profiles, pairs and
+    # pipelines reload on next use.
+    for name in brain_state.names:
+        shed = getattr(brain_state.peek(name), "shed_models", None)
+        if shed is not None:
+            logger.info("engine_models_shed", engine=name, models=shed())
+
+
+memory.CACHES.register("engine_models", _engine_models, _shed_engine_models)
+memory.CACHES.register("audio_cache", AUDIO_CACHE.stats)
+memory.CACHES.register("profiles", profiling.PROFILES.stats, profiling.PROFILES.clear)
+memory.CACHES.register("languages", LANGUAGE_CACHE.stats, LANGUAGE_CACHE.clear)
+memory.CACHES.register("lemma_indexes", INDEXES.stats, INDEXES.clear)
 
 
 # --- Dependencies ---
+def _engine(name: str):
+    try:
+        return brain_state.get(name, timeout=ENGINE_READY_TIMEOUT_S)
+    except EngineNotReady as e:
+        logger.warning("engine_not_ready", engine=name, status=e.status)
+        raise HTTPException(
+            status_code=503,
+            detail=f"{name} engine is {e.status}",
+            headers={"Retry-After": "5"},
+        ) from e
+
+
+class _EngineHandle:
+    """
+    Resolves an engine on first use rather than as a dependency, so paths
+    and bodies are validated before a request waits for a model to load.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr: str):
+        return getattr(_engine(self._name), attr)
+
+    def resolve(self):
+        return _engine(self._name)
+
+
+def _resolved(engine):
+    # Dependency overrides (tests) hand in the engine itself.
+    return engine.resolve() if isinstance(engine, _EngineHandle) else engine
+
+
 def get_transcriber():
-    return brain_state["transcriber"]
+    return _EngineHandle("transcriber")
 
 
 def get_filter():
-    return brain_state["filter"]
+    return _EngineHandle("filter")
 
 
 def get_translator():
-    return brain_state["translator"]
+    return _EngineHandle("translator")
 
 
 TranscriberDep = Annotated[WhisperTranscriber, Depends(get_transcriber)]
@@ -159,18 +251,17 @@ TranslatorDep = Annotated[OpusTranslator, Depends(get_translator)]
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
+    # Models load in the background so the socket opens immediately; /ready
+    # reports progress and requests wait for the engine they need.
     logger.info("startup_models_loading")
-    if os.getenv("AI_SERVICE_TEST_MODE") == "1":
-        brain_state["transcriber"] = WhisperTranscriber(model_size="tiny", device="cpu")
-        brain_state["filter"] = SpacyFilter()
-        brain_state["translator"] = OpusTranslator(device="cpu")
-    else:
-        brain_state["transcriber"] = WhisperTranscriber(model_size="tiny")
-        brain_state["filter"] = SpacyFilter()
-        brain_state["translator"] = OpusTranslator()
-    logger.info("startup_models_loaded")
-    print("[AI Service] Models loaded. Ready to accept requests.", flush=True)
+    brain_state.start_background_load(
+        warmup=os.getenv("AI_SERVICE_WARMUP", "1") == "1",
+        on_failure=_stop_on_engine_failure,
+    )
+    memory.WATCHDOG.start()
     yield
+    memory.WATCHDOG.stop()
+    brain_state.reset()
     logger.info("shutdown_cleanup")
 
 
@@ -199,82 +290,127 @@ app = FastAPI(
 
 
 # --- Middleware ---
+app.add_middleware(CompressionMiddleware)
+
+
 @app.middleware("http")
 async def add_request_id(request: Request, call_next):
     request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
     structlog.contextvars.clear_contextvars()
     structlog.contextvars.bind_contextvars(request_id=request_id)
-    response = await call_next(request)
-    response.headers["X-Request-ID"] = request_id
-    return response
-
-
-@app.exception_handler(Exception)
-async def global_exception_handler(request: Request, exc: Exception):
-    logger.error("global_error", path=request.url.path, error=str(exc))
-    return JSONResponse(
-        status_code=500,
-        content={"detail": "Internal AI Service Error", "message": str(exc)},
-    )
-
-
-# --- Models ---
-class ThumbnailRequest(BaseModel):
-    file_path: str
-
-    @field_validator("file_path")
-    @classmethod
-    def path_must_be_safe(cls, v: str) -> str:
-        return str(resolve_candidate_path(v, get_media_root()))
-
+    if request.url.path in QUIET_PATHS:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+    with tracing.TRACES.request(
+        request_id,
+        f"{request.method} {request.url.path}",
+        **{"http.method": request.method, "http.route": request.url.path},
+    ) as finish_trace:
+        try:
+            response = await call_next(request)
+        except Exception as e:
+            finish_trace(500, type(e).__name__)
+            raise
 
-class ThumbnailResponse(BaseModel):
-    thumbnail_path: str
+    async def finish_after_body(body_iterator):
+        # The trace ends once the last chunk is out, so streams are covered.
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            finish_trace(response.status_code)
 
+    response.body_iterator = finish_after_body(response.body_iterator)
+    response.headers["X-Request-ID"] = request_id
+    return response
 
-class TranscriptionRequest(BaseModel):
-    file_path: str
-    language: str = "es"
 
-    @field_validator("file_path")
-    @classmethod
-    def path_must_be_safe(cls, v: str) -> str:
-        # Route-level logic applies strict path policy and canonicalization.
-        # Keep model-level validation lightweight to avoid duplicate/conflicting checks.
-        if not v or not str(v).strip():
-            raise ValueError("Empty file path")
-        return str(v)
+app.add_middleware(
+    profiling.ProfilingMiddleware,
+    directory=lambda: LOGS_DIR / "profiles",
+    key_header=API_KEY_NAME,
+)
 
 
-class TranscriptionResponse(BaseModel):
-    segments: List[Segment]
-    language: str
-    language_probability: float
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    endpoint = request.url.path
+    if endpoint in QUIET_PATHS:
+        return await call_next(request)
+    if endpoint not in {getattr(route, "path", None) for route in app.routes}:
+        # Unknown paths share one label so scanners cannot blow up cardinality.
+        endpoint = "unmatched"
+    started = time.perf_counter()
+    metrics.REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+        metrics.REQUEST_LATENCY.observe(
+            time.perf_counter() - started,
+            endpoint=endpoint,
+            method=request.method,
+            status=str(status),
+        )
 
 
-class TranslationRequest(BaseModel):
-    texts: List[str]
-    source_lang: str = "es"
-    # Added fallback logic in core/translator.py handles pair validity,
-    # but here we allow "es", "en" etc.
-    target_lang: str = "en"
+# Shed load before doing any other work; only the deadline is set first.
+# The counter lives in shared memory, so the limit holds across pre-forked
+# workers.
+app.add_middleware(AdmissionMiddleware, counter=ADMISSION, exempt=QUIET_PATHS)
 
 
-class TranslationResponse(BaseModel):
-    translations: List[str]
+@app.middleware("http")
+async def apply_deadline(request: Request, call_next):
+    # Registered last so it is outermost: the caller's budget starts counting
+    # before admission and everything below sees it through a contextvar.
+    deadline = deadlines.parse_timeout_ms(
+        request.headers.get(deadlines.DEADLINE_HEADER)
+    )
+    if deadline is None:
+        return await call_next(request)
+    with deadlines.scope(deadline):
+        return await call_next(request)
 
 
-class FilterRequest(BaseModel):
-    texts: List[str]
-    language: str = "es"
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    # The caller has already given up; answer cheaply and say where it ran out.
+    logger.warning("deadline_exceeded", path=request.url.path, stage=exc.stage)
+    metrics.DEADLINES_EXCEEDED.inc(stage=exc.stage)
+    return JSONResponse(
+        status_code=504,
+        content={"detail": "Request deadline exceeded", "stage": exc.stage},
+    )
 
 
-class FilterResponse(BaseModel):
-    results: List[List[TokenAnalysis]]
+@app.exception_handler(Exception)
+async def global_exception_handler(request: Request, exc: Exception):
+    logger.error("global_error", path=request.url.path, error=str(exc))
+    return JSONResponse(
+        status_code=500,
+        content={"detail": "Internal AI Service Error", "message": str(exc)},
+    )
 
 
 # --- Endpoints ---
 
+_transcribe_flights = SingleFlight("/transcribe")
+_stream_flights = StreamFlight("/transcribe/stream")
+_detect_flights = SingleFlight("/detect_language")
+_translate_flights = SingleFlight("/translate")
+_filter_flights = SingleFlight("/filter")
+_lemma_flights = SingleFlight("/lemma_index")
+# Opt-in (MICRO_BATCH_ENABLED=1): merges concurrent small requests for the
+# same language pair / spaCy model into one forward pass.
+_translate_batcher = MicroBatcher("/translate")
+_filter_batcher = MicroBatcher("/filter")
+
 
 @app.post(
     "/generate_thumbnail",
@@ -298,30 +434,22 @@ async def generate_thumbnail(req: ThumbnailRequest):
     base, _ = os.path.splitext(req.file_path)
     thumb_path = f"{base}.jpg"
 
+    # -ss before -i seeks in the container instead of decoding up to 1s.
     cmd = [
         "ffmpeg",
         "-y",
-        "-i",
-        req.file_path,
         "-ss",
         "00:00:01",
+        "-i",
+        req.file_path,
         "-vframes",
         "1",
         thumb_path,
     ]
-    logger.info("running_ffmpeg_async", command=shlex.join(cmd))
-
-    # Async execution to prevent event loop blocking
     try:
-        process = await asyncio.create_subprocess_exec(
-            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-        )
-        _stdout, stderr = await process.communicate()
-
-        if process.returncode != 0:
-            error_msg = stderr.decode() if stderr else "Unknown ffmpeg error"
-            raise RuntimeError(f"ffmpeg failed: {error_msg}")
-
+        await _run_ffmpeg(cmd)
+    except (HTTPException, DeadlineExceeded):
+        raise
     except Exception as e:
         logger.error("ffmpeg_execution_failed", error=str(e))
         raise HTTPException(status_code=500, detail=str(e)) from e
@@ -329,108 +457,212 @@ async def generate_thumbnail(req: ThumbnailRequest):
     return ThumbnailResponse(thumbnail_path=thumb_path)
 
 
+@app.post(
+    "/thumbnails",
+    response_model=TrickplayResponse,
+    tags=["Media"],
+    description=(
+        "Generates a poster frame, tiled sprite sheets and a WebVTT index for "
+        "scrubbing previews in a single FFmpeg pass. Results are cached next to "
+        "the video and reused until the file changes."
+    ),
+    dependencies=_secured,
+)
+async def generate_trickplay(req: TrickplayRequest, request: Request):
+    logger.info("request_received", endpoint="/thumbnails", file_path=req.file_path)
+
+    if not os.path.exists(req.file_path):
+        logger.error("file_not_found_system_error", path=req.file_path)
+        raise HTTPException(
+            status_code=500, detail=f"File not found on disk: {req.file_path}"
+        )
+
+    options = thumbnails.TrickplayOptions(**req.model_dump(exclude={"file_path"}))
+    try:
+        result = await thumbnails.generate_trickplay(
+            req.file_path, options, _run_ffmpeg
+        )
+    except (HTTPException, DeadlineExceeded):
+        raise
+    except Exception as e:
+        logger.error("trickplay_failed", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+    return encode_response(request, TrickplayResponse(**result))
+
+
+async def _run_ffmpeg(cmd: List[str]) -> bytes:
+    # Bounded pool: bulk backfills queue up instead of forking one ffmpeg
+    # per request next to the models.
+    try:
+        return await MEDIA_EXECUTOR.run(cmd)
+    except MediaQueueFull as e:
+        logger.warning("media_job_rejected", **MEDIA_EXECUTOR.stats())
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": "5"}
+        ) from e
+    except MediaJobTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
+
+
+def _validated_audio_path(file_path: str) -> Path:
+    """
+    Validates and normalizes a requested audio path (no directory traversal
+    out of the audio base directory) and checks that the file exists.
+    """
+    with tracing.span("validate_path"):
+        try:
+            candidate_path = resolve_candidate_audio_path(
+                file_path, get_audio_base_dir()
+            )
+        except ValueError as e:
+            reason = classify_path_error(e)
+            logger.error(
+                "invalid_file_path", path=file_path, reason=reason, error=str(e)
+            )
+            raise HTTPException(status_code=400, detail="Invalid file path.") from e
+        except (TypeError, OSError) as e:
+            logger.error(
+                "invalid_file_path",
+                path=file_path,
+                reason="filesystem_error",
+                error=str(e),
+            )
+            raise HTTPException(status_code=400, detail="Invalid file path.") from e
+
+        # Manual check for 500
+        if not os.path.exists(candidate_path):
+            logger.error("file_not_found_system_error", path=str(candidate_path))
+            raise HTTPException(
+                status_code=500, detail=f"File not found on disk: {candidate_path}"
+            )
+    return candidate_path
+
+
 @app.post(
     "/transcribe",
     response_model=TranscriptionResponse,
     tags=["AI"],
-    description="Transcribes an audio file using Faster-Whisper.",
+    description=(
+        "Transcribes an audio file using Faster-Whisper. `start` with `end` or "
+        "`first_seconds` limits it to a time range; timestamps stay absolute."
+    ),
     dependencies=_secured,
 )
-def transcribe(req: TranscriptionRequest, transcriber: TranscriberDep):
+def transcribe(
+    req: TranscriptionRequest, transcriber: TranscriberDep, request: Request
+):
     logger.info("request_received", endpoint="/transcribe", file_path=req.file_path)
 
-    # Validate and normalize the requested file path to prevent directory traversal.
-    try:
-        candidate_path = resolve_candidate_audio_path(
-            req.file_path, get_audio_base_dir()
-        )
-    except ValueError as e:
-        reason = classify_path_error(e)
-        logger.error(
-            "invalid_file_path", path=req.file_path, reason=reason, error=str(e)
-        )
+    candidate_path = _validated_audio_path(req.file_path)
 
-        raise HTTPException(status_code=400, detail="Invalid file path.") from e
-    except (TypeError, OSError) as e:
-        logger.error(
-            "invalid_file_path",
-            path=req.file_path,
-            reason="filesystem_error",
-            error=str(e),
-        )
-        raise HTTPException(status_code=400, detail="Invalid file path.") from e
+    settings = quality.transcription_settings(QUALITY.level("transcriber"))
+    # Identical concurrent requests (platform retries, duplicate imports)
+    # share one transcription.
+    result = _transcribe_flights.do(
+        request_key(str(candidate_path), req.language, req.start, req.duration),
+        lambda: transcriber.transcribe(
+            str(candidate_path), req.language, settings, req.start, req.duration
+        ),
+    )
+    return encode_response(
+        request,
+        TranscriptionResponse(
+            segments=result.segments,
+            language=result.language,
+            language_probability=result.language_probability,
+            quality=result.quality,
+        ),
+    )
 
-    # Manual check for 500
-    if not os.path.exists(candidate_path):
-        logger.error("file_not_found_system_error", path=str(candidate_path))
-        raise HTTPException(
-            status_code=500, detail=f"File not found on disk: {candidate_path}"
-        )
 
-    result = transcriber.transcribe(str(candidate_path), req.language)
-    return TranscriptionResponse(
-        segments=result.segments,
-        language=result.language,
-        language_probability=result.language_probability,
+@app.post(
+    "/detect_language",
+    response_model=LanguageDetection,
+    tags=["AI"],
+    description=(
+        "Detects the spoken language from a few short windows spread across "
+        "the file (only those are decoded) and returns the most likely "
+        "languages with probabilities. Results are cached by file content."
+    ),
+    dependencies=_secured,
+)
+def detect_language(
+    req: AudioFileRequest, transcriber: TranscriberDep, request: Request
+):
+    logger.info(
+        "request_received", endpoint="/detect_language", file_path=req.file_path
     )
+    candidate_path = _validated_audio_path(req.file_path)
+    try:
+        detection = _detect_flights.do(
+            request_key(str(candidate_path)),
+            lambda: transcriber.detect_language(str(candidate_path)),
+        )
+    except AudioDecodeError as e:
+        logger.error("language_probe_failed", path=str(candidate_path), error=str(e))
+        raise HTTPException(status_code=422, detail="No decodable audio.") from e
+    return encode_response(request, detection)
 
 
 @app.post(
     "/transcribe/stream",
     tags=["AI"],
-    description="Streams transcription progress via SSE. Yields info then segment events.",
+    description=(
+        "Streams transcription progress via SSE. Yields info then segment events; "
+        "segments produced close together arrive as one `segments` event and "
+        "`progress` events are sent while nothing else is. "
+        "Accepts audio or video files; audio is decoded while transcribing. "
+        "With `refine`, segments are provisional and later replaced by "
+        "segment_update events (start, end, segments) from a larger model. "
+        "A time range (`start`, `end` or `first_seconds`) is transcribed alone, "
+        "with absolute timestamps; the info event reports its start."
+    ),
     dependencies=_secured,
 )
-async def transcribe_stream(req: TranscriptionRequest, transcriber: TranscriberDep):
+async def transcribe_stream(
+    req: StreamTranscriptionRequest, transcriber: TranscriberDep
+):
     logger.info(
         "request_received", endpoint="/transcribe/stream", file_path=req.file_path
     )
 
-    try:
-        candidate_path = resolve_candidate_audio_path(
-            req.file_path, get_audio_base_dir()
-        )
-    except ValueError as e:
-        reason = classify_path_error(e)
-        logger.error(
-            "invalid_file_path", path=req.file_path, reason=reason, error=str(e)
-        )
-        raise HTTPException(status_code=400, detail="Invalid file path.") from e
-    except (TypeError, OSError) as e:
-        logger.error(
-            "invalid_file_path",
-            path=req.file_path,
-            reason="filesystem_error",
-            error=str(e),
-        )
-        raise HTTPException(status_code=400, detail="Invalid file path.") from e
+    candidate_path = _validated_audio_path(req.file_path)
+    # Wait for the model here so a failed engine is still a 503, not an error
+    # event inside the stream.
+    transcriber = await asyncio.to_thread(_resolved, transcriber)
 
-    if not os.path.exists(candidate_path):
-        logger.error("file_not_found_system_error", path=str(candidate_path))
-        raise HTTPException(
-            status_code=500, detail=f"File not found on disk: {candidate_path}"
-        )
+    settings = quality.transcription_settings(QUALITY.level("transcriber"))
 
     async def event_generator():
-        loop = asyncio.get_running_loop()
-        gen = transcriber.transcribe_stream(str(candidate_path), req.language)
-        _done = object()
-        try:
-            while True:
-                # Use next(gen, _done) to avoid StopIteration leaking into the
-                # asyncio Future, where Python converts it to RuntimeError
-                item = await loop.run_in_executor(None, next, gen, _done)
-                if item is _done:
+        # Joins an identical stream already running (replaying what it has
+        # produced so far) instead of transcribing the file twice.
+        if req.refine:
+            gen = _stream_flights.subscribe(
+                request_key(
+                    str(candidate_path), req.language, req.start, req.duration, "refine"
+                ),
+                lambda: transcriber.transcribe_refined(
+                    str(candidate_path), req.language, req.start, req.duration
+                ),
+            )
+        else:
+            gen = _stream_flights.subscribe(
+                request_key(str(candidate_path), req.language, req.start, req.duration),
+                lambda: transcriber.transcribe_stream(
+                    str(candidate_path), req.language, settings, req.start, req.duration
+                ),
+            )
+        # A dedicated thread drains the generator (and closes it, which
+        # unsubscribes, once we stop); close-together segments are sent as
+        # one event and progress events keep idle connections alive.
+        async with aclosing(sse_events(gen, "transcribe-stream")) as frames:
+            async for frame in frames:
+                if deadlines.expired():
+                    logger.warning("deadline_exceeded", path="/transcribe/stream")
+                    metrics.DEADLINES_EXCEEDED.inc(stage="transcribe_stream")
                     break
-                event_type = item.get("type", "segment")
-                yield {"event": event_type, "data": json.dumps(item)}
-        finally:
-            close = getattr(gen, "close", None)
-            if callable(close):
-                try:
-                    close()
-                except ValueError as exc:
-                    logger.warning("generator_close_error", error=str(exc))
+                yield frame
 
     return EventSourceResponse(event_generator())
 
@@ -442,10 +674,26 @@ async def transcribe_stream(req: TranscriptionRequest, transcriber: TranscriberD
     description="Translates a batch of texts using MarianMT models.",
     dependencies=_secured,
 )
-def translate(req: TranslationRequest, translator: TranslatorDep):
+def translate(req: TranslationRequest, translator: TranslatorDep, request: Request):
     # Translator logic handles missing models with error logs now
-    translations = translator.translate(req.texts, req.source_lang, req.target_lang)
-    return TranslationResponse(translations=translations)
+    settings = quality.translation_settings(QUALITY.level("translator"))
+    # Coalesced callers report the settings of the call they joined.
+    translations, applied = _translate_flights.do(
+        request_key(req.texts, req.source_lang, req.target_lang),
+        lambda: (
+            _translate_batcher.submit(
+                (req.source_lang, req.target_lang, settings.level),
+                req.texts,
+                lambda texts: translator.translate(
+                    texts, req.source_lang, req.target_lang, settings
+                ),
+            ),
+            settings,
+        ),
+    )
+    return encode_response(
+        request, TranslationResponse(translations=translations, quality=applied)
+    )
 
 
 @app.post(
@@ -455,49 +703,161 @@ def translate(req: TranslationRequest, translator: TranslatorDep):
     description="Analyzes a batch of texts using SpaCy for linguistic filtering.",
     dependencies=_secured,
 )
-def filter_text(req: FilterRequest, text_filter: FilterDep):
-    results = text_filter.analyze_batch(req.texts, req.language)
-    return FilterResponse(results=results)
+def filter_text(req: FilterRequest, text_filter: FilterDep, request: Request):
+    results = _filter_flights.do(
+        request_key(req.texts, req.language),
+        lambda: _filter_batcher.submit(
+            req.language,
+            req.texts,
+            lambda texts: text_filter.analyze_batch(texts, req.language),
+        ),
+    )
+    return encode_response(request, FilterResponse(results=results))
 
 
-@app.get("/health", tags=["System"], description="Health check endpoint.")
-async def health():
-    return {"status": "ai_service_active", "gpu": torch.cuda.is_available()}
+@app.post(
+    "/lemma_index",
+    response_model=LemmaIndex,
+    tags=["AI"],
+    description=(
+        "Builds the lemma index of a video's segments: one row per unique "
+        "(lemma, POS) with its count, first segment and the IDs of the segments "
+        "it occurs in, most frequent first. Indexes are cached by content and "
+        "spaCy model version; the ETag allows conditional requests with "
+        "If-None-Match."
+    ),
+    dependencies=_secured,
+)
+def lemma_index(req: LemmaIndexRequest, text_filter: FilterDep, request: Request):
+    segment_ids = req.segment_ids or list(range(len(req.texts)))
+    model = text_filter.model_version(req.language)
+    key = request_key(req.texts, segment_ids, req.language, model)
+    etag = f'"{key[:32]}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    index = _lemma_flights.do(
+        key,
+        lambda: index_segments(text_filter, req.texts, segment_ids, req.language, key),
+    )
+    response = encode_response(request, index)
+    response.headers["ETag"] = etag
+    return response
 
 
-def resolve_candidate_path(raw_path: str, allowed_root: Path) -> Path:
-    if not raw_path or not str(raw_path).strip():
-        raise ValueError("Empty file path")
-    if "\x00" in str(raw_path):
-        raise ValueError("Invalid file path")
+@app.get(
+    "/profiles/summary",
+    tags=["System"],
+    description=(
+        "Top functions across recently profiled requests "
+        f"(send `{profiling.PROFILE_HEADER}: 1` with the API key to profile one)."
+    ),
+    dependencies=_secured,
+)
+async def profiles_summary(limit: int = 20):
+    return profiling.PROFILES.summary(limit=limit)
 
-    base_path = os.path.abspath(str(allowed_root))
-    user_path = str(raw_path)
 
-    if os.path.isabs(user_path):
-        fullpath = os.path.normpath(user_path)
-    else:
-        fullpath = os.path.normpath(os.path.join(base_path, user_path))
+@app.get(
+    "/memory",
+    tags=["System"],
+    description=(
+        "Process RSS, estimated size per engine and model, cache sizes and "
+        "tracemalloc state; `top` adds the largest allocation sites while tracing."
+    ),
+    dependencies=_secured,
+)
+def memory_report(top: int = 0):
+    return memory.report(top=min(max(top, 0), 200))
 
-    if not fullpath.startswith(base_path):
-        raise ValueError("Path traversal detected")
 
-    return Path(fullpath)
+@app.post(
+    "/memory/snapshots",
+    tags=["System"],
+    description=(
+        "Starts tracemalloc on the first call; later calls return the top "
+        "allocation sites and the growth since the previous snapshot."
+    ),
+    dependencies=_secured,
+)
+def memory_snapshot(limit: int = 20):
+    return memory.TRACER.snapshot(limit=min(max(limit, 1), 200))
+
+
+@app.delete(
+    "/memory/snapshots",
+    tags=["System"],
+    description="Stops tracemalloc and drops the stored snapshot.",
+    dependencies=_secured,
+)
+def stop_memory_tracing():
+    memory.TRACER.stop()
+    return {"tracing": False}
+
+
+@app.get(
+    "/traces/{request_id}",
+    tags=["System"],
+    description=(
+        "Spans recorded for a request (by its X-Request-ID) in OTLP/JSON: path "
+        "validation, threadpool and lock waits, model loads, inference and "
+        "serialization. Recent traces are served from memory, older ones from "
+        "the trace file."
+    ),
+    dependencies=_secured,
+)
+def get_trace(request_id: str):
+    trace = tracing.TRACES.get(request_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
 
 
-def resolve_candidate_audio_path(raw_path: str, audio_base_dir: Path) -> Path:
-    return resolve_candidate_path(raw_path, audio_base_dir)
+@app.get("/health", tags=["System"], description="Health check endpoint.")
+async def health():
+    # Device is known once Whisper is loaded; never touch torch from here.
+    transcriber = brain_state.peek("transcriber")
+    gpu = getattr(transcriber, "device", None) == "cuda" if transcriber else None
+    return {
+        "status": "ai_service_active",
+        "gpu": gpu,
+        "media_jobs": MEDIA_EXECUTOR.stats(),
+        "decode_quality": QUALITY.stats(),
+    }
+
+
+@app.get(
+    "/ready",
+    tags=["System"],
+    description="Readiness probe: 200 once every engine is loaded and warmed up.",
+)
+async def ready():
+    return JSONResponse(
+        status_code=200 if brain_state.all_ready() else 503,
+        content={"ready": brain_state.all_ready(), "engines": brain_state.status()},
+    )
 
 
-def classify_path_error(error: Exception) -> str:
-    error_msg = str(error).lower()
-    if "empty" in error_msg:
-        return "empty_path"
-    if "absolute" in error_msg:
-        return "absolute_path"
-    return "path_traversal"
+@app.get(
+    "/metrics",
+    tags=["System"],
+    description="Prometheus metrics: request latency, engine lock wait and throughput.",
+)
+async def prometheus_metrics():
+    metrics.update_threadpool_gauges()
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
 
 
 if __name__ == "__main__":
+    # Imported here so workers do not register the dispatcher's metrics.
+    from core import dispatcher
+
     host = os.getenv("UVICORN_HOST", "127.0.0.1")
-    uvicorn.run(app, host=host, port=8000)
+    workers = int(os.getenv("AI_SERVICE_WORKERS", "1"))
+    if dispatcher.configured():
+        dispatcher.serve(host, port=8000)
+    elif workers > 1:
+        prefork.serve(
+            app, brain_state, host=host, port=8000, workers=workers, admission=ADMISSION
+        )
+    else:
+        uvicorn.run(app, host=host, port=8000)
@@ -1,8 +1,41 @@
 import os
+import tempfile
+from contextlib import asynccontextmanager
 from pathlib import Path
 
+import pytest
+from fastapi.testclient import TestClient
+
 BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent
 MEDIA_DIR = BASE_DIR / "media"
 
 os.environ.setdefault("MEDIA_ROOT", str(MEDIA_DIR))
 os.environ.setdefault("AUDIO_BASE_DIR", str(MEDIA_DIR))
+os.environ.setdefault("ENGINE_EXIT_ON_FAILURE", "0")
+# Logs, traces and profiles written by the app under test stay out of the
+# source tree.
+os.environ.setdefault("LOGS_DIR", tempfile.mkdtemp(prefix="ai-service-test-logs-"))
+
+# main reads the environment above at import time.
+import main  # noqa: E402  # pylint: disable=wrong-import-position
+
+
+@asynccontextmanager
+async def noop_lifespan(_app):
+    yield
+
+
+@pytest.fixture(name="api_client")
+def _api_client(monkeypatch):
+    """
+    A client for the app with its lifespan swapped out, so no engine loads,
+    and AI_SERVICE_API_KEY set to "test_key". Tests install the engines they
+    need through dependency_overrides; those are cleared afterwards.
+    """
+    monkeypatch.setenv("AI_SERVICE_API_KEY", "test_key")
+    monkeypatch.setattr(main.app.router, "lifespan_context", noop_lifespan)
+    try:
+        with TestClient(main.app) as test_client:
+            yield test_client
+    finally:
+        main.app.dependency_overrides = {}
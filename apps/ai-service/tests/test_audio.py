@@ -0,0 +1,251 @@
+import shutil
+import subprocess
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from core import audio, transcriber as transcriber_module
+from core.audio_cache import AudioCache
+from core.transcriber import WhisperTranscriber
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None, reason="ffmpeg not installed"
+)
+
+
+@pytest.fixture(name="video_with_pause")
+def _video_with_pause(tmp_path):
+    # 3s tone, 1s silence, 3s tone, muxed with a video track.
+    path = tmp_path / "clip.mp4"
+    subprocess.run(  # noqa: S603
+        [  # noqa: S607
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", "testsrc=duration=7:size=64x64:rate=5",
+            "-f", "lavfi", "-i",
+            "aevalsrc='if(between(t,3,4),0,0.5*sin(440*2*PI*t))':s=16000:d=7",
+            "-shortest", "-c:a", "aac", str(path),
+        ],
+        check=True,
+    )  # fmt: skip
+    return str(path)
+
+
+@pytest.fixture(name="engine")
+def _engine(monkeypatch):
+    # The tests drive the engine with fake models; no weights are loaded.
+    monkeypatch.setattr(WhisperTranscriber, "_load_model", lambda *_args: None)
+    engine = WhisperTranscriber()
+    engine._test_mode = False  # pylint: disable=protected-access
+    return engine
+
+
+def test_pcm_stream_decodes_video_container(video_with_pause):
+    with audio.PcmStream(video_with_pause) as stream:
+        first = stream.read(2.0)
+        rest = stream.read(60.0)
+        assert stream.read(1.0).size == 0
+
+    assert first.dtype == np.float32
+    assert first.size == 2 * audio.SAMPLE_RATE
+    assert abs((first.size + rest.size) / audio.SAMPLE_RATE - 7.0) < 0.1
+    assert audio.probe_duration(video_with_pause) == pytest.approx(7.0, abs=0.1)
+
+
+def test_windows_are_cut_in_the_pause(video_with_pause):
+    with audio.PcmStream(video_with_pause) as stream:
+        windows = list(audio.stream_windows(stream, 4.0, 4.0, search_s=2.0))
+
+    offsets = [offset for offset, _ in windows]
+    assert offsets[0] == 0.0
+    assert 3.0 <= offsets[1] <= 4.0
+    total = sum(samples.size for _, samples in windows) / audio.SAMPLE_RATE
+    assert total == pytest.approx(7.0, abs=0.1)
+
+
+def test_decode_error_is_raised(tmp_path):
+    bogus = tmp_path / "bogus.mp4"
+    bogus.write_bytes(b"not media")
+
+    with pytest.raises(audio.AudioDecodeError):
+        with audio.PcmStream(str(bogus)) as stream:
+            stream.read(1.0)
+
+
+def test_stream_shifts_segments_to_source_timeline(
+    video_with_pause, engine, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(
+        transcriber_module, "AUDIO_CACHE", AudioCache(str(tmp_path / "cache"), 0)
+    )
+    monkeypatch.setattr(transcriber_module, "WHISPER_STREAM_FIRST_WINDOW_S", 4.0)
+    monkeypatch.setattr(transcriber_module, "WHISPER_STREAM_WINDOW_S", 4.0)
+    calls = []
+
+    class FakeModel:
+        def transcribe(self, samples, language=None, initial_prompt=None, **_kw):
+            calls.append((language, initial_prompt))
+            seconds = samples.size / audio.SAMPLE_RATE
+            segment = SimpleNamespace(start=0.0, end=seconds, text=f" w{len(calls)}")
+            info = SimpleNamespace(language="es", language_probability=0.9)
+            return iter([segment]), info
+
+    engine.model = FakeModel()
+
+    events = list(engine.transcribe_stream(video_with_pause, None))
+
+    assert events[0]["type"] == "info"
+    assert events[0]["duration"] == pytest.approx(7.0, abs=0.1)
+    segments = [e for e in events if e["type"] == "segment"]
+    assert len(segments) == 2
+    assert segments[1]["start"] == pytest.approx(segments[0]["end"])
+    assert segments[1]["end"] == pytest.approx(7.0, abs=0.1)
+    # The detected language and the previous text carry over.
+    assert calls == [(None, None), ("es", "w1")]
+
+
+def test_time_range_is_decoded_alone_with_absolute_timestamps(
+    video_with_pause, engine, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(
+        transcriber_module, "AUDIO_CACHE", AudioCache(str(tmp_path / "cache"), 0)
+    )
+    inputs = []
+
+    class FakeModel:
+        def transcribe(self, samples, **_kw):
+            inputs.append(samples)
+            seconds = samples.size / audio.SAMPLE_RATE
+            segment = SimpleNamespace(start=0.5, end=seconds, text=" tono")
+            info = SimpleNamespace(
+                language="es", language_probability=0.9, duration=seconds
+            )
+            return iter([segment]), info
+
+    engine.model = FakeModel()
+
+    result = engine.transcribe(video_with_pause, "es", start=4.0, duration=2.0)
+    events = list(engine.transcribe_stream(video_with_pause, "es", start=5.0))
+
+    assert inputs[0].size == 2 * audio.SAMPLE_RATE
+    assert result.segments[0].start == pytest.approx(4.5)
+    assert result.segments[0].end == pytest.approx(6.0)
+    assert events[0]["start"] == 5.0
+    assert events[0]["duration"] == pytest.approx(2.0, abs=0.1)
+    assert events[1]["start"] == pytest.approx(5.5)
+    assert events[1]["end"] == pytest.approx(7.0, abs=0.1)
+
+
+def test_probe_windows_are_spread_over_the_source():
+    assert audio.spread_windows(7.0, 3, 2.0) == [0.167, 2.5, 4.833]
+    assert audio.spread_windows(25.0, 3, 10.0) == [1.25, 13.75]
+    assert audio.spread_windows(5.0, 3, 10.0) == [0.0]
+    assert audio.spread_windows(None, 3, 10.0) == [0.0]
+
+
+def test_language_probe_averages_windows_and_caches_per_file(
+    video_with_pause, engine, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(
+        transcriber_module, "AUDIO_CACHE", AudioCache(str(tmp_path / "cache"), 0)
+    )
+    transcriber_module.LANGUAGE_CACHE.clear()
+    monkeypatch.setattr(transcriber_module, "LANGUAGE_PROBE_WINDOW_S", 2.0)
+    sizes = []
+
+    class FakeModel:
+        def detect_language(self, audio=None):  # pylint: disable=redefined-outer-name
+            sizes.append(audio.size)
+            spanish = 0.9 if len(sizes) < 3 else 0.3
+            return "es", spanish, [("es", spanish), ("en", 1 - spanish)]
+
+    engine.model = FakeModel()
+
+    detection = engine.detect_language(video_with_pause)
+    again = engine.detect_language(video_with_pause)
+
+    assert sizes == [2 * audio.SAMPLE_RATE] * 3
+    assert detection.windows == [0.167, 2.5, 4.833]
+    assert detection.language == "es"
+    assert detection.probability == pytest.approx(0.7)
+    assert detection.languages == {"es": 0.7, "en": 0.3}
+    assert not detection.cached
+    assert again.cached and again.languages == detection.languages
+
+
+def test_canned_refined_stream_covers_the_requested_window(engine):
+    engine._test_mode = True  # pylint: disable=protected-access
+
+    events = list(engine.transcribe_refined("clip.mp4", start=30.0, duration=4.0))
+
+    assert (events[0]["start"], events[0]["duration"]) == (30.0, 4.0)
+    assert (events[1]["start"], events[1]["end"]) == (30.0, 34.0)
+    assert [(s["start"], s["end"]) for s in events[2]["segments"]] == [
+        (30.0, 32.0),
+        (32.0, 34.0),
+    ]
+
+
+def test_refined_stream_replaces_preview_windows(
+    video_with_pause, engine, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(
+        transcriber_module, "AUDIO_CACHE", AudioCache(str(tmp_path / "cache"), 10**9)
+    )
+    monkeypatch.setattr(transcriber_module, "WHISPER_STREAM_FIRST_WINDOW_S", 4.0)
+    monkeypatch.setattr(transcriber_module, "WHISPER_STREAM_WINDOW_S", 4.0)
+
+    class FakeModel:
+        def __init__(self, name):
+            self.name = name
+            self.calls = []
+
+        def transcribe(self, samples, language=None, **kw):
+            self.calls.append((language, kw["beam_size"]))
+            seconds = samples.size / audio.SAMPLE_RATE
+            segment = SimpleNamespace(start=0.0, end=seconds, text=self.name)
+            info = SimpleNamespace(language="es", language_probability=0.9)
+            return iter([segment]), info
+
+    preview, refine = FakeModel("preview"), FakeModel("refined")
+    # pylint: disable-next=protected-access
+    engine._profiles.update({("tiny", "int8"): preview, ("small", "float32"): refine})
+
+    events = list(engine.transcribe_refined(video_with_pause))
+
+    provisional = [e for e in events if e["type"] == "segment"]
+    updates = [e for e in events if e["type"] == "segment_update"]
+    assert all(e["provisional"] and e["text"] == "preview" for e in provisional)
+    # Every update follows the preview and covers the same window.
+    assert events.index(updates[0]) > events.index(provisional[-1])
+    assert [(u["start"], u["end"]) for u in updates] == [
+        (p["start"], p["end"]) for p in provisional
+    ]
+    assert all(u["segments"][0]["text"] == "refined" for u in updates)
+    assert updates[0]["quality"]["model"] == "small"
+    # Greedy preview; the refinement decodes with the detected language.
+    assert preview.calls[0] == (None, 1)
+    assert refine.calls == [("es", 5), ("es", 5)]
+
+
+def test_refinement_waits_for_foreground_work(engine):
+    refined = []
+
+    def refine_window(offset, samples, language, prompt):
+        refined.append((offset, samples.size, language, prompt))
+        return {"type": "segment_update", "segments": [{"text": "hola"}]}
+
+    # pylint: disable-next=protected-access
+    job = transcriber_module._RefineJob(refine_window, engine._foreground, "es")
+    job.start()
+    with engine._engine():  # pylint: disable=protected-access
+        job.feed(0.0, np.zeros(16000, dtype=np.float32))
+        job.feed(1.0, np.zeros(8000, dtype=np.float32))
+        job.finish()
+        time.sleep(0.2)
+        assert not refined
+
+    # Runs as soon as the foreground caller leaves, chaining the prompt.
+    assert len(list(job.updates())) == 2
+    assert refined == [(0.0, 16000, "es", None), (1.0, 8000, "es", "hola")]
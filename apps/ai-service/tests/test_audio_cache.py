@@ -0,0 +1,131 @@
+import os
+import shutil
+import subprocess
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from core import audio, transcriber as transcriber_module
+from core.audio_cache import AudioCache
+from core.transcriber import WhisperTranscriber
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None, reason="ffmpeg not installed"
+)
+
+
+def _make_audio(path, seconds, frequency=440):
+    subprocess.run(  # noqa: S603
+        [  # noqa: S607
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+            "-i", f"sine=frequency={frequency}:duration={seconds}", str(path),
+        ],
+        check=True,
+    )  # fmt: skip
+    return str(path)
+
+
+def _drain(source):
+    parts = []
+    while (block := source.read(10.0)).size:
+        parts.append(block)
+    return np.concatenate(parts)
+
+
+def test_second_open_maps_the_cached_decode(tmp_path):
+    source_path = _make_audio(tmp_path / "a.wav", 3)
+    cache = AudioCache(str(tmp_path / "cache"), 10**9)
+
+    with cache.open(source_path) as first:
+        assert isinstance(first, audio.PcmStream)
+        decoded = _drain(first)
+    second = cache.open(source_path)
+    assert isinstance(second, audio.PcmArray)
+    assert isinstance(second.samples, np.memmap)
+    np.testing.assert_array_equal(second.samples, decoded)
+    # Reads are views into the mapping, not copies.
+    assert np.shares_memory(second.read(1.0), second.samples)
+
+    # Keyed by the file's identity, not a hash of its content: a rewritten
+    # file is decoded again.
+    os.utime(source_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert isinstance(cache.open(source_path), audio.PcmStream)
+
+
+def test_time_ranges_slice_the_cached_decode(tmp_path):
+    source_path = _make_audio(tmp_path / "a.wav", 3)
+    cache = AudioCache(str(tmp_path / "cache"), 10**9)
+
+    with cache.open(source_path, 1.0, 1.0) as uncached:
+        # Decoded alone from the seek point and not published.
+        assert isinstance(uncached, audio.PcmStream)
+        assert _drain(uncached).size == audio.SAMPLE_RATE
+    assert cache.stats()["entries"] == 0
+
+    with cache.open(source_path) as stream:
+        decoded = _drain(stream)
+    sliced = cache.open(source_path, 1.0, 1.0)
+
+    assert isinstance(sliced, audio.PcmArray)
+    np.testing.assert_array_equal(
+        sliced.samples, decoded[audio.SAMPLE_RATE : 2 * audio.SAMPLE_RATE]
+    )
+    assert cache.decode(source_path, start=2.5).size == audio.SAMPLE_RATE // 2
+
+
+def test_partial_read_is_not_published(tmp_path):
+    source_path = _make_audio(tmp_path / "a.wav", 3)
+    cache = AudioCache(str(tmp_path / "cache"), 10**9)
+
+    with cache.open(source_path) as stream:
+        stream.read(1.0)
+
+    assert cache.stats()["entries"] == 0
+    assert not list((tmp_path / "cache").iterdir())
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    one_second = audio.SAMPLE_RATE * 4
+    cache = AudioCache(str(tmp_path / "cache"), int(one_second * 2.5))
+    paths = [_make_audio(tmp_path / f"{f}.wav", 1, f) for f in (300, 400, 500)]
+
+    cache.decode(paths[0])
+    cache.decode(paths[1])
+    old = time.time() - 60
+    os.utime(cache.directory / f"{cache.key(paths[1])}.f32", (old, old))
+    cache.decode(paths[0])  # hit: refreshes recency
+    cache.decode(paths[2])
+
+    assert cache.load(cache.key(paths[1])) is None
+    assert cache.load(cache.key(paths[0])) is not None
+    assert cache.load(cache.key(paths[2])) is not None
+
+
+def test_transcribe_reuses_decoded_audio(tmp_path, monkeypatch):
+    source_path = _make_audio(tmp_path / "a.wav", 2)
+    cache = AudioCache(str(tmp_path / "cache"), 10**9)
+    monkeypatch.setattr(transcriber_module, "AUDIO_CACHE", cache)
+    inputs = []
+
+    class FakeModel:
+        def transcribe(self, source, **_kw):
+            inputs.append(source)
+            info = SimpleNamespace(
+                language="es", language_probability=1.0, duration=2.0
+            )
+            return iter([SimpleNamespace(start=0.0, end=2.0, text="hola")]), info
+
+    # Only the fake model runs; no weights are loaded.
+    monkeypatch.setattr(WhisperTranscriber, "_load_model", lambda *_args: None)
+    engine = WhisperTranscriber()
+    engine.model = FakeModel()
+    engine._test_mode = False  # pylint: disable=protected-access
+
+    engine.transcribe(source_path, "es")
+    engine.transcribe(source_path, "es")
+
+    assert not isinstance(inputs[0], np.memmap)
+    assert isinstance(inputs[1], np.memmap)
+    np.testing.assert_array_equal(inputs[0], inputs[1])
@@ -0,0 +1,118 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core import deadlines
+from core.batching import MicroBatcher
+
+
+def _recording_engine(delay=0.1):
+    calls = []
+
+    def run(texts):
+        calls.append(list(texts))
+        time.sleep(delay)
+        return [text.upper() for text in texts]
+
+    return calls, run
+
+
+def test_concurrent_calls_are_merged_and_split_back_in_order():
+    batcher = MicroBatcher("test", enabled=True, max_window_ms=20)
+    calls, run = _recording_engine()
+
+    def submit(i):
+        return batcher.submit(("es", "en"), [f"a{i}", f"b{i}"], run)
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(submit, range(8)))
+
+    assert results == [[f"A{i}", f"B{i}"] for i in range(8)]
+    # The first call runs alone or with a few others; the rest pile up
+    # behind it and go through together.
+    assert len(calls) < 8
+    assert sum(len(c) for c in calls) == 16
+
+
+def test_keys_are_not_mixed():
+    batcher = MicroBatcher("test", enabled=True)
+    seen = []
+    lock = threading.Lock()
+
+    def run(texts):
+        with lock:
+            seen.append(set(t[:2] for t in texts))
+        time.sleep(0.05)
+        return texts
+
+    def submit(i):
+        lang = "es" if i % 2 else "fr"
+        return batcher.submit(lang, [f"{lang}{i}"], run)
+
+    with ThreadPoolExecutor(6) as pool:
+        list(pool.map(submit, range(6)))
+
+    assert all(len(languages) == 1 for languages in seen)
+
+
+def test_batch_limit_shrinks_when_calls_are_slow():
+    batcher = MicroBatcher("test", enabled=True, max_items=64, target_ms=10)
+    _calls, run = _recording_engine(delay=0.05)
+
+    batcher.submit("es", ["x"], run)
+
+    assert batcher.stats()["es"]["max_items"] == 48
+
+
+def test_errors_reach_every_merged_caller():
+    batcher = MicroBatcher("test", enabled=True)
+
+    def run(_texts):
+        time.sleep(0.1)
+        raise ValueError("model missing")
+
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(batcher.submit, "es", [str(i)], run) for i in range(3)]
+        for future in futures:
+            with pytest.raises(ValueError, match="model missing"):
+                future.result(5)
+
+
+def test_waiting_caller_gives_up_at_its_own_deadline():
+    batcher = MicroBatcher("test", enabled=True)
+    release = threading.Event()
+    running = threading.Event()
+
+    def run(texts):
+        running.set()
+        release.wait(5)
+        return texts
+
+    def late():
+        with deadlines.scope(time.monotonic() + 0.1):
+            return batcher.submit("es", ["late"], run)
+
+    with ThreadPoolExecutor(3) as pool:
+        first = pool.submit(batcher.submit, "es", ["first"], run)
+        running.wait(5)
+        # Leads the next batch, which waits for the running call.
+        second = pool.submit(batcher.submit, "es", ["second"], run)
+        time.sleep(0.05)
+        waited = time.monotonic()
+        with pytest.raises(deadlines.DeadlineExceeded, match="batched"):
+            pool.submit(late).result(5)
+        assert time.monotonic() - waited < 1.0
+        release.set()
+        assert first.result(5) == ["first"]
+        assert second.result(5) == ["second"]
+
+
+def test_disabled_batcher_calls_through():
+    batcher = MicroBatcher("test", enabled=False)
+    calls, run = _recording_engine(delay=0)
+
+    assert batcher.submit("es", ["a"], run) == ["A"]
+    assert calls == [["a"]]
+    assert not batcher.stats()
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import random
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+
+from bench import corpus, load, report
+from bench.__main__ import main as bench_main
+from bench.engines import marian_tokens_per_second, spacy_docs_per_second
+from core import metrics
+
+
+def test_subtitle_corpus_is_deterministic():
+    assert corpus.subtitle_lines("es", 20) == corpus.subtitle_lines("es", 20)
+    assert corpus.subtitle_lines("es", 20) != corpus.subtitle_lines("en", 20)
+    assert corpus.subtitle_lines("de", 5, seed=1) != corpus.subtitle_lines("de", 5)
+    assert all(line[-1] in ".?!" for line in corpus.subtitle_lines("fr", 50))
+
+
+def test_percentile_is_nearest_rank():
+    samples = list(range(1, 101))
+    assert report.percentile(samples, 50) == 50
+    assert report.percentile(samples, 99) == 99
+    assert report.percentile([3.0], 99) == 3.0
+
+
+def _run(**values):
+    return {
+        "metrics": {
+            name: {"value": value, "unit": "x", "higher_is_better": better}
+            for name, (value, better) in values.items()
+        }
+    }
+
+
+def test_compare_flags_regressions_in_either_direction():
+    baseline = _run(rate=(100.0, True), latency=(10.0, False), steady=(5.0, True))
+    current = _run(rate=(80.0, True), latency=(12.0, False), steady=(5.2, True))
+
+    rows = {row["metric"]: row for row in report.compare(baseline, current, 0.1)}
+
+    assert rows["rate"]["regression"]
+    assert rows["latency"]["regression"]
+    assert not rows["steady"]["regression"]
+    # Improvements never count as regressions.
+    improved = _run(rate=(150.0, True), latency=(5.0, False), steady=(5.0, True))
+    assert not any(r["regression"] for r in report.compare(baseline, improved, 0.1))
+
+
+def test_compare_command_exits_nonzero_on_regression(tmp_path, capsys):
+    baseline, current = tmp_path / "base.json", tmp_path / "now.json"
+    baseline.write_text(json.dumps(_run(rate=(100.0, True))))
+    current.write_text(json.dumps(_run(rate=(50.0, True))))
+
+    assert bench_main(["compare", str(baseline), str(current)]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+    assert bench_main(["compare", str(baseline), str(baseline)]) == 0
+
+
+def test_compare_fails_on_metrics_missing_from_the_run(tmp_path, capsys):
+    baseline, current = tmp_path / "base.json", tmp_path / "now.json"
+    baseline.write_text(json.dumps(_run(rate=(100.0, True), p99=(20.0, False))))
+    current.write_text(json.dumps(_run(rate=(100.0, True))))
+
+    assert bench_main(["compare", str(baseline), str(current)]) == 1
+    out = capsys.readouterr().out
+    assert "MISSING" in out and "1 metric(s) missing" in out
+
+
+def test_compare_without_a_baseline_says_to_record_one(tmp_path, capsys):
+    current = tmp_path / "now.json"
+    current.write_text(json.dumps(_run(rate=(100.0, True))))
+
+    code = bench_main(["compare", str(tmp_path / "none.json"), str(current)])
+
+    assert code == 2
+    assert "record a baseline first" in capsys.readouterr().err
+
+
+class _CountingFilter:
+    def __init__(self):
+        self.seen = []
+
+    def analyze_batch(self, texts, language):
+        self.seen.append((len(texts), language))
+        return [[] for _ in texts]
+
+
+class _CountingTranslator:
+    def translate(self, texts, source, target):
+        metrics.TRANSLATION_TOKENS.inc(10 * len(texts), pair=f"{source}-{target}")
+        return texts
+
+
+def test_engine_benchmarks_record_rates():
+    results = report.Results()
+    text_filter = _CountingFilter()
+
+    spacy_docs_per_second(text_filter, results, languages=("es",), docs=50)
+    marian_tokens_per_second(_CountingTranslator(), results, pairs=("en-es",), lines=8)
+
+    assert text_filter.seen[0] == (8, "es")  # model load before timing
+    assert results.metrics["spacy.es.docs_per_second"]["value"] > 0
+    marian = results.metrics["marian.en-es.tokens_per_second"]
+    assert marian["value"] > 0
+    assert marian["higher_is_better"]
+
+
+def test_parse_mix_rejects_unknown_endpoints():
+    assert load.parse_mix("filter=3, translate") == {"filter": 3.0, "translate": 1.0}
+    assert load.parse_mix("filter=1,thumbnail=0") == {"filter": 1.0}
+    with pytest.raises(ValueError):
+        load.parse_mix("filtr=1")
+    with pytest.raises(ValueError):
+        load.parse_mix("filter=0")
+
+
+def _step(concurrency, rps, rejected=0.0):
+    return {
+        "concurrency": concurrency,
+        "throughput_rps": rps,
+        "rejected_rate": rejected,
+        "error_rate": 0.0,
+    }
+
+
+def test_saturation_point_is_the_first_step_that_stops_paying():
+    assert load.saturation_point([_step(1, 10), _step(2, 19), _step(4, 20)]) == 4
+    assert load.saturation_point([_step(1, 10), _step(2, 19), _step(4, 38)]) is None
+    assert load.saturation_point([_step(1, 10), _step(2, 30, rejected=0.2)]) == 2
+
+
+def test_saturation_curve_records_statuses_per_endpoint():
+    seen = []
+
+    def handler(request):
+        seen.append(request.url.path)
+        if request.url.path == "/translate":
+            return httpx.Response(429)
+        return httpx.Response(200, json={})
+
+    @asynccontextmanager
+    async def client_factory():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            yield client, None
+
+    curve = asyncio.run(
+        load.saturation_curve(
+            client_factory(),
+            load.parse_mix("filter=1,translate=1"),
+            concurrency=(1, 2),
+            step_s=0.05,
+        )
+    )
+
+    assert [s["concurrency"] for s in curve["steps"]] == [1, 2]
+    endpoints = curve["steps"][0]["endpoints"]
+    assert endpoints["translate"]["rejected_rate"] == 1.0
+    assert endpoints["filter"]["error_rate"] == 0.0
+    assert curve["saturation_concurrency"] == 2  # translate is always shed
+    assert "/ready" in seen
+
+
+def test_step_throughput_counts_requests_still_in_flight_at_the_end():
+    async def handler(_request):
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json={})
+
+    @asynccontextmanager
+    async def client_factory():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            yield client, None
+
+    curve = asyncio.run(
+        load.saturation_curve(
+            client_factory(), load.parse_mix("filter=1"), concurrency=(2,), step_s=0.05
+        )
+    )
+
+    # Two requests over the 0.2 s they took, not over the nominal 0.05 s.
+    step = curve["steps"][0]
+    assert step["requests"] == 2
+    assert step["elapsed_s"] >= 0.2
+    assert step["throughput_rps"] <= 10
+
+
+def test_batch_must_fit_the_corpus():
+    @asynccontextmanager
+    async def client_factory():
+        yield None, None
+
+    for batch in (0, 201):
+        with pytest.raises(ValueError):
+            asyncio.run(
+                load.saturation_curve(
+                    client_factory(), load.parse_mix("filter=1"), batch=batch
+                )
+            )
+    requests = load._Requests(None, 200)  # pylint: disable=protected-access
+    _, body = requests.build("filter", random.Random(1))  # noqa: S311
+    assert len(body["texts"]) == 200
+
+
+def test_thumbnail_traffic_requires_a_video():
+    @asynccontextmanager
+    async def client_factory():
+        yield None, None
+
+    with pytest.raises(ValueError):
+        asyncio.run(
+            load.saturation_curve(client_factory(), load.parse_mix("thumbnail=1"))
+        )
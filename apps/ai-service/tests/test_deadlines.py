@@ -0,0 +1,131 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+import main
+from core import deadlines, metrics
+from core.batching import MicroBatcher
+from core.singleflight import SingleFlight
+
+
+def test_parse_timeout_ms():
+    assert deadlines.parse_timeout_ms(None) is None
+    assert deadlines.parse_timeout_ms("soon") is None
+    assert deadlines.parse_timeout_ms("0") is None
+    deadline = deadlines.parse_timeout_ms("1500")
+    assert 1.4 < deadline - time.monotonic() <= 1.5
+
+
+def test_check_raises_only_once_expired():
+    deadlines.check("anything")  # no deadline set
+    with deadlines.scope(time.monotonic() + 60):
+        deadlines.check("translate")
+    with deadlines.scope(time.monotonic() - 1):
+        with pytest.raises(deadlines.DeadlineExceeded) as exc:
+            deadlines.check("translate")
+    assert exc.value.stage == "translate"
+
+
+def test_latest_deadline_of_several_callers():
+    assert deadlines.latest([1.0, 3.0, 2.0]) == 3.0
+    assert deadlines.latest([1.0, None]) is None
+
+
+def test_engine_lock_wait_is_bounded_by_the_deadline():
+    lock = threading.Lock()
+    lock.acquire()  # pylint: disable=consider-using-with
+    try:
+        started = time.monotonic()
+        with deadlines.scope(started + 0.1):
+            with pytest.raises(deadlines.DeadlineExceeded) as exc:
+                with metrics.timed_lock(lock, "unit"):
+                    pass
+        assert time.monotonic() - started < 1
+        assert exc.value.stage == "unit_queue"
+    finally:
+        lock.release()
+    assert metrics.ENGINE_BUSY.value(engine="unit") == 0
+
+
+def test_follower_retries_when_only_the_leader_gave_up():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        if len(calls) == 1:
+            started.set()
+            time.sleep(0.2)
+            raise deadlines.DeadlineExceeded("unit_queue")
+        return "done"
+
+    results = {}
+
+    def leader():
+        with pytest.raises(deadlines.DeadlineExceeded):
+            flight.do("k", compute)
+
+    def follower():
+        started.wait(5)
+        results["follower"] = flight.do("k", compute)
+
+    threads = [threading.Thread(target=leader), threading.Thread(target=follower)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results["follower"] == "done"
+    assert len(calls) == 2
+
+
+def test_merged_batch_runs_under_the_latest_caller_deadline():
+    batcher = MicroBatcher("test", enabled=True)
+    seen = []
+
+    def run(texts):
+        seen.append(deadlines.current())
+        return texts
+
+    with deadlines.scope(123.0):
+        batcher.submit("es", ["hola"], run)
+    assert seen == [123.0]
+
+
+def test_expired_request_is_dropped_with_504(api_client):
+    def analyze(texts, _language):
+        time.sleep(0.05)
+        deadlines.check("filter")
+        return [[] for _ in texts]
+
+    text_filter = MagicMock()
+    text_filter.analyze_batch.side_effect = analyze
+    main.app.dependency_overrides[main.get_filter] = lambda: text_filter
+    before = metrics.DEADLINES_EXCEEDED.value(stage="filter")
+
+    response = api_client.post(
+        "/filter",
+        headers={"X-API-Key": "test_key", deadlines.DEADLINE_HEADER: "10"},
+        json={"texts": ["hola"], "language": "es"},
+    )
+
+    assert response.status_code == 504
+    assert response.json()["stage"] == "filter"
+    assert metrics.DEADLINES_EXCEEDED.value(stage="filter") == before + 1
+
+
+def test_generous_deadline_does_not_change_the_response(api_client):
+    text_filter = MagicMock()
+    text_filter.analyze_batch.return_value = [[]]
+    main.app.dependency_overrides[main.get_filter] = lambda: text_filter
+
+    response = api_client.post(
+        "/filter",
+        headers={"X-API-Key": "test_key", deadlines.DEADLINE_HEADER: "60000"},
+        json={"texts": ["hola"], "language": "es"},
+    )
+
+    assert response.status_code == 200
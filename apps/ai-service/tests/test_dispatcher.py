@@ -0,0 +1,194 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from core import dispatcher
+
+WORKER_URLS = [f"http://127.0.0.1:{port}" for port in (8101, 8102, 8103)]
+
+
+class FakeWorkers:
+    """
+    Stands in for the worker processes: echoes which worker answered, and
+    refuses connections for the ones marked down.
+    """
+
+    def __init__(self):
+        self.down = set()
+        self.loading = set()
+        self.seen = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        worker = f"http://{request.url.host}:{request.url.port}"
+        if worker in self.down:
+            raise httpx.ConnectError("connection refused", request=request)
+        if request.url.path == "/health":
+            return httpx.Response(200, json={"status": "ai_service_active"})
+        if request.url.path == "/ready":
+            ready = worker not in self.loading
+            return httpx.Response(
+                200 if ready else 503, json={"ready": ready, "engines": {}}
+            )
+        if request.url.path == "/metrics":
+            return httpx.Response(
+                200,
+                text="# HELP ai_up Up.\n# TYPE ai_up gauge\nai_up 1\n"
+                "# HELP ai_hits_total Hits.\n# TYPE ai_hits_total counter\n"
+                'ai_hits_total{endpoint="/filter"} 2\n',
+            )
+        self.seen.append((worker, request.headers.get("x-request-id")))
+        body = json.dumps({"worker": worker, "path": request.url.path}).encode()
+        # A stream, like a real connection (content= arrives already read).
+        return httpx.Response(
+            200,
+            headers={"content-type": "application/json"},
+            stream=httpx.ByteStream(body),
+        )
+
+
+@pytest.fixture(name="workers")
+def _workers():
+    return FakeWorkers()
+
+
+@pytest.fixture(name="client")
+def _client(workers):
+    pool = dispatcher.WorkerPool(
+        [dispatcher.Worker(url) for url in WORKER_URLS],
+        transport=httpx.MockTransport(workers),
+    )
+    with TestClient(dispatcher.create_app(pool, monitor=False)) as test_client:
+        assert test_client.get("/health").json()["healthy_workers"] == 3
+        yield test_client
+
+
+def _translate(client, source, target):
+    response = client.post(
+        "/translate",
+        json={"texts": ["hola"], "source_lang": source, "target_lang": target},
+    )
+    assert response.status_code == 200
+    return response.json()["worker"]
+
+
+def test_ring_moves_only_the_keys_of_a_removed_node():
+    ring = dispatcher.HashRing(WORKER_URLS)
+    keys = [f"translate:es-{i}" for i in range(300)]
+    before = {key: ring.preference(key)[0] for key in keys}
+
+    assert len(set(before.values())) == 3
+    ring.remove(WORKER_URLS[0])
+    after = {key: ring.preference(key)[0] for key in keys}
+
+    for key, owner in before.items():
+        if owner != WORKER_URLS[0]:
+            assert after[key] == owner
+        else:
+            assert after[key] == dispatcher.HashRing(WORKER_URLS).preference(key)[1]
+    assert sorted(ring.preference("any")) == WORKER_URLS[1:]
+
+
+def test_routing_keys_follow_the_model_a_request_needs():
+    def key(path, payload, headers=None):
+        return dispatcher.routing_key(path, headers or {}, json.dumps(payload).encode())
+
+    assert key("/translate", {"source_lang": "es", "target_lang": "en"}) == (
+        "translate:es-en"
+    )
+    assert key("/filter", {"texts": [], "language": "es"}) == "filter:es"
+    assert key("/lemma_index", {"texts": [], "language": "de"}) == "filter:de"
+    assert key("/transcribe/stream", {"file_path": "a.mp4"}) == "audio:a.mp4"
+    assert key("/thumbnails", {"file_path": "a.mp4"}) is None
+    assert dispatcher.routing_key("/filter", {}, b"not json") is None
+
+
+def test_language_pairs_stick_to_one_worker(client):
+    first = _translate(client, "es", "en")
+
+    assert {_translate(client, "es", "en") for _ in range(5)} == {first}
+    owners = {_translate(client, "es", target) for target in "abcdefghij"}
+    assert len(owners) > 1
+
+
+def test_dead_worker_is_dropped_and_its_keys_fail_over(client, workers):
+    owner = _translate(client, "es", "en")
+    workers.down.add(owner)
+
+    survivor = _translate(client, "es", "en")
+
+    assert survivor != owner
+    health = client.get("/health")
+    assert health.status_code == 200
+    assert health.json()["healthy_workers"] == 2
+    states = {w["url"]: w["healthy"] for w in health.json()["workers"]}
+    assert not states[owner]
+
+    workers.down.clear()
+    assert client.get("/health").json()["healthy_workers"] == 3
+    assert _translate(client, "es", "en") == owner
+
+
+def test_no_healthy_worker_is_a_503(client, workers):
+    workers.down.update(WORKER_URLS)
+
+    response = client.post("/filter", json={"texts": ["x"], "language": "es"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+    assert client.get("/health").status_code == 503
+
+
+def test_trace_lookups_go_to_the_worker_that_served_the_request(client, workers):
+    client.post(
+        "/filter",
+        json={"texts": ["x"], "language": "en"},
+        headers={"X-Request-ID": "req-42"},
+    )
+    served = workers.seen[-1][0]
+
+    for _ in range(3):
+        assert client.get("/traces/req-42").json()["worker"] == served
+
+
+def test_ready_only_when_every_worker_is(client, workers):
+    assert client.get("/ready").status_code == 200
+
+    workers.loading.add(WORKER_URLS[1])
+    response = client.get("/ready")
+
+    assert response.status_code == 503
+    states = {w["url"]: w["ready"] for w in response.json()["workers"]}
+    assert states == {url: url != WORKER_URLS[1] for url in WORKER_URLS}
+    workers.down.add(WORKER_URLS[1])
+    workers.loading.clear()
+    assert client.get("/ready").status_code == 503
+
+
+def test_metrics_are_merged_with_a_worker_label(client):
+    text = client.get("/metrics").text
+
+    lines = text.splitlines()
+    assert lines.count("# TYPE ai_up gauge") == 1
+    start = lines.index("# TYPE ai_up gauge")
+    assert lines[start + 1 : start + 4] == [
+        f'ai_up{{worker="{url}"}} 1' for url in WORKER_URLS
+    ]
+    assert f'ai_hits_total{{worker="{WORKER_URLS[0]}",endpoint="/filter"}} 2' in lines
+    assert "# TYPE ai_dispatch_healthy_workers gauge" in lines
+
+
+def test_preload_lists_are_split_by_owner(monkeypatch):
+    monkeypatch.setenv("SPACY_PRELOAD_LANGUAGES", "es,en,de,fr")
+    pool = dispatcher.WorkerPool([dispatcher.Worker(url) for url in WORKER_URLS])
+    ring = dispatcher.HashRing(WORKER_URLS)
+
+    assigned = []
+    for worker in pool.workers.values():
+        # pylint: disable=protected-access
+        languages = pool._preload_env(worker)["SPACY_PRELOAD_LANGUAGES"]
+        for language in filter(None, languages.split(",")):
+            assert ring.preference(f"filter:{language}")[0] == worker.url
+            assigned.append(language)
+    assert sorted(assigned) == ["de", "en", "es", "fr"]
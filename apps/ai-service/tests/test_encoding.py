@@ -0,0 +1,112 @@
+import asyncio
+import gzip
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+import main
+from core import encoding
+from core.encoding import negotiate_content_encoding, negotiate_media_type
+
+msgpack = pytest.importorskip("msgpack")
+
+
+@pytest.fixture(name="api_client")
+def _translating_client(api_client):
+    translator = MagicMock()
+    translator.translate.side_effect = lambda texts, _source, _target, _settings: [
+        f"{text}-ok" for text in texts
+    ]
+    main.app.dependency_overrides[main.get_translator] = lambda: translator
+    return api_client
+
+
+def test_negotiate_media_type():
+    assert negotiate_media_type(None) == "application/json"
+    assert negotiate_media_type("application/json") == "application/json"
+    assert negotiate_media_type("application/msgpack") == "application/msgpack"
+    assert (
+        negotiate_media_type("application/msgpack;q=0.5, application/json")
+        == "application/json"
+    )
+
+
+def test_negotiate_content_encoding():
+    assert negotiate_content_encoding(None) is None
+    assert negotiate_content_encoding("gzip") == "gzip"
+    assert negotiate_content_encoding("gzip;q=0, br") is None
+    assert negotiate_content_encoding("gzip, zstd") in ("zstd", "gzip")
+
+
+def test_translate_msgpack_response(api_client):
+    response = api_client.post(
+        "/translate",
+        headers={"X-API-Key": "test_key", "Accept": "application/msgpack"},
+        json={"texts": ["hola"], "source_lang": "es", "target_lang": "en"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    body = msgpack.unpackb(response.content)
+    assert body["translations"] == ["hola-ok"]
+    assert body["quality"]["level"] == "full"
+
+
+def test_large_response_is_gzipped_and_request_gzip_accepted(api_client):
+    texts = [f"frase numero {i}" for i in range(2000)]
+    body = gzip.compress(
+        json.dumps({"texts": texts, "source_lang": "es", "target_lang": "en"}).encode()
+    )
+    response = api_client.post(
+        "/translate",
+        content=body,
+        headers={
+            "X-API-Key": "test_key",
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+            "Accept-Encoding": "gzip",
+        },
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()["translations"]) == 2000
+
+
+def test_small_response_not_compressed(api_client):
+    response = api_client.post(
+        "/translate",
+        headers={"X-API-Key": "test_key", "Accept-Encoding": "gzip"},
+        json={"texts": ["hola"], "source_lang": "es", "target_lang": "en"},
+    )
+    assert "content-encoding" not in response.headers
+    assert response.json()["translations"] == ["hola-ok"]
+
+
+def test_invalid_compressed_request_rejected(api_client):
+    response = api_client.post(
+        "/translate",
+        content=b"not gzip",
+        headers={
+            "X-API-Key": "test_key",
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        },
+    )
+    assert response.status_code == 400
+
+
+def test_replayed_body_hands_off_to_the_original_receive():
+    disconnect = {"type": "http.disconnect"}
+
+    async def original():
+        return disconnect
+
+    async def scenario():
+        # pylint: disable-next=protected-access
+        receive = encoding._replay_body(b"{}", original)
+        return [await receive(), await receive()]
+
+    first, second = asyncio.run(scenario())
+
+    assert first == {"type": "http.request", "body": b"{}", "more_body": False}
+    assert second is disconnect
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import main
+from core import fakes
+from core.event_stream import sse_events
+
+
+def _collect(source, limit=None, **options):
+    async def scenario():
+        frames = []
+        events = sse_events(source, "test", **options)
+        async for frame in events:
+            frames.append((frame["event"], json.loads(frame["data"])))
+            if limit is not None and len(frames) >= limit:
+                await events.aclose()
+                break
+        return frames
+
+    return asyncio.run(scenario())
+
+
+def _segment(start):
+    return {"type": "segment", "start": start, "end": start + 1, "text": f"s{start}"}
+
+
+def test_close_together_segments_are_coalesced():
+    def source():
+        yield {"type": "info", "language": "es", "duration": 10.0}
+        yield _segment(0)
+        yield _segment(1)
+        yield _segment(2)
+        time.sleep(0.3)
+        yield _segment(3)
+
+    frames = _collect(source(), coalesce_ms=100, heartbeat_s=5)
+
+    assert [event for event, _ in frames] == ["info", "segments", "segment"]
+    assert [s["start"] for s in frames[1][1]["segments"]] == [0, 1, 2]
+    assert frames[2][1]["start"] == 3
+
+
+def test_coalescing_respects_the_count_limit():
+    frames = _collect(
+        iter([_segment(i) for i in range(5)]), coalesce_ms=500, coalesce_max=2
+    )
+
+    assert [len(data.get("segments", [data])) for _, data in frames] == [2, 2, 1]
+
+
+def test_progress_events_are_sent_while_idle():
+    def source():
+        yield {"type": "info", "language": "es", "duration": 10.0}
+        yield _segment(4)
+        time.sleep(0.35)
+        yield _segment(5)
+
+    frames = _collect(source(), coalesce_ms=10, heartbeat_s=0.1)
+
+    progress = [data for event, data in frames if event == "progress"]
+    assert progress
+    assert progress[0]["position"] == 5
+    assert progress[0]["percent"] == 50.0
+
+
+def test_source_is_closed_on_its_thread_when_the_client_leaves():
+    closed = threading.Event()
+    threads = []
+
+    def source():
+        try:
+            i = 0
+            while True:
+                yield _segment(i)
+                i += 1
+                time.sleep(0.01)
+        finally:
+            threads.append(threading.current_thread())
+            closed.set()
+
+    _collect(source(), limit=2, coalesce_ms=0)
+
+    assert closed.wait(5)
+    assert threads[0] is not threading.main_thread()
+
+
+def test_producer_blocks_on_a_full_queue():
+    produced = []
+
+    def source():
+        for i in range(100):
+            produced.append(i)
+            yield _segment(i)
+
+    async def scenario():
+        events = sse_events(source(), "test", queue_size=4, coalesce_ms=0)
+        await events.__anext__()
+        await asyncio.sleep(0.2)
+        ahead = len(produced)
+        await events.aclose()
+        return ahead
+
+    # One consumed, four buffered, one waiting for a free slot.
+    assert asyncio.run(scenario()) <= 6
+
+
+def test_source_errors_reach_the_consumer():
+    def source():
+        yield _segment(0)
+        raise RuntimeError("decoder died")
+
+    with pytest.raises(RuntimeError, match="decoder died"):
+        _collect(source(), coalesce_ms=0)
+
+
+def test_stream_endpoint_sends_coalesced_segments(api_client, monkeypatch, tmp_path):
+    (tmp_path / "clip.mp3").write_bytes(b"fake")
+    monkeypatch.setenv("AUDIO_BASE_DIR", str(tmp_path))
+    transcriber = fakes.FakeTranscriber(fakes.CostModel())
+    main.app.dependency_overrides[main.get_transcriber] = lambda: transcriber
+
+    response = api_client.post(
+        "/transcribe/stream",
+        headers={"X-API-Key": "test_key"},
+        json={"file_path": "clip.mp3", "language": "es"},
+    )
+
+    assert response.status_code == 200
+    events = [
+        line.split(":", 1)[1].strip()
+        for line in response.text.splitlines()
+        if line.startswith("event:")
+    ]
+    assert events == ["info", "segments"]
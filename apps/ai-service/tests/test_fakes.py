@@ -0,0 +1,126 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import main
+from core import deadlines, fakes, quality
+from core.fakes import CostModel, FakeFilter, FakeTranscriber, FakeTranslator
+
+
+def test_cost_model_reads_env_over_defaults(monkeypatch):
+    monkeypatch.setenv("FAKE_TRANSLATOR_ITEM_MS", "7.5")
+    monkeypatch.setenv("FAKE_TRANSLATOR_CONCURRENCY", "3")
+
+    cost = CostModel.from_env("translator", item_ms=30.0, overhead_ms=20.0)
+
+    assert cost == CostModel(item_ms=7.5, overhead_ms=20.0, concurrency=3)
+
+
+def test_batch_exponent_models_batching_speedup():
+    linear = CostModel(item_ms=10.0)
+    batched = CostModel(item_ms=10.0, overhead_ms=5.0, batch_exponent=0.5)
+
+    assert linear.call_seconds(16) == pytest.approx(0.16)
+    assert batched.call_seconds(16) == pytest.approx(0.045)
+    assert batched.call_seconds(0) == 0.0
+
+
+def test_outputs_are_deterministic():
+    text_filter = FakeFilter(CostModel())
+    first = text_filter.analyze_batch(["Los niños buscan la llave."], "es")
+    again = FakeFilter(CostModel()).analyze_batch(["Los niños buscan la llave."], "es")
+
+    assert first == again
+    assert [t.lemma for t in first[0]] == ["los", "niños", "buscan", "la", "llave"]
+    assert "".join(t.text + t.whitespace for t in first[0]) == (
+        "Los niños buscan la llave."
+    )
+    assert FakeTranslator(CostModel()).translate(["hola"], "es", "en") == ["[en] hola"]
+
+
+def test_failure_injection_is_seeded():
+    def outcomes():
+        translator = FakeTranslator(CostModel(failure_rate=0.5))
+        results = []
+        for _ in range(20):
+            try:
+                translator.translate(["hola"], "es", "en")
+                results.append(True)
+            except fakes.FakeEngineError:
+                results.append(False)
+        return results
+
+    first = outcomes()
+    assert first == outcomes()
+    assert True in first and False in first
+
+
+def _elapsed_for_two_callers(cost: CostModel) -> float:
+    translator = FakeTranslator(cost)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(2) as pool:
+        list(pool.map(lambda _: translator.translate(["a"], "es", "en"), range(2)))
+    return time.perf_counter() - started
+
+
+def test_concurrency_controls_how_callers_share_the_engine():
+    serial = _elapsed_for_two_callers(CostModel(item_ms=100.0, concurrency=1))
+    parallel = _elapsed_for_two_callers(CostModel(item_ms=100.0, concurrency=0))
+
+    assert serial >= 0.2
+    assert parallel < 0.19
+
+
+def test_fakes_honour_deadlines():
+    text_filter = FakeFilter(CostModel(item_ms=20.0))
+
+    with deadlines.scope(time.monotonic() + 0.05):
+        with pytest.raises(deadlines.DeadlineExceeded):
+            text_filter.analyze_batch(["uno"] * 10, "es")
+
+
+def test_fake_transcriber_segments_follow_the_audio(tmp_path, monkeypatch):
+    monkeypatch.setattr(fakes.audio, "probe_duration", lambda _path: 12.0)
+    transcriber = FakeTranscriber(CostModel())
+
+    result = transcriber.transcribe(str(tmp_path / "a.mp3"), "es")
+    events = list(transcriber.transcribe_stream(str(tmp_path / "a.mp3")))
+    refined = list(transcriber.transcribe_refined(str(tmp_path / "a.mp3")))
+
+    assert [(s.start, s.end) for s in result.segments] == [
+        (0.0, 5.0),
+        (5.0, 10.0),
+        (10.0, 12.0),
+    ]
+    assert result.quality.model == "fake-whisper"
+    assert [e["type"] for e in events] == ["info"] + ["segment"] * 3
+    assert events[0]["duration"] == 12.0
+    assert [e["type"] for e in refined].count("segment_update") == 3
+    assert all(e.get("provisional") for e in refined if e["type"] == "segment")
+
+    ranged = transcriber.transcribe(str(tmp_path / "a.mp3"), "es", None, 4.0, 6.0)
+    assert [(s.start, s.end) for s in ranged.segments] == [(4.0, 9.0), (9.0, 10.0)]
+    assert transcriber.detect_language(str(tmp_path / "a.mp3")).windows == [1.0]
+
+
+def test_degraded_settings_cost_less():
+    translator = FakeTranslator(CostModel(item_ms=200.0))
+    minimal = quality.translation_settings(quality.MINIMAL)
+
+    started = time.perf_counter()
+    translator.translate(["a"], "es", "en", minimal)
+    degraded = time.perf_counter() - started
+
+    assert degraded < 0.15  # beam 1 of 4: half the full cost
+
+
+def test_env_selects_fake_engines(monkeypatch):
+    # pylint: disable=protected-access
+    monkeypatch.setenv("AI_SERVICE_FAKE_ENGINES", "translator,filter")
+
+    assert isinstance(main._build_translator(), FakeTranslator)
+    assert isinstance(main._build_filter(), FakeFilter)
+    assert fakes.enabled("transcriber") is False
+    monkeypatch.setenv("AI_SERVICE_FAKE_ENGINES", "1")
+    assert isinstance(main._build_transcriber(), FakeTranscriber)
@@ -0,0 +1,120 @@
+import pytest
+
+import main
+from core import fakes, lemma_index
+from core.filter import SpacyFilter
+from core.models import TokenAnalysis
+
+
+@pytest.fixture(name="api_client")
+def _filtering_client(api_client):
+    lemma_index.INDEXES.clear()
+    text_filter = fakes.FakeFilter(fakes.CostModel())
+    main.app.dependency_overrides[main.get_filter] = lambda: text_filter
+    yield api_client
+    lemma_index.INDEXES.clear()
+
+
+def _token(lemma, pos="NOUN", text=None):
+    return TokenAnalysis(
+        text=text or lemma, lemma=lemma, pos=pos, is_stop=False, whitespace=" "
+    )
+
+
+def test_index_counts_lemmas_and_lists_their_segments():
+    analyses = [
+        [_token("gato"), _token("correr", "VERB", "corre"), _token(".", "PUNCT")],
+        [_token("perro"), _token("", "", "Perro")],
+        [_token("gato"), _token("gato"), _token("3", "NUM")],
+    ]
+
+    index = lemma_index.build(analyses, [10, 11, 12], "es")
+
+    assert index.fields == lemma_index.LEMMA_INDEX_FIELDS
+    assert index.segments == 3 and index.tokens == 6
+    assert [tuple(row) for row in index.lemmas] == [
+        ("gato", "NOUN", False, 3, 10, [10, 12]),
+        ("correr", "VERB", False, 1, 10, [10]),
+        ("perro", "NOUN", False, 1, 11, [11]),
+        # No lemmatizer: falls back to the lowercased text.
+        ("perro", "", False, 1, 11, [11]),
+    ]
+
+
+def test_cache_is_bounded_by_rows():
+    cache = lemma_index._IndexCache(max_rows=3)  # pylint: disable=protected-access
+    small = lemma_index.build([[_token("a"), _token("b")]], [0], "es")
+
+    cache.put("first", small)
+    cache.put("second", small)
+
+    assert cache.get("first") is None
+    assert cache.get("second") is small
+    assert cache.stats() == {"entries": 1, "rows": 2, "max_rows": 3}
+
+
+def test_endpoint_returns_a_cacheable_compact_index(api_client):
+    headers = {"X-API-Key": "test_key"}
+    payload = {
+        "texts": ["Hola amigo.", "Amigo, hola hola"],
+        "language": "es",
+        "segment_ids": [7, 9],
+    }
+
+    response = api_client.post("/lemma_index", json=payload, headers=headers)
+    again = api_client.post("/lemma_index", json=payload, headers=headers)
+    conditional = api_client.post(
+        "/lemma_index",
+        json=payload,
+        headers={**headers, "If-None-Match": response.headers["etag"]},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    rows = {row[0]: row for row in body["lemmas"]}
+    assert rows["hola"][3:] == [3, 7, [7, 9]]
+    assert rows["amigo"][3:] == [2, 7, [7, 9]]
+    assert not body["cached"]
+    assert again.json()["cached"] and again.headers["etag"] == response.headers["etag"]
+    assert conditional.status_code == 304
+    mismatched = {**payload, "segment_ids": [1]}
+    assert (
+        api_client.post("/lemma_index", json=mismatched, headers=headers).status_code
+        == 422
+    )
+
+
+def test_etag_follows_the_model_and_matches_weak_and_listed_tags(
+    api_client, monkeypatch
+):
+    headers = {"X-API-Key": "test_key"}
+    payload = {"texts": ["Hola amigo."], "language": "es"}
+    etag = api_client.post("/lemma_index", json=payload, headers=headers).headers[
+        "etag"
+    ]
+
+    for if_none_match in (f"W/{etag}", f'"other", {etag}', "*"):
+        response = api_client.post(
+            "/lemma_index",
+            json=payload,
+            headers={**headers, "If-None-Match": if_none_match},
+        )
+        assert response.status_code == 304
+
+    monkeypatch.setattr(
+        fakes.FakeFilter, "model_version", lambda _self, language: f"{language}_v2"
+    )
+    upgraded = api_client.post(
+        "/lemma_index", json=payload, headers={**headers, "If-None-Match": etag}
+    )
+    assert upgraded.status_code == 200
+    assert upgraded.headers["etag"] != etag
+    assert not upgraded.json()["cached"]
+
+
+def test_spacy_filter_reports_its_pipeline_version(monkeypatch):
+    monkeypatch.setenv("AI_SERVICE_TEST_MODE", "1")
+    text_filter = SpacyFilter()
+
+    assert text_filter.model_version("es").startswith("es_")
+    assert text_filter.model_version("es") != text_filter.model_version("en")
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+import structlog
+
+import main
+from core.log_pipeline import EventSampler, configure_logging, parse_event_rates
+
+
+def _run(sampler, event, method="info", times=1):
+    kept = []
+    for _ in range(times):
+        try:
+            kept.append(sampler(None, method, {"event": event}))
+        except structlog.DropEvent:
+            pass
+    return kept
+
+
+def test_parse_event_rates():
+    assert parse_event_rates("a=0.5, b=10,,bad") == {"a": 0.5, "b": 10.0}
+
+
+def test_sampling_keeps_fixed_fraction():
+    sampler = EventSampler({"request_received": 0.25}, {})
+    kept = _run(sampler, "request_received", times=100)
+    assert len(kept) == 25
+    assert kept[0]["sample_rate"] == 0.25
+    assert len(_run(sampler, "other_event", times=10)) == 10
+
+
+def test_rate_limit_reports_suppressed_count(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("core.log_pipeline.time.monotonic", lambda: clock[0])
+    sampler = EventSampler({}, {"transcription_progress": 2})
+
+    assert len(_run(sampler, "transcription_progress", times=10)) == 2
+    clock[0] += 1.0
+    kept = _run(sampler, "transcription_progress")
+    assert kept[0]["suppressed"] == 8
+
+
+def test_warnings_are_never_dropped():
+    sampler = EventSampler({"noisy": 0.0}, {"noisy": 0})
+    assert len(_run(sampler, "noisy", method="warning", times=5)) == 5
+
+
+@pytest.fixture(name="pipeline_dir")
+def _pipeline_dir(tmp_path):
+    try:
+        yield tmp_path
+    finally:
+        configure_logging(main.LOGS_DIR)
+
+
+def test_records_are_written_as_json_by_background_writer(pipeline_dir):
+    pipeline = configure_logging(pipeline_dir)
+    assert pipeline.listener is not None
+
+    structlog.get_logger("test").info("pipeline_check", answer=42)
+    pipeline.stop()
+
+    lines = (pipeline_dir / "ai-service.log").read_text().splitlines()
+    records = [json.loads(line) for line in lines]
+    record = next(r for r in records if r.get("message") == "pipeline_check")
+    assert record["answer"] == 42
+    assert record["level"] == "info"
+    assert "timestamp" in record
+
+
+def test_each_worker_writes_its_own_file(pipeline_dir):
+    pipeline = configure_logging(pipeline_dir, worker="2")
+
+    structlog.get_logger("test").info("worker_check")
+    pipeline.stop()
+
+    assert "worker_check" in (pipeline_dir / "ai-service.worker-2.log").read_text()
+    assert not (pipeline_dir / "ai-service.log").exists()
@@ -0,0 +1,96 @@
+import asyncio
+import shutil
+import sys
+import time
+
+import pytest
+
+from core import deadlines, media_jobs
+from core.media_jobs import (
+    MediaJobExecutor,
+    MediaJobFailed,
+    MediaJobTimeout,
+    MediaQueueFull,
+)
+
+
+def _sleep_cmd(seconds: float):
+    return [sys.executable, "-c", f"import time; time.sleep({seconds})"]
+
+
+def test_limits_concurrency_and_rejects_when_queue_is_full():
+    executor = MediaJobExecutor(max_jobs=2, max_queue=1, timeout_s=10, prefix=[])
+    peak = []
+
+    async def scenario():
+        async def sample():
+            while True:
+                peak.append((executor.running, executor.queued))
+                await asyncio.sleep(0.01)
+
+        sampler = asyncio.create_task(sample())
+        jobs = [asyncio.create_task(executor.run(_sleep_cmd(0.3))) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        with pytest.raises(MediaQueueFull):
+            await executor.run(_sleep_cmd(0))
+        await asyncio.gather(*jobs)
+        sampler.cancel()
+
+    asyncio.run(scenario())
+    assert max(running for running, _ in peak) == 2
+    assert max(queued for _, queued in peak) == 1
+    assert executor.stats()["running"] == 0
+    assert media_jobs.MEDIA_JOBS.value(outcome="rejected") >= 1
+
+
+def test_timeout_kills_the_process_group(tmp_path):
+    marker = tmp_path / "child_survived"
+    child = tmp_path / "child.py"
+    child.write_text(
+        f"import time\ntime.sleep(1)\nopen({str(marker)!r}, 'w').close()\n"
+    )
+    parent = tmp_path / "parent.py"
+    # The child outlives its parent unless the whole group is killed.
+    parent.write_text(
+        "import subprocess, sys, time\n"
+        f"subprocess.Popen([sys.executable, {str(child)!r}])\n"
+        "time.sleep(30)\n"
+    )
+    executor = MediaJobExecutor(max_jobs=1, max_queue=1, timeout_s=0.3, prefix=[])
+
+    started = time.monotonic()
+    with pytest.raises(MediaJobTimeout):
+        asyncio.run(executor.run([sys.executable, str(parent)]))
+    assert time.monotonic() - started < 5
+
+    time.sleep(1.5)
+    assert not marker.exists()
+    assert executor.stats()["running"] == 0
+
+
+def test_job_cut_short_by_the_request_deadline_raises_deadline_exceeded():
+    executor = MediaJobExecutor(max_jobs=1, max_queue=1, timeout_s=10, prefix=[])
+
+    async def scenario():
+        with deadlines.scope(time.monotonic() + 0.3):
+            await executor.run(_sleep_cmd(5))
+
+    before = media_jobs.MEDIA_JOBS.value(outcome="expired")
+    with pytest.raises(deadlines.DeadlineExceeded, match="media_job"):
+        asyncio.run(scenario())
+    assert media_jobs.MEDIA_JOBS.value(outcome="expired") == before + 1
+
+
+def test_failure_carries_stderr():
+    executor = MediaJobExecutor(max_jobs=1, max_queue=1, prefix=[])
+    cmd = [sys.executable, "-c", "import sys; sys.stderr.write('boom'); sys.exit(3)"]
+
+    with pytest.raises(MediaJobFailed, match="boom"):
+        asyncio.run(executor.run(cmd))
+
+
+@pytest.mark.skipif(shutil.which("nice") is None, reason="nice not installed")
+def test_priority_prefix_wraps_command():
+    prefix = media_jobs.priority_prefix(10, "")
+    assert prefix == ["nice", "-n", "10"]
+    assert not media_jobs.priority_prefix(0, "")
@@ -0,0 +1,134 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core import fakes, memory
+from core.filter import SpacyFilter
+
+
+@pytest.fixture(name="api_client")
+def _tracing_client(api_client):
+    try:
+        yield api_client
+    finally:
+        memory.TRACER.stop()
+
+
+def test_footprints_are_grouped_by_engine():
+    footprints = memory._Footprints()  # pylint: disable=protected-access
+    with footprints.track("translator", "opus-es-en"):
+        ballast = b"x" * (32 * 1024 * 1024)
+    with footprints.track("translator", "opus-en-es"):
+        pass
+
+    engines = footprints.by_engine()
+
+    translator = engines["translator"]
+    assert set(translator["models"]) == {"opus-es-en", "opus-en-es"}
+    assert translator["models"]["opus-es-en"] >= 16 * 1024 * 1024
+    assert translator["estimated_bytes"] == sum(translator["models"].values())
+    footprints.forget("translator", "opus-es-en")
+    assert list(footprints.by_engine()["translator"]["models"]) == ["opus-en-es"]
+    del ballast
+
+
+def test_tracked_loads_take_turns():
+    footprints = memory._Footprints()  # pylint: disable=protected-access
+    loading, release = threading.Event(), threading.Event()
+    entered = []
+
+    def first():
+        with footprints.track("transcriber", "small/int8"):
+            loading.set()
+            release.wait(5)
+
+    def second():
+        with footprints.track("filter", "es_core_news_sm"):
+            entered.append("filter")
+
+    with ThreadPoolExecutor(2) as pool:
+        pool.submit(first)
+        loading.wait(5)
+        done = pool.submit(second)
+        time.sleep(0.1)
+        assert not entered
+        release.set()
+        done.result(5)
+
+    assert entered == ["filter"]
+
+
+def test_watchdog_sheds_over_the_limit_once_per_cooldown(monkeypatch):
+    caches = memory._Caches()  # pylint: disable=protected-access
+    shed = []
+    caches.register("test", lambda: {"entries": 1}, lambda: shed.append(1))
+    monkeypatch.setattr(memory, "CACHES", caches)
+    watchdog = memory.RssWatchdog(limit_bytes=1, interval=60, cooldown=30)
+
+    assert watchdog.check(now=100.0)
+    assert not watchdog.check(now=110.0)  # cooling down
+    assert watchdog.check(now=131.0)
+    assert len(shed) == 2
+    assert watchdog.stats()["sheds"] == 2
+    assert not memory.RssWatchdog(limit_bytes=0).check()
+
+
+def test_engines_shed_all_but_the_most_recent_model(monkeypatch):
+    monkeypatch.setenv("AI_SERVICE_TEST_MODE", "1")
+    text_filter = SpacyFilter()
+    text_filter.analyze_batch(["hola"], "es")
+    text_filter.analyze_batch(["hello"], "en")
+
+    assert text_filter.shed_models() == ["es"]
+    assert text_filter.loaded_models() == ["en"]
+
+    translator = fakes.FakeTranslator(fakes.CostModel())
+    translator.translate(["hola"], "es", "en")
+    assert translator.shed_models() == ["es-en"]
+    assert translator.loaded_models() == []
+
+
+def test_snapshots_start_tracing_then_report_growth():
+    tracer = memory.AllocationTracer(frames=1)
+    try:
+        assert tracer.snapshot()["started"]
+        first = tracer.snapshot(limit=5)
+        held = [bytearray(1024) for _ in range(1000)]
+        second = tracer.snapshot(limit=5)
+
+        assert "growth" not in first
+        assert len(second["top"]) <= 5
+        assert any(entry["bytes_diff"] > 0 for entry in second["growth"])
+        del held
+    finally:
+        tracer.stop()
+    assert tracer.stats() == {"tracing": False}
+
+
+def test_memory_endpoint_reports_process_and_caches(api_client):
+    assert api_client.get("/memory").status_code in (401, 403)
+
+    response = api_client.get("/memory", headers={"X-API-Key": "test_key"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["rss_bytes"] > 0
+    assert {"engine_models", "audio_cache", "profiles"} <= set(body["caches"])
+    assert body["tracemalloc"] == {"tracing": False}
+
+
+def test_snapshot_endpoints_toggle_tracing(api_client):
+    headers = {"X-API-Key": "test_key"}
+
+    assert api_client.post("/memory/snapshots", headers=headers).json()["started"]
+    snapshot = api_client.post("/memory/snapshots?limit=3", headers=headers).json()
+    assert len(snapshot["top"]) <= 3
+    report = api_client.get("/memory?top=2", headers=headers).json()
+    assert report["tracemalloc"]["tracing"]
+    assert len(report["tracemalloc"]["top"]) <= 2
+
+    assert api_client.delete("/memory/snapshots", headers=headers).json() == {
+        "tracing": False
+    }
@@ -0,0 +1,49 @@
+from unittest.mock import MagicMock
+
+import main
+from core import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    histogram = registry.histogram("demo_seconds", "Demo.", ("engine",), buckets=(1, 5))
+    histogram.observe(0.5, engine="filter")
+    histogram.observe(3, engine="filter")
+    histogram.observe(10, engine="filter")
+
+    text = registry.render()
+    assert 'demo_seconds_bucket{engine="filter",le="1.0"} 1.0' in text
+    assert 'demo_seconds_bucket{engine="filter",le="5.0"} 2.0' in text
+    assert 'demo_seconds_bucket{engine="filter",le="+Inf"} 3.0' in text
+    assert 'demo_seconds_count{engine="filter"} 3.0' in text
+    assert 'demo_seconds_sum{engine="filter"} 13.5' in text
+
+
+def test_timed_lock_records_wait():
+    before = metrics.ENGINE_LOCK_WAIT.count(engine="unit")
+    with metrics.timed_lock(MagicMock(), "unit"):
+        assert metrics.ENGINE_BUSY.value(engine="unit") == 1
+    assert metrics.ENGINE_BUSY.value(engine="unit") == 0
+    assert metrics.ENGINE_LOCK_WAIT.count(engine="unit") == before + 1
+
+
+def test_metrics_endpoint_reports_request_latency(api_client):
+    filter_service = MagicMock()
+    filter_service.analyze_batch.return_value = [[]]
+    main.app.dependency_overrides[main.get_filter] = lambda: filter_service
+
+    api_client.post(
+        "/filter",
+        headers={"X-API-Key": "test_key"},
+        json={"texts": ["hola"], "language": "es"},
+    )
+    response = api_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert (
+        'ai_request_duration_seconds_count{endpoint="/filter",method="POST",status="200"}'
+        in body
+    )
+    assert 'ai_threadpool_tokens{state="total"}' in body
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+import main
+from core.admission import AdmissionCounter, AdmissionMiddleware
+from core.filter import SpacyFilter
+from core.prefork import reset_engines_after_fork
+from core.readiness import EngineRegistry
+from core.translator import OpusTranslator
+
+
+def test_admission_counter_enforces_limit():
+    counter = AdmissionCounter(limit=2)
+    assert counter.try_acquire()
+    assert counter.try_acquire()
+    assert not counter.try_acquire()
+    counter.release()
+    assert counter.in_flight == 1
+    assert counter.try_acquire()
+
+
+def test_respawned_worker_returns_its_slots():
+    counter = AdmissionCounter(limit=2, cells=4)
+    counter.bind(1)
+    assert counter.try_acquire() and counter.try_acquire()
+    assert not counter.try_acquire()
+
+    counter.reset(1)  # worker 1 was killed mid-request
+
+    counter.bind(2)
+    assert counter.in_flight == 0
+    assert counter.try_acquire()
+
+
+def test_slot_is_released_when_the_body_is_never_sent():
+    counter = AdmissionCounter(limit=1)
+
+    async def app(_scope, _receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"x"})
+
+    async def gone(_message):
+        raise OSError("client went away")
+
+    async def scenario():
+        middleware = AdmissionMiddleware(app, counter)
+        with pytest.raises(OSError):
+            await middleware({"type": "http", "path": "/filter"}, None, gone)
+
+    asyncio.run(scenario())
+
+    assert counter.in_flight == 0
+
+
+def test_admission_counter_unlimited_when_zero():
+    counter = AdmissionCounter(limit=0)
+    assert all(counter.try_acquire() for _ in range(100))
+
+
+def test_reset_engines_after_fork_replaces_held_locks():
+    text_filter = SpacyFilter()
+    translator = OpusTranslator(device="cpu")
+    text_filter._lock.acquire()  # pylint: disable=protected-access,consider-using-with
+    registry = EngineRegistry()
+    registry.register("filter", lambda: text_filter)
+    registry.register("translator", lambda: translator)
+    registry.load_all(warmup=False)
+
+    reset_engines_after_fork(registry)
+
+    # pylint: disable-next=protected-access,consider-using-with
+    assert text_filter._lock.acquire(blocking=False)
+    assert isinstance(translator._lock, type(threading.RLock()))  # pylint: disable=protected-access
+
+
+@pytest.fixture(name="api_client")
+def _single_slot_client(api_client, monkeypatch):
+    monkeypatch.setattr(main.ADMISSION, "limit", 1)
+    return api_client
+
+
+def test_requests_over_capacity_get_429(api_client):
+    filter_service = MagicMock()
+    filter_service.analyze_batch.return_value = [[]]
+    main.app.dependency_overrides[main.get_filter] = lambda: filter_service
+
+    assert main.ADMISSION.try_acquire()  # another worker holds the only slot
+    response = api_client.post(
+        "/filter",
+        headers={"X-API-Key": "test_key"},
+        json={"texts": ["a"], "language": "es"},
+    )
+    assert response.status_code == 429
+    assert api_client.get("/health").status_code == 200
+
+    main.ADMISSION.release()
+    response = api_client.post(
+        "/filter",
+        headers={"X-API-Key": "test_key"},
+        json={"texts": ["a"], "language": "es"},
+    )
+    assert response.status_code == 200
+    assert main.ADMISSION.in_flight == 0
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+import main
+from core import profiling
+
+
+@pytest.fixture(name="api_client")
+def _slow_filter_client(api_client, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "LOGS_DIR", tmp_path)
+
+    def slow_analyze(texts, _language):
+        time.sleep(0.05)
+        return [[] for _ in texts]
+
+    filter_service = MagicMock()
+    filter_service.analyze_batch.side_effect = slow_analyze
+    main.app.dependency_overrides[main.get_filter] = lambda: filter_service
+    return api_client
+
+
+def test_profiling_requires_api_key(monkeypatch):
+    monkeypatch.delenv("AI_SERVICE_API_KEY", raising=False)
+    assert not profiling.profiling_requested("1", None)
+    monkeypatch.setenv("AI_SERVICE_API_KEY", "secret")
+    assert not profiling.profiling_requested("1", "wrong")
+    assert not profiling.profiling_requested("0", "secret")
+    assert profiling.profiling_requested("1", "secret")
+
+
+def test_profiled_request_writes_folded_stacks(api_client, tmp_path):
+    response = api_client.post(
+        "/filter",
+        headers={
+            "X-API-Key": "test_key",
+            "X-Profile": "1",
+            "X-Request-ID": "req-profile-1",
+        },
+        json={"texts": ["hola"], "language": "es"},
+    )
+    assert response.status_code == 200
+
+    profile_file = tmp_path / "profiles" / "req-profile-1.folded"
+    assert profile_file.exists()
+    lines = profile_file.read_text().splitlines()
+    assert lines
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("slow_analyze" in line for line in lines)
+
+    summary = api_client.get(
+        "/profiles/summary", headers={"X-API-Key": "test_key"}
+    ).json()
+    assert summary["profiles"][-1]["request_id"] == "req-profile-1"
+    assert any("slow_analyze" in entry["function"] for entry in summary["top_total"])
+
+
+def test_unauthenticated_profile_header_is_ignored(api_client, tmp_path):
+    response = api_client.post(
+        "/filter",
+        headers={"X-Profile": "1", "X-Request-ID": "req-anon"},
+        json={"texts": ["hola"], "language": "es"},
+    )
+    assert response.status_code == 403
+    assert not (tmp_path / "profiles" / "req-anon.folded").exists()
+
+
+def test_sampler_stops_when_the_client_disconnects_mid_stream(monkeypatch, tmp_path):
+    monkeypatch.setenv("AI_SERVICE_API_KEY", "secret")
+
+    async def streaming_app(_scope, _receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        while True:
+            await send({"type": "http.response.body", "body": b".", "more_body": True})
+            await asyncio.sleep(0.01)
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            raise OSError("client went away")
+
+    middleware = profiling.ProfilingMiddleware(
+        streaming_app, directory=lambda: tmp_path, key_header="X-API-Key"
+    )
+    scope = {
+        "type": "http",
+        "path": "/transcribe/stream",
+        "headers": [(b"x-profile", b"1"), (b"x-api-key", b"secret")],
+    }
+    with pytest.raises(OSError):
+        asyncio.run(middleware(scope, None, send))
+
+    assert not any(t.name == "profile-sampler" for t in threading.enumerate())
@@ -0,0 +1,122 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+import main
+from core import metrics, quality
+from core import translator as opus
+from core.quality import MINIMAL, REDUCED, OverloadController
+
+
+def _controller():
+    return OverloadController(
+        enabled=True,
+        reduced_queue=2,
+        minimal_queue=4,
+        reduced_wait_s=60,
+        minimal_wait_s=120,
+        recover_s=10,
+    )
+
+
+def _queue(engine, depth):
+    for _ in range(depth):
+        metrics.ENGINE_BUSY.inc(engine=engine)
+
+
+def _drain(engine, depth):
+    for _ in range(depth):
+        metrics.ENGINE_BUSY.dec(engine=engine)
+
+
+def test_quality_degrades_with_queue_depth_and_recovers_stepwise():
+    controller = _controller()
+    engine = "unit-quality"
+    assert controller.level(engine, now=0) == quality.FULL
+
+    _queue(engine, 4)
+    try:
+        assert controller.level(engine, now=1) == MINIMAL
+    finally:
+        _drain(engine, 4)
+
+    # Back to idle: quality returns one level per calm recovery period.
+    assert controller.level(engine, now=5) == MINIMAL
+    assert controller.level(engine, now=11) == REDUCED
+    assert controller.level(engine, now=15) == REDUCED
+    assert controller.level(engine, now=21) == quality.FULL
+    assert controller.stats()[engine] == "full"
+
+
+def test_recent_lock_wait_degrades_quality(monkeypatch):
+    controller = _controller()
+    monkeypatch.setattr(metrics, "recent_lock_wait", lambda _engine: 90.0)
+    assert controller.level("unit-wait", now=0) == REDUCED
+
+
+def test_disabled_controller_always_returns_full():
+    controller = OverloadController(enabled=False, reduced_queue=0)
+    assert controller.level("unit-off") == quality.FULL
+
+
+def test_settings_per_level(monkeypatch):
+    monkeypatch.setattr(quality, "WHISPER_DEGRADED_MODEL", "tiny.en")
+
+    full = quality.transcription_settings(quality.FULL)
+    assert (full.beam_size, full.model, full.temperature_fallback) == (5, None, True)
+    minimal = quality.transcription_settings(MINIMAL)
+    assert (minimal.beam_size, minimal.model) == (1, "tiny.en")
+    assert minimal.temperature_fallback is False
+
+    assert quality.translation_settings(quality.FULL).max_new_tokens is None
+    reduced = quality.translation_settings(REDUCED)
+    assert (reduced.level, reduced.beam_size) == ("reduced", 1)
+    assert reduced.max_new_tokens < 512
+
+
+def test_translator_keeps_model_defaults_at_full_quality():
+    # pylint: disable=protected-access
+    assert not opus._generate_options(quality.translation_settings(quality.FULL))
+    assert opus._generate_options(quality.translation_settings(REDUCED)) == {
+        "num_beams": 1,
+        "max_new_tokens": quality.TRANSLATION_REDUCED_MAX_TOKENS,
+    }
+
+
+def test_translator_counts_generated_tokens_without_padding():
+    torch = pytest.importorskip("torch")
+    generated = torch.tensor([[0, 11, 12, 13, 2], [0, 21, 2, 0, 0]])
+
+    # pylint: disable-next=protected-access
+    assert opus._token_count(generated, pad_token_id=0) == 6
+
+
+def test_translation_reports_the_settings_used(api_client, monkeypatch):
+    monkeypatch.setattr(main, "QUALITY", _controller())
+    received = []
+
+    def translate(texts, _source, _target, settings):
+        received.append(settings)
+        return texts
+
+    translator = MagicMock()
+    translator.translate.side_effect = translate
+    main.app.dependency_overrides[main.get_translator] = lambda: translator
+
+    def post():
+        return api_client.post(
+            "/translate",
+            headers={"X-API-Key": "test_key"},
+            json={"texts": ["hola"], "source_lang": "es", "target_lang": "en"},
+        )
+
+    assert post().json()["quality"]["level"] == "full"
+
+    _queue("translator", 3)
+    try:
+        body = post().json()
+    finally:
+        _drain("translator", 3)
+    assert body["quality"]["level"] == "reduced"
+    assert body["quality"]["beam_size"] == 1
+    assert received[-1].level == "reduced"
@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+import main
+from core.readiness import EngineNotReady, EngineRegistry
+
+
+def test_registry_loads_in_background_and_warms_up():
+    release = threading.Event()
+    warmed = []
+
+    def slow_factory():
+        release.wait(5)
+        return "engine"
+
+    registry = EngineRegistry()
+    registry.register("slow", slow_factory, warmed.append)
+    assert registry.get("slow", timeout=0) is None  # loading never started
+
+    registry.start_background_load()
+    assert registry.status()["slow"]["status"] in ("pending", "loading")
+    with pytest.raises(EngineNotReady):
+        registry.get("slow", timeout=0.01)
+
+    release.set()
+    assert registry.get("slow", timeout=5) == "engine"
+    assert warmed == ["engine"]
+    assert registry.all_ready()
+
+
+def test_failed_factory_marks_engine_failed_but_warmup_errors_do_not():
+    def broken():
+        raise RuntimeError("no weights")
+
+    def bad_warmup(_engine):
+        raise RuntimeError("warmup exploded")
+
+    registry = EngineRegistry(attempts=1)
+    registry.register("broken", broken)
+    registry.register("ok", lambda: "engine", bad_warmup)
+    registry.load_all()
+
+    assert registry.status()["broken"] == {
+        "status": "failed",
+        "error": "no weights",
+        "load_s": None,
+        "warmup_s": None,
+    }
+    assert registry.get("ok", timeout=0) == "engine"
+    assert not registry.all_ready()
+    assert registry.failed() == ["broken"]
+
+
+def test_failed_factory_is_retried_then_reported():
+    attempts = []
+    failures = []
+
+    def flaky():
+        attempts.append(len(attempts))
+        if len(attempts) < 2:
+            raise RuntimeError("hub unreachable")
+        return "engine"
+
+    def broken():
+        raise RuntimeError("no weights")
+
+    registry = EngineRegistry(attempts=2, backoff_s=0.01)
+    registry.register("flaky", flaky)
+    registry.register("broken", broken)
+    registry.start_background_load(
+        on_failure=lambda name, error: failures.append((name, error))
+    )
+
+    assert registry.get("flaky", timeout=5) == "engine"
+    with pytest.raises(EngineNotReady):
+        registry.get("broken", timeout=5)
+    assert attempts == [0, 1]
+    assert registry.status()["flaky"]["error"] is None
+    assert failures == [("broken", "no weights")]
+
+
+def test_engines_become_ready_independently_and_reset_clears_them():
+    release = threading.Event()
+    registry = EngineRegistry()
+    registry.register("slow", lambda: release.wait(5) and "whisper")
+    registry.register("fast", lambda: "spacy")
+    registry.start_background_load()
+
+    assert registry.get("fast", timeout=5) == "spacy"
+    assert registry.status()["slow"]["status"] == "loading"
+
+    registry.reset()
+    release.set()
+    assert registry.status()["slow"]["status"] == "pending"
+    assert registry.get("slow", timeout=0) is None
+    assert registry.peek("fast") is None
+
+
+def test_ready_endpoint_reports_per_engine_status(api_client, monkeypatch):
+    registry = EngineRegistry()
+    registry.register("transcriber", lambda: "whisper")
+    registry.register("filter", lambda: "spacy")
+    monkeypatch.setattr(main, "brain_state", registry)
+    response = api_client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["engines"]["filter"]["status"] == "pending"
+
+    registry.load_all()
+    response = api_client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+
+
+def test_invalid_paths_do_not_wait_for_the_engine(api_client, monkeypatch, tmp_path):
+    release = threading.Event()
+    registry = EngineRegistry()
+    registry.register("transcriber", lambda: release.wait(5) and "whisper")
+    registry.start_background_load()
+    monkeypatch.setattr(main, "brain_state", registry)
+    monkeypatch.setenv("AUDIO_BASE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "ENGINE_READY_TIMEOUT_S", 5.0)
+    try:
+        for file_path in ("../outside.mp3", "missing.mp3"):
+            started = time.monotonic()
+            response = api_client.post(
+                "/transcribe",
+                headers={"X-API-Key": "test_key"},
+                json={"file_path": file_path},
+            )
+            assert response.status_code in (400, 500)
+            assert time.monotonic() - started < 1.0
+    finally:
+        release.set()
@@ -1,10 +1,12 @@
 from contextlib import asynccontextmanager
-from unittest.mock import MagicMock
+from unittest.mock import ANY, MagicMock
 
 import pytest
 from fastapi.testclient import TestClient
 
 import main
+from core.audio import AudioDecodeError
+from core.models import LanguageDetection
 
 
 @asynccontextmanager
@@ -163,6 +165,7 @@ def test_transcribe_relative_media_path_success(api_client, monkeypatch, tmp_pat
         segments=[{"start": 0.0, "end": 1.0, "text": "hola"}],
         language="es",
         language_probability=0.99,
+        quality=None,
     )
     main.app.dependency_overrides[main.get_transcriber] = lambda: mock_transcriber
 
@@ -173,10 +176,76 @@ def test_transcribe_relative_media_path_success(api_client, monkeypatch, tmp_pat
     )
 
     assert response.status_code == 200
-    mock_transcriber.transcribe.assert_called_once_with(str(audio_path), "es")
+    mock_transcriber.transcribe.assert_called_once_with(
+        str(audio_path), "es", ANY, 0.0, None
+    )
     assert response.json()["language"] == "es"
 
 
+def test_transcribe_time_range_is_passed_as_start_and_duration(
+    api_client, monkeypatch, tmp_path
+):
+    audio_path = tmp_path / "sample.mp3"
+    audio_path.write_bytes(b"fake")
+    monkeypatch.setenv("AUDIO_BASE_DIR", str(tmp_path))
+    mock_transcriber = MagicMock()
+    mock_transcriber.transcribe.return_value = MagicMock(
+        segments=[{"start": 60.0, "end": 61.0, "text": "hola"}],
+        language="es",
+        language_probability=0.99,
+        quality=None,
+    )
+    main.app.dependency_overrides[main.get_transcriber] = lambda: mock_transcriber
+
+    def post(**time_range):
+        return api_client.post(
+            "/transcribe",
+            headers={"X-API-Key": "test_key"},
+            json={"file_path": str(audio_path), **time_range},
+        )
+
+    assert post(start=60, end=90).status_code == 200
+    assert post(first_seconds=120).status_code == 200
+    assert [c.args[3:] for c in mock_transcriber.transcribe.call_args_list] == [
+        (60.0, 30.0),
+        (0.0, 120.0),
+    ]
+    assert post(start=90, end=60).status_code == 422
+    assert post(end=60, first_seconds=30).status_code == 422
+    assert post(start=-1).status_code == 422
+
+
+def test_detect_language_returns_probabilities(api_client, monkeypatch, tmp_path):
+    audio_path = tmp_path / "sample.mp3"
+    audio_path.write_bytes(b"fake")
+    monkeypatch.setenv("AUDIO_BASE_DIR", str(tmp_path))
+    mock_transcriber = MagicMock()
+    mock_transcriber.detect_language.side_effect = [
+        LanguageDetection(
+            language="de",
+            probability=0.8,
+            languages={"de": 0.8, "nl": 0.2},
+            windows=[10.0, 40.0],
+        ),
+        AudioDecodeError("ffmpeg failed (1): no audio stream"),
+    ]
+    main.app.dependency_overrides[main.get_transcriber] = lambda: mock_transcriber
+
+    def post(file_path):
+        return api_client.post(
+            "/detect_language",
+            headers={"X-API-Key": "test_key"},
+            json={"file_path": file_path},
+        )
+
+    response = post(str(audio_path))
+    assert response.status_code == 200
+    assert response.json()["languages"] == {"de": 0.8, "nl": 0.2}
+    mock_transcriber.detect_language.assert_called_once_with(str(audio_path))
+    assert post(str(audio_path)).status_code == 422
+    assert post("../outside.mp3").status_code == 400
+
+
 def test_transcribe_relative_path_traversal_blocked(api_client, monkeypatch, tmp_path):
     media_root = tmp_path / "media"
     media_root.mkdir()
@@ -194,7 +263,7 @@ def test_transcribe_relative_path_traversal_blocked(api_client, monkeypatch, tmp
 
 def test_translate_and_filter_with_mocks(api_client):
     translator = MagicMock()
-    translator.translate.side_effect = lambda texts, _source, _target: [
+    translator.translate.side_effect = lambda texts, _source, _target, _settings: [
         f"{text}-ok" for text in texts
     ]
     filter_service = MagicMock()
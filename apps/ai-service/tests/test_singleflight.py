@@ -0,0 +1,153 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+import main
+from core import deadlines
+from core.singleflight import SingleFlight, StreamFlight, request_key
+
+
+def test_request_key_is_canonical():
+    assert request_key({"b": 1, "a": 2}, "es") == request_key({"a": 2, "b": 1}, "es")
+    assert request_key(["hola"], "es", "en") != request_key(["hola"], "es", "de")
+
+
+def test_concurrent_identical_calls_run_once():
+    flight = SingleFlight("test")
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return ["result"]
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.do, "k", compute) for _ in range(4)]
+        time.sleep(0.1)
+        release.set()
+        results = [f.result(5) for f in futures]
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    # Nothing is cached afterwards.
+    flight.do("k", compute)
+    assert len(calls) == 2
+
+
+def test_followers_get_the_leaders_exception():
+    flight = SingleFlight("test")
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.2)
+        raise RuntimeError("model exploded")
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, "k", fail)
+        started.wait(5)
+        follower = pool.submit(flight.do, "k", fail)
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="model exploded"):
+                future.result(5)
+
+
+def test_follower_gives_up_at_its_own_deadline():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "result"
+
+    def follow():
+        with deadlines.scope(time.monotonic() + 0.1):
+            return flight.do("k", slow)
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, "k", slow)
+        started.wait(5)
+        waited = time.monotonic()
+        with pytest.raises(deadlines.DeadlineExceeded, match="coalesced"):
+            pool.submit(follow).result(5)
+        assert time.monotonic() - waited < 1.0
+        release.set()
+        assert leader.result(5) == "result"
+
+
+def test_late_stream_subscriber_gets_replay_then_live_events():
+    flight = StreamFlight("test")
+    step = threading.Semaphore(0)
+    created = []
+
+    def source():
+        created.append(1)
+        for i in range(4):
+            step.acquire(timeout=5)  # pylint: disable=consider-using-with
+            yield i
+
+    first = flight.subscribe("k", source)
+    step.release()
+    step.release()
+    assert [next(first), next(first)] == [0, 1]
+
+    second = flight.subscribe("k", source)
+    assert [next(second), next(second)] == [0, 1]  # replayed
+    step.release()
+    step.release()
+
+    assert list(first) == [2, 3]
+    assert list(second) == [2, 3]
+    assert len(created) == 1
+
+
+def test_stream_stops_when_every_subscriber_leaves():
+    flight = StreamFlight("test")
+    closed = threading.Event()
+
+    def source():
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+                time.sleep(0.01)
+        finally:
+            closed.set()
+
+    subscriber = flight.subscribe("k", source)
+    next(subscriber)
+    subscriber.close()
+
+    assert closed.wait(5)
+    # A new identical request starts a fresh stream from the beginning.
+    assert next(flight.subscribe("k", source)) == 0
+
+
+def test_identical_filter_requests_share_one_analysis(api_client):
+    def slow_analysis(texts, _language):
+        time.sleep(0.3)
+        return [[] for _ in texts]
+
+    text_filter = MagicMock()
+    text_filter.analyze_batch.side_effect = slow_analysis
+    main.app.dependency_overrides[main.get_filter] = lambda: text_filter
+
+    def post():
+        return api_client.post(
+            "/filter",
+            headers={"X-API-Key": "test_key"},
+            json={"texts": ["hola", "mundo"], "language": "es"},
+        )
+
+    with ThreadPoolExecutor(3) as pool:
+        responses = list(pool.map(lambda _: post(), range(3)))
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert text_filter.analyze_batch.call_count == 1
@@ -0,0 +1,121 @@
+import asyncio
+import shutil
+import subprocess
+
+import pytest
+
+import main
+from core import thumbnails
+
+
+def test_build_vtt_maps_intervals_to_tiles():
+    options = thumbnails.TrickplayOptions(interval=5, tile_width=160, columns=2, rows=2)
+    vtt, count, sheets = thumbnails.build_vtt(23.0, 90, options)
+
+    assert (count, sheets) == (5, 2)
+    lines = vtt.splitlines()
+    assert lines[0] == "WEBVTT"
+    assert "00:00:00.000 --> 00:00:05.000" in lines
+    assert "sprite_001.jpg#xywh=160,90,160,90" in lines  # 4th tile
+    assert "00:00:20.000 --> 00:00:23.000" in lines
+    assert "sprite_002.jpg#xywh=0,0,160,90" in lines
+
+
+def test_build_command_seeks_before_each_input():
+    options = thumbnails.TrickplayOptions(start=30)
+    cmd = thumbnails.build_command(
+        "/media/a.mp4", thumbnails.Path("/out"), options, poster_at=31
+    )
+
+    assert cmd[cmd.index("-skip_frame") : cmd.index("-i") + 2] == [
+        "-skip_frame", "nokey", "-ss", "30.000", "-i", "/media/a.mp4",
+    ]  # fmt: skip
+    assert cmd[cmd.index("-i") + 2 : cmd.index("-i") + 6] == [
+        "-ss", "31.000", "-i", "/media/a.mp4",
+    ]  # fmt: skip
+    assert "tile=10x10" in cmd[cmd.index("-filter_complex") + 1]
+
+
+def test_trickplay_is_cached_until_file_changes(tmp_path, monkeypatch):
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"fake")
+    monkeypatch.setattr(thumbnails, "probe_video", lambda _path: (35.0, 640, 360))
+    runs = []
+
+    async def fake_run(cmd):
+        runs.append(cmd)
+        out_dir = thumbnails.Path(cmd[-1]).parent
+        (out_dir / "poster.jpg").write_bytes(b"jpg")
+        (out_dir / "sprite_001.jpg").write_bytes(b"jpg")
+
+    options = thumbnails.TrickplayOptions(interval=5)
+    first = asyncio.run(thumbnails.generate_trickplay(str(video), options, fake_run))
+    second = asyncio.run(thumbnails.generate_trickplay(str(video), options, fake_run))
+
+    assert len(runs) == 1
+    assert first["cached"] is False and second["cached"] is True
+    assert first["count"] == 7 and first["tile_height"] == 90
+    assert thumbnails.Path(first["vtt_path"]).exists()
+
+    # Other options for the same version do not evict each other.
+    wide = thumbnails.TrickplayOptions(interval=5, tile_width=320)
+    other = asyncio.run(thumbnails.generate_trickplay(str(video), wide, fake_run))
+    again = asyncio.run(thumbnails.generate_trickplay(str(video), options, fake_run))
+    assert len(runs) == 2 and again["cached"] is True
+    assert thumbnails.Path(other["poster_path"]).exists()
+
+    video.write_bytes(b"changed")
+    third = asyncio.run(thumbnails.generate_trickplay(str(video), options, fake_run))
+    assert len(runs) == 3 and third["cached"] is False
+    # Renderings of the old version are pruned.
+    assert not thumbnails.Path(first["poster_path"]).exists()
+    assert not thumbnails.Path(other["poster_path"]).exists()
+
+
+def test_thumbnails_endpoint(api_client, monkeypatch, tmp_path):
+    media_root = tmp_path / "media"
+    media_root.mkdir()
+    video = media_root / "sample.mp4"
+    video.write_bytes(b"fake")
+    monkeypatch.setenv("MEDIA_ROOT", str(media_root))
+    monkeypatch.setattr(thumbnails, "probe_video", lambda _path: (12.0, 1280, 720))
+
+    async def fake_run(cmd):
+        (thumbnails.Path(cmd[-1]).parent / "poster.jpg").write_bytes(b"jpg")
+
+    monkeypatch.setattr(main, "_run_ffmpeg", fake_run)
+
+    response = api_client.post(
+        "/thumbnails",
+        headers={"X-API-Key": "test_key"},
+        json={"file_path": str(video), "interval": 4},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 3
+    assert body["sprite_paths"][0].endswith("sprite_001.jpg")
+    assert body["vtt_path"].startswith(str(media_root / "sample.trickplay"))
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_trickplay_with_real_ffmpeg(tmp_path):
+    pytest.importorskip("av")
+    video = tmp_path / "clip.mp4"
+    subprocess.run(  # noqa: S603
+        [  # noqa: S607
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+            "-i", "testsrc=duration=12:size=320x180:rate=10", str(video),
+        ],
+        check=True,
+    )  # fmt: skip
+    options = thumbnails.TrickplayOptions(interval=2, columns=3, rows=2)
+
+    result = asyncio.run(
+        thumbnails.generate_trickplay(str(video), options, main._run_ffmpeg)  # pylint: disable=protected-access
+    )
+
+    assert result["count"] == 6
+    assert result["tile_height"] == 90
+    assert thumbnails.Path(result["poster_path"]).exists()
+    assert all(thumbnails.Path(p).exists() for p in result["sprite_paths"])
@@ -0,0 +1,152 @@
+import threading
+
+import pytest
+
+import main
+from core import tracing
+from core.filter import SpacyFilter
+
+
+@pytest.fixture(name="api_client")
+def _test_mode_client(api_client, monkeypatch):
+    monkeypatch.setenv("AI_SERVICE_TEST_MODE", "1")
+    return api_client
+
+
+def _spans(document):
+    return document["resourceSpans"][0]["scopeSpans"][0]["spans"]
+
+
+def _attribute(entry, key):
+    for attribute in entry["attributes"]:
+        if attribute["key"] == key:
+            return next(iter(attribute["value"].values()))
+    return None
+
+
+def test_spans_nest_under_the_request_root():
+    store = tracing.TraceStore()
+    with store.request("req-1", "POST /filter") as finish:
+        with tracing.span("inference", engine="filter", texts=2):
+            with tracing.span("model_load"):
+                pass
+        tracing.record("lock_wait", 0.25, engine="filter")
+    finish(200)
+
+    spans = {entry["name"]: entry for entry in _spans(store.get("req-1"))}
+    root = spans["POST /filter"]
+    assert "parentSpanId" not in root
+    assert spans["inference"]["parentSpanId"] == root["spanId"]
+    assert spans["model_load"]["parentSpanId"] == spans["inference"]["spanId"]
+    assert _attribute(spans["inference"], "texts") == "2"
+    lock_wait = spans["lock_wait"]
+    elapsed = int(lock_wait["endTimeUnixNano"]) - int(lock_wait["startTimeUnixNano"])
+    assert elapsed == pytest.approx(250_000_000, rel=0.01)
+    assert {entry["traceId"] for entry in spans.values()} == {root["traceId"]}
+
+
+def test_spans_are_noops_outside_a_trace():
+    with tracing.span("inference"):
+        tracing.record("lock_wait", 1.0)
+    assert tracing.current() is None
+
+
+def test_failures_mark_the_span_and_root_as_errors():
+    store = tracing.TraceStore()
+    with store.request("req-2", "POST /translate") as finish:
+        with pytest.raises(RuntimeError), tracing.span("inference"):
+            raise RuntimeError("boom")
+    finish(500)
+
+    spans = {entry["name"]: entry for entry in _spans(store.get("req-2"))}
+    assert spans["inference"]["status"] == {"code": 2, "message": "RuntimeError"}
+    assert spans["POST /translate"]["status"]["message"] == "HTTP 500"
+
+
+def test_attached_continues_a_trace_on_another_thread():
+    store = tracing.TraceStore()
+    with store.request("req-3", "POST /transcribe/stream") as finish:
+        parent = tracing.current()
+
+        def produce():
+            with tracing.attached(parent), tracing.span("inference"):
+                pass
+
+        worker = threading.Thread(target=produce)
+        worker.start()
+        worker.join()
+    finish(200)
+
+    names = [entry["name"] for entry in _spans(store.get("req-3"))]
+    assert names == ["inference", "POST /transcribe/stream"]
+
+
+def test_old_traces_are_read_back_from_the_file(tmp_path):
+    store = tracing.TraceStore(history=1)
+    store.configure(tmp_path / "traces.jsonl", 1024 * 1024, 1)
+    for request_id in ("first", "second"):
+        with store.request(request_id, "POST /filter") as finish:
+            pass
+        finish(200)
+    store.close()
+
+    document = store.get("first")
+
+    assert [entry["name"] for entry in _spans(document)] == ["POST /filter"]
+    assert _attribute(_spans(document)[0], "http.request_id") == "first"
+    assert len((tmp_path / "traces.jsonl").read_text().splitlines()) == 2
+    assert store.get("missing") is None
+
+
+def test_file_lookup_reads_only_the_end_of_the_file(tmp_path, monkeypatch):
+    store = tracing.TraceStore(history=1)
+    store.configure(tmp_path / "traces.jsonl", 1024 * 1024, 1)
+    for request_id in ("oldest", "older", "newest"):
+        with store.request(request_id, "POST /filter") as finish:
+            pass
+        finish(200)
+    store.close()
+    lines = (tmp_path / "traces.jsonl").read_bytes().splitlines(keepends=True)
+    monkeypatch.setattr(tracing, "TRACE_SCAN_BYTES", len(lines[1] + lines[2]) + 10)
+
+    assert store.get("oldest") is None
+    assert _attribute(_spans(store.get("older"))[0], "http.request_id") == "older"
+
+
+def test_workers_write_their_own_files_and_find_each_others_traces(tmp_path):
+    stores = [tracing.TraceStore(history=1) for _ in range(2)]
+    for index, store in enumerate(stores):
+        store.configure(tmp_path / "traces.jsonl", 1024 * 1024, 1, worker=str(index))
+    with stores[0].request("served-by-0", "POST /filter") as finish:
+        pass
+    finish(200)
+    for store in stores:
+        store.close()
+
+    assert [path.name for path in tmp_path.iterdir()] == ["traces.worker-0.jsonl"]
+    document = stores[1].get("served-by-0")
+    assert _attribute(_spans(document)[0], "http.request_id") == "served-by-0"
+
+
+def test_trace_endpoint_returns_request_phases(api_client):
+    main.app.dependency_overrides[main.get_filter] = SpacyFilter
+    headers = {"X-API-Key": "test_key"}
+    response = api_client.post(
+        "/filter",
+        json={"texts": ["Hola mundo"], "language": "es"},
+        headers={**headers, "X-Request-ID": "trace-endpoint-test"},
+    )
+    assert response.status_code == 200
+
+    trace = api_client.get("/traces/trace-endpoint-test", headers=headers)
+
+    assert trace.status_code == 200
+    names = {entry["name"] for entry in _spans(trace.json())}
+    assert {
+        "POST /filter",
+        "threadpool_wait",
+        "lock_wait",
+        "inference",
+        "serialize",
+    } <= names
+    assert api_client.get("/traces/unknown", headers=headers).status_code == 404
@@ -78,6 +78,7 @@ describe("RealAiGateway: successful calls", () => {
     >;
     expect(headers["X-API-Key"]).toBe("test-key");
     expect(headers["X-Request-ID"]).toBe("req-123");
+    expect(headers["X-Request-Timeout-Ms"]).toMatch(/^\d+$/);
   });
 
   it("calls analyzeBatch correctly", async () => {
@@ -201,6 +202,66 @@ describe("RealAiGateway: SSE streaming", () => {
     expect(result.language_probability).toBe(0.95);
   });
 
+  it("unpacks coalesced segments and ignores progress events", async () => {
+    const sseChunks = [
+      'event:info\ndata:{"type":"info","language":"es","duration":10}\n\n' +
+        'event:segments\ndata:{"type":"segments","segments":' +
+        '[{"start":0,"end":2,"text":"Hola"},{"start":2,"end":4,"text":"mundo"}]}\n\n' +
+        'event:progress\ndata:{"type":"progress","position":4,"duration":10}\n\n',
+    ];
+
+    vi.stubGlobal(
+      "fetch",
+      vi.fn().mockResolvedValue({
+        ok: true,
+        body: createSSEStream(sseChunks),
+      }),
+    );
+
+    const progressCallback = vi.fn();
+    const result = await gateway.transcribeWithProgress(
+      "/path/file.mp3",
+      "es",
+      progressCallback,
+    );
+
+    expect(result.segments).toEqual([
+      { start: 0, end: 2, text: "Hola" },
+      { start: 2, end: 4, text: "mundo" },
+    ]);
+    expect(progressCallback).toHaveBeenCalledTimes(2);
+  });
+
+  it("replaces provisional segments with refined ones", async () => {
+    const sseChunks = [
+      'event:info\ndata:{"type":"info","language":"es","duration":10}\n\n' +
+        'data:{"start":0,"end":4,"text":"Ola mun"}\n\n' +
+        'data:{"start":6,"end":9,"text":"adios"}\n\n' +
+        'event:segment_update\ndata:{"type":"segment_update","start":0,"end":5,' +
+        '"segments":[{"start":0,"end":2,"text":"Hola"},{"start":2,"end":4,"text":"mundo"}]}\n\n',
+    ];
+
+    vi.stubGlobal(
+      "fetch",
+      vi.fn().mockResolvedValue({
+        ok: true,
+        body: createSSEStream(sseChunks),
+      }),
+    );
+
+    const result = await gateway.transcribeWithProgress(
+      "/path/file.mp3",
+      "es",
+      vi.fn(),
+    );
+
+    expect(result.segments.map((segment) => segment.text)).toEqual([
+      "Hola",
+      "mundo",
+      "adios",
+    ]);
+  });
+
   it("calls onProgress with calculated percentage", async () => {
     const sseChunks = [
       'event:info\ndata:{"type":"info","duration":100}\n\n' +
@@ -64,6 +64,22 @@ async function applySegmentEvent(
   }
 }
 
+type TranscriptSegment = { start: number; end: number; text: string };
+
+// Refined segments replace the provisional ones starting in [start, end).
+function applySegmentUpdateEvent(
+  parsed: Record<string, unknown>,
+  state: SSEStreamState,
+): void {
+  const start = parsed.start as number;
+  const end = parsed.end as number;
+  const refined = (parsed.segments as TranscriptSegment[] | undefined) ?? [];
+  state.segments = state.segments
+    .filter((segment) => segment.start < start || segment.start >= end)
+    .concat(refined)
+    .sort((a, b) => a.start - b.start);
+}
+
 async function processSSELine(
   line: string,
   currentEvent: string,
@@ -78,11 +94,20 @@ async function processSSELine(
   if (!raw || raw === "[DONE]") return currentEvent;
   try {
     const parsed = JSON.parse(raw) as Record<string, unknown>;
-    if (currentEvent === "info" || parsed.type === "info") {
+    const eventType = currentEvent || (parsed.type as string) || "segment";
+    if (eventType === "info") {
       applyInfoEvent(parsed, state);
-    } else {
+    } else if (eventType === "segment_update") {
+      applySegmentUpdateEvent(parsed, state);
+    } else if (eventType === "segments") {
+      // Several segments produced close together, sent as one event.
+      for (const segment of parsed.segments as Record<string, unknown>[]) {
+        await applySegmentEvent(segment, state, onProgress);
+      }
+    } else if (eventType === "segment") {
       await applySegmentEvent(parsed, state, onProgress);
     }
+    // "progress" events only keep the connection alive.
   } catch {
     /* skip */
   }
@@ -128,10 +153,12 @@ export class RealAiGateway {
   private readonly transcribeTimeoutMs =
     CONFIG.AI_SERVICE_TRANSCRIBE_TIMEOUT_MS;
 
-  private getHeaders() {
+  private getHeaders(timeoutMs: number = this.timeoutMs) {
     const headers: Record<string, string> = {
       "Content-Type": "application/json",
       "X-API-Key": CONFIG.AI_SERVICE_API_KEY,
+      // Lets the service drop queued work once we have stopped waiting.
+      "X-Request-Timeout-Ms": String(timeoutMs),
     };
     const requestId = getRequestId();
     if (requestId) {
@@ -230,7 +257,7 @@ export class RealAiGateway {
   ): Promise<Response> {
     return fetch(`${CONFIG.AI_SERVICE_URL}/transcribe/stream`, {
       method: "POST",
-      headers: this.getHeaders(),
+      headers: this.getHeaders(this.transcribeTimeoutMs),
       body: JSON.stringify({ file_path: filePath, language: lang }),
       signal,
     });
@@ -95,7 +95,7 @@ describe('PipelineOrchestrator Unit', () => {
 
     await completedPromise;
 
-    expect(mediaChunker.extractAudio).toHaveBeenCalled();
+    expect(mediaChunker.extractAudio).not.toHaveBeenCalled();
     expect(dbInsert).toHaveBeenCalledWith(videoProcessing);
     expect(dbUpdate).toHaveBeenCalledWith(videoProcessing);
   });
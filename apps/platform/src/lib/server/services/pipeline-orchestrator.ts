@@ -1,5 +1,4 @@
 import { eq } from 'drizzle-orm';
-import { dirname, join } from 'path';
 import { video } from '$lib/server/db/schema';
 import type {
   LanguageCode,
@@ -21,7 +20,6 @@ import {
   eventBus as defaultEventBus,
 } from '../infrastructure/event-bus';
 import { SmartFilter } from './linguistic-filter.service';
-import { mediaChunker } from './media-chunker.service';
 
 const PROGRESS_DB_MIN_INTERVAL_MS = 2000;
 const TRANSCRIBE_PROGRESS_CAP_PERCENT = 80;
@@ -61,25 +59,19 @@ export class PipelineOrchestrator {
         .limit(1);
       if (!record) throw new Error(`Video not found: ${videoId}`);
 
-      // Extract audio first (skip if already an audio file)
-      const isAudio = record.filePath.match(/\.(mp3|wav|m4a|aac|ogg)$/i);
-      const audioPath = isAudio
-        ? record.filePath
-        : join(dirname(record.filePath), `${videoId}.mp3`);
       await this.emitProgress(
         videoId,
         targetLang,
         ProgressStage.TRANSCRIBING,
         0,
       );
-      if (!isAudio) {
-        await mediaChunker.extractAudio(record.filePath, audioPath);
-      }
 
+      // The AI service decodes audio straight from the video container while
+      // it transcribes, so no intermediate audio file is extracted here.
       const transcription = await this.transcribeWithProgress(
         videoId,
         targetLang,
-        audioPath,
+        record.filePath,
       );
 
       await this.generateThumbnail(videoId, record);
@@ -159,9 +151,9 @@ export class PipelineOrchestrator {
   private async transcribeWithProgress(
     videoId: string,
     targetLang: LanguageCode,
-    audioPath: string,
+    mediaPath: string,
   ): Promise<{ data: TranscriptionResponse }> {
-    const aiPath = toAiServicePath(audioPath);
+    const aiPath = toAiServicePath(mediaPath);
     console.log(`[Pipeline] Calling AI service for transcription: ${aiPath}`);
 
     const onProgress = this.createProgressCallback(videoId, targetLang);